@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""Time catalog construction with and without NumPy for increasing numbers of items.
+
+Usage:
+
+    benchmark_catalog_builder.py [<max-num-items>]
+
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import time
+import traceback
+
+import segpy.catalog
+from segpy.catalog import CatalogBuilder
+
+
+# The number of bytes in a trace of 1500 four-byte samples, so that the offsets
+# of a million traces extend well beyond 4 GiB.
+TRACE_NUM_BYTES = 240 + 1500 * 4
+
+
+def regular_offsets(num_items):
+    return [(index, 3600 + index * TRACE_NUM_BYTES) for index in range(num_items)]
+
+
+def irregular_offsets(num_items):
+    rng = random.Random(num_items)
+    return [(index, 3600 + index * TRACE_NUM_BYTES + rng.randrange(1000)) for index in range(num_items)]
+
+
+def complete_grid(num_items):
+    num_j = 500
+    return [((i, j), i * num_j + j) for i in range(max(num_items // num_j, 1)) for j in range(num_j)]
+
+
+def grid_with_holes(num_items):
+    num_j = 500
+    keys = [(i, j) for i in range(max(num_items // num_j, 1)) for j in range(num_j) if (i * 7 + j) % 11 != 0]
+    return [(key, 3600 + rank * 240) for rank, key in enumerate(keys)]
+
+
+def irregular_grid(num_items):
+    rng = random.Random(num_items)
+    keys = sorted({(rng.randrange(10 ** 6), rng.randrange(10 ** 6)) for _ in range(num_items)})
+    return [(key, rank) for rank, key in enumerate(keys)]
+
+
+LAYOUTS = (regular_offsets, irregular_offsets, complete_grid, grid_with_holes, irregular_grid)
+
+
+def time_create(items, force_python):
+    """The time in seconds to create a catalog, and the type of catalog created."""
+    builder = CatalogBuilder()
+    for key, value in items:
+        builder.add(key, value)
+    segpy.catalog.force_python_catalog_builder = force_python
+    try:
+        t0 = time.perf_counter()
+        catalog = builder.create()
+        t1 = time.perf_counter()
+    finally:
+        segpy.catalog.force_python_catalog_builder = False
+    return t1 - t0, type(catalog).__name__
+
+
+def benchmark(max_num_items):
+    print("{:<18} {:>9} {:>10} {:>10} {:>8}  {}".format(
+        "layout", "items", "python/s", "numpy/s", "speedup", "catalog"))
+    num_items = 1000
+    while num_items <= max_num_items:
+        for layout in LAYOUTS:
+            items = layout(num_items)
+            python_time, catalog_type = time_create(items, force_python=True)
+            numpy_time, _ = time_create(items, force_python=False)
+            print("{:<18} {:>9} {:>10.4f} {:>10.4f} {:>8.1f}  {}".format(
+                layout.__name__, len(items), python_time, numpy_time, python_time / numpy_time, catalog_type))
+        num_items *= 10
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        max_num_items = int(argv[0]) if argv else 1000000
+    except ValueError:
+        print(globals()['__doc__'], file=sys.stderr)
+        return os.EX_USAGE
+
+    if segpy.catalog.numpy is None:
+        print("NumPy is not installed", file=sys.stderr)
+        return os.EX_UNAVAILABLE
+
+    try:
+        benchmark(max_num_items)
+    except Exception as e:
+        traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+        return os.EX_SOFTWARE
+    return os.EX_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""Measure the memory footprint and throughput of trace header objects.
+
+Usage:
+
+    benchmark_headers.py [<num-headers>]
+
+"""
+from __future__ import print_function
+
+import os
+import pickle
+import sys
+import time
+import traceback
+import tracemalloc
+
+from segpy.header import are_equal
+from segpy.packer import make_header_packer, make_lazy_header_packer
+from segpy.trace_header import TraceHeaderRev1
+
+
+def make_buffers(num_headers):
+    packer = make_header_packer(TraceHeaderRev1)
+    return [packer.pack(TraceHeaderRev1(line_sequence_num=index,
+                                        file_sequence_num=index + 1,
+                                        inline_number=index // 100,
+                                        crossline_number=index % 100,
+                                        num_samples=1000,
+                                        cdp_x=index * 25,
+                                        cdp_y=index * 12))
+            for index in range(num_headers)]
+
+
+def timed(func, num_headers):
+    """The rate in headers per second at which func processes num_headers headers, and its result."""
+    t0 = time.perf_counter()
+    result = func()
+    t1 = time.perf_counter()
+    return num_headers / (t1 - t0), result
+
+
+def bytes_per_header(buffers, packer):
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        headers = [packer.unpack(buffer) for buffer in buffers]
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (after - before) / len(headers)
+
+
+def benchmark(num_headers):
+    buffers = make_buffers(num_headers)
+    packer = make_header_packer(TraceHeaderRev1)
+    lazy_packer = make_lazy_header_packer(TraceHeaderRev1)
+
+    unpack_rate, headers = timed(lambda: [packer.unpack(buffer) for buffer in buffers], num_headers)
+    unpack_one_rate, _ = timed(lambda: [packer.unpack(buffer).inline_number for buffer in buffers], num_headers)
+    lazy_one_rate, _ = timed(lambda: [lazy_packer.unpack(buffer).inline_number for buffer in buffers], num_headers)
+    construct_rate, _ = timed(lambda: [TraceHeaderRev1(line_sequence_num=index, inline_number=index)
+                                       for index in range(num_headers)], num_headers)
+    read_rate, _ = timed(lambda: [(header.inline_number, header.crossline_number, header.cdp_x)
+                                  for header in headers], num_headers)
+    write_rate, _ = timed(lambda: [setattr(header, 'cdp_y', 1) for header in headers], num_headers)
+    pack_rate, _ = timed(lambda: [packer.pack(header) for header in headers], num_headers)
+    copy_rate, copies = timed(lambda: [header.copy() for header in headers], num_headers)
+    equal_rate, _ = timed(lambda: [are_equal(a, b) for a, b in zip(headers, copies)], num_headers)
+    pickle_rate, _ = timed(lambda: pickle.loads(pickle.dumps(headers)), num_headers)
+
+    print("{:<24} {:>12}".format("operation", "headers/s"))
+    for name, rate in (("unpack", unpack_rate),
+                       ("unpack, read one field", unpack_one_rate),
+                       ("lazy, read one field", lazy_one_rate),
+                       ("construct (keywords)", construct_rate),
+                       ("read three fields", read_rate),
+                       ("write one field", write_rate),
+                       ("pack", pack_rate),
+                       ("copy", copy_rate),
+                       ("are_equal", equal_rate),
+                       ("pickle round trip", pickle_rate)):
+        print("{:<24} {:>12.0f}".format(name, rate))
+    print()
+    print("{:<24} {:>12.0f}".format("bytes per header", bytes_per_header(buffers, packer)))
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        num_headers = int(argv[0]) if argv else 100000
+    except ValueError:
+        print(globals()['__doc__'], file=sys.stderr)
+        return os.EX_USAGE
+
+    try:
+        benchmark(num_headers)
+    except Exception as e:
+        traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+        return os.EX_SOFTWARE
+    return os.EX_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
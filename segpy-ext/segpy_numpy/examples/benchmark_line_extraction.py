@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""Compare the time taken to extract inlines and crosslines trace-by-trace with file-order extraction.
+
+The trace-by-trace method reads each trace with its own call to
+trace_samples(), in line order. The file-order method, used by
+extract_inline_3d() and extract_xline_3d(), reads all the traces of a line
+in a single pass in order of their position in the file.
+
+Usage: benchmark_line_extraction.py [-h] [--count COUNT] segy-file
+
+Positional arguments:
+  segy-file      Path to an existing SEG Y file of 3D seismic data
+
+Optional arguments:
+  -h, --help     show this help message and exit
+  --count COUNT  The number of inlines and of crosslines to extract, evenly
+                 spaced through the volume. Defaults to 10.
+
+Example:
+
+  benchmark_line_extraction.py stack_final_int8.sgy --count=20
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import traceback
+
+import numpy as np
+
+from segpy.reader import create_reader
+from segpy_numpy.dtypes import make_dtype
+from segpy_numpy.extract import extract_inline_3d, extract_xline_3d
+
+
+def extract_inline_per_trace(reader_3d, inline_number):
+    """Extract an inline by reading each trace in turn."""
+    return _extract_per_trace(reader_3d, [(inline_number, xline_number)
+                                          for xline_number in reader_3d.xline_numbers()])
+
+
+def extract_xline_per_trace(reader_3d, xline_number):
+    """Extract a crossline by reading each trace in turn."""
+    return _extract_per_trace(reader_3d, [(inline_number, xline_number)
+                                          for inline_number in reader_3d.inline_numbers()])
+
+
+def _extract_per_trace(reader_3d, inline_xline_numbers):
+    array = np.zeros((len(inline_xline_numbers), reader_3d.max_num_trace_samples()),
+                     make_dtype(reader_3d.data_sample_format))
+    for row, inline_xline_number in enumerate(inline_xline_numbers):
+        if reader_3d.has_trace_index(inline_xline_number):
+            trace_samples = reader_3d.trace_samples(reader_3d.trace_index(inline_xline_number))
+            array[row, :len(trace_samples)] = trace_samples
+    return array
+
+
+def evenly_spaced(numbers, count):
+    step = max(1, len(numbers) // count)
+    return numbers[::step][:count]
+
+
+def time_extraction(extract, reader_3d, line_numbers):
+    t0 = datetime.datetime.now()
+    for line_number in line_numbers:
+        extract(reader_3d, line_number)
+    t1 = datetime.datetime.now()
+    return (t1 - t0).total_seconds()
+
+
+def benchmark(segy_filename, count):
+    with open(segy_filename, 'rb') as segy_file:
+        reader_3d = create_reader(segy_file, dimensionality=3)
+        inline_numbers = evenly_spaced(reader_3d.inline_numbers(), count)
+        xline_numbers = evenly_spaced(reader_3d.xline_numbers(), count)
+
+        for description, extract, line_numbers in (
+                ("Inlines, trace-by-trace", extract_inline_per_trace, inline_numbers),
+                ("Inlines, file-order", lambda r, n: extract_inline_3d(r, n, null=0), inline_numbers),
+                ("Crosslines, trace-by-trace", extract_xline_per_trace, xline_numbers),
+                ("Crosslines, file-order", lambda r, n: extract_xline_3d(r, n, null=0), xline_numbers)):
+            seconds = time_extraction(extract, reader_3d, line_numbers)
+            print("{:<26} : {} lines in {} seconds".format(description, len(line_numbers), seconds))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("segy_file", metavar="segy-file",
+                        help="Path to an existing SEG Y file of 3D seismic data")
+
+    parser.add_argument("--count", type=int, default=10,
+                        help="The number of inlines and of crosslines to extract.")
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parser.parse_args(argv)
+
+    try:
+        benchmark(args.segy_file, args.count)
+    except (FileNotFoundError, IsADirectoryError) as e:
+        print(e, file=sys.stderr)
+        return os.EX_NOINPUT
+    except PermissionError as e:
+        print(e, file=sys.stderr)
+        return os.EX_NOPERM
+    except Exception as e:
+        traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+        return os.EX_SOFTWARE
+    return os.EX_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
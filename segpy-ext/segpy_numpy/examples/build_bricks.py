@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""Build a brick-organized companion file from a 3D SEG Y file.
+
+A brick file allows inlines, crosslines, timeslices and sub-volumes to be
+read quickly regardless of the order of traces in the SEG Y file. The SEG Y
+file is read once, and memory use is bounded by the size of one slab of
+inlines as deep as a brick.
+
+Usage: build_bricks.py [-h] [--brick-size BRICK_SIZE] [--null NULL]
+                       segy-file bricks-file
+
+Positional arguments:
+  segy-file      Path to an existing SEG Y file of 3D seismic data
+  bricks-file    Path to the brick file to be created
+
+Optional arguments:
+  -h, --help     show this help message and exit
+  --brick-size BRICK_SIZE
+                 The number of inlines, crosslines and samples along each
+                 side of a brick. Defaults to 64.
+  --null NULL    Sample value to use for missing or short traces. Defaults
+                 to zero.
+
+Example:
+
+  build_bricks.py stack_final_int8.sgy stack_final_int8.bricks --brick-size=32
+"""
+
+import argparse
+import os
+import sys
+import traceback
+
+from segpy.reader import create_reader
+from segpy_numpy.bricks import write_bricks
+
+
+def make_progress_indicator(name):
+
+    previous_integer_progress = -1
+
+    def progress(p):
+        nonlocal previous_integer_progress
+        percent = p * 100.0
+        current_integer_progress = int(percent)
+        if current_integer_progress != previous_integer_progress:
+            print("{} : {}%".format(name, current_integer_progress))
+        previous_integer_progress = current_integer_progress
+
+    return progress
+
+
+def build_bricks(segy_filename, bricks_filename, brick_size, null):
+    """Build a brick file from a 3D SEG Y file.
+
+    Args:
+        segy_filename: Filename of a SEG Y file.
+
+        bricks_filename: Filename of the brick file to be created.
+
+        brick_size: The length of each side of a brick.
+
+        null: Sample value to use for missing or short traces.
+    """
+    with open(segy_filename, 'rb') as segy_file, open(bricks_filename, 'w+b') as bricks_file:
+        segy_reader = create_reader(segy_file, progress=make_progress_indicator("Cataloging"), dimensionality=3)
+        write_bricks(segy_reader, bricks_file,
+                     brick_shape=(brick_size, brick_size, brick_size),
+                     null=null,
+                     progress=make_progress_indicator("Building bricks"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("segy_file", metavar="segy-file",
+                        help="Path to an existing SEG Y file of 3D seismic data")
+
+    parser.add_argument("bricks_file", metavar="bricks-file",
+                        help="Path to the brick file to be created")
+
+    parser.add_argument("--brick-size", type=int, default=64,
+                        help="The length of each side of a brick.")
+
+    parser.add_argument("--null", type=float, default=0.0,
+                        help="Sample value to use for missing or short traces.")
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parser.parse_args(argv)
+
+    try:
+        build_bricks(args.segy_file, args.bricks_file, args.brick_size, args.null)
+    except (FileNotFoundError, IsADirectoryError) as e:
+        print(e, file=sys.stderr)
+        return os.EX_NOINPUT
+    except PermissionError as e:
+        print(e, file=sys.stderr)
+        return os.EX_NOPERM
+    except Exception as e:
+        traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+        return os.EX_SOFTWARE
+    return os.EX_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""Brick-organized companion files for fast slicing of 3D seismic volumes in any direction.
+
+In a trace-ordered SEG Y file the samples of each trace are contiguous,
+so inlines are fast to read but a timeslice touches every trace in the
+file. A brick file divides the volume into small cubes of samples, called
+bricks, each of which is stored contiguously. Any slice or sub-volume
+then touches only the bricks it intersects.
+
+A brick file consists of a companion header, followed by an index giving
+the file offset of each brick, a mask recording which traces are present,
+and finally the bricks themselves. Bricks containing no traces are
+omitted.
+
+Usage:
+
+    with open('survey.segy', 'rb') as segy_file, open('survey.bricks', 'w+b') as brick_file:
+        reader_3d = create_reader(segy_file)
+        write_bricks(reader_3d, brick_file)
+
+    with open('survey.bricks', 'rb') as brick_file:
+        brick_reader = BrickReader(brick_file)
+        timeslice = brick_reader.timeslice(250)
+"""
+
+from functools import reduce
+from operator import mul
+
+import numpy as np
+
+from segpy_numpy.companion import (align, write_companion_header, volume_metadata, volume_shape, num_buffered,
+                                   read_inline_slab, CompanionReader, DEFAULT_BUFFER_NUM_BYTES)
+from segpy_numpy.dtypes import make_dtype
+
+BRICK_MAGIC = b'SEGPYBRK'
+
+DEFAULT_BRICK_SHAPE = (64, 64, 64)
+
+
+def write_bricks(reader_3d, fh, brick_shape=DEFAULT_BRICK_SHAPE, null=0, buffer_num_bytes=DEFAULT_BUFFER_NUM_BYTES,
+                 progress=None):
+    """Write a brick-organized copy of a 3D seismic volume.
+
+    The source is read once, in slabs of as many inlines as the first
+    dimension of the brick shape and as many columns of bricks across the
+    crosslines as will fit in the buffer, so memory use is bounded by the
+    buffer size rather than the size of the volume.
+
+    Args:
+        reader_3d: A SegYReader3D.
+
+        fh: A file-like object open for binary writing, which must support seeking.
+
+        brick_shape: A 3-tuple giving the number of inlines, crosslines and samples
+            in each brick.
+
+        null: The value stored for missing traces and for samples beyond the end
+            of short traces.
+
+        buffer_num_bytes: The approximate maximum number of bytes of samples to
+            hold in memory. At least one column of bricks, spanning all samples,
+            is always buffered.
+
+        progress: A unary callable which will be passed a number between zero
+            and one indicating the progress made. If provided, this callback
+            will be invoked at least once with an argument equal to one.
+
+    Raises:
+        ValueError: If brick_shape does not contain three positive integers.
+        TypeError: If progress is not callable.
+    """
+    progress_callback = progress if progress is not None else lambda p: None
+
+    if not callable(progress_callback):
+        raise TypeError("write_bricks(): progress callback must be callable")
+
+    brick_shape = tuple(brick_shape)
+    if len(brick_shape) != 3 or not all(size > 0 for size in brick_shape):
+        raise ValueError("Brick shape {!r} does not contain three positive integers".format(brick_shape))
+
+    dtype = make_dtype(reader_3d.data_sample_format).newbyteorder('<')
+    metadata = volume_metadata(reader_3d, dtype)
+    metadata['brick_shape'] = brick_shape
+    inline_numbers = metadata['inline_numbers']
+    xline_numbers = metadata['xline_numbers']
+    shape = volume_shape(metadata)
+    grid_shape = _grid_shape(shape, brick_shape)
+    data_offset = write_companion_header(fh, BRICK_MAGIC, metadata)
+    index_offset, mask_offset, bricks_offset = _layout(data_offset, shape, grid_shape)
+
+    index = np.full(grid_shape, -1, dtype='<i8')
+    mask = np.zeros(shape[:2], dtype=np.uint8)
+    brick_num_bytes = reduce(mul, brick_shape) * dtype.itemsize
+    padded_shape = tuple(num_bricks * size for num_bricks, size in zip(grid_shape, brick_shape))
+
+    column_num_bytes = brick_shape[0] * brick_shape[1] * padded_shape[2] * dtype.itemsize
+    num_slab_columns = num_buffered(column_num_bytes, buffer_num_bytes)
+
+    fh.seek(bricks_offset)
+    brick_offset = bricks_offset
+    for brick_i in range(grid_shape[0]):
+        inline_begin = brick_i * brick_shape[0]
+        inline_end = inline_begin + brick_shape[0]
+        slab_inline_numbers = inline_numbers[inline_begin:inline_end]
+        for column_begin in range(0, grid_shape[1], num_slab_columns):
+            column_end = min(column_begin + num_slab_columns, grid_shape[1])
+            slab_xline_begin = column_begin * brick_shape[1]
+            slab_xline_numbers = xline_numbers[slab_xline_begin:column_end * brick_shape[1]]
+            slab = np.full((brick_shape[0], (column_end - column_begin) * brick_shape[1], padded_shape[2]),
+                           null, dtype)
+            slab_mask = mask[inline_begin:inline_end, slab_xline_begin:slab_xline_begin + len(slab_xline_numbers)]
+            read_inline_slab(reader_3d, slab, slab_inline_numbers, slab_xline_numbers, slab_mask)
+
+            for brick_j in range(column_begin, column_end):
+                xline_begin = (brick_j - column_begin) * brick_shape[1]
+                if not slab_mask[:, xline_begin:xline_begin + brick_shape[1]].any():
+                    continue
+                for brick_k in range(grid_shape[2]):
+                    sample_begin = brick_k * brick_shape[2]
+                    brick = slab[:,
+                                 xline_begin:xline_begin + brick_shape[1],
+                                 sample_begin:sample_begin + brick_shape[2]]
+                    fh.write(np.ascontiguousarray(brick).tobytes())
+                    index[brick_i, brick_j, brick_k] = brick_offset
+                    brick_offset += brick_num_bytes
+
+            progress_callback((brick_i * grid_shape[1] + column_end) / (grid_shape[0] * grid_shape[1]))
+
+    fh.seek(index_offset)
+    fh.write(index.tobytes())
+    fh.seek(mask_offset)
+    fh.write(mask.tobytes())
+    progress_callback(1)
+
+
+class BrickReader(CompanionReader):
+    """Read slices and sub-volumes from a brick file produced by write_bricks().
+
+    The file is memory-mapped, so only the bricks intersected by a query are read.
+    """
+
+    MAGIC = BRICK_MAGIC
+
+    def _map(self, metadata, data_offset):
+        self._brick_shape = tuple(metadata['brick_shape'])
+        grid_shape = _grid_shape(self._shape, self._brick_shape)
+        index_offset, mask_offset, _ = _layout(data_offset, self._shape, grid_shape)
+        self._index = np.ndarray(grid_shape, dtype='<i8', buffer=self._file_bytes, offset=index_offset)
+        self._map_mask(mask_offset)
+
+    @property
+    def brick_shape(self):
+        """The (num_inlines, num_xlines, num_samples) shape of each brick."""
+        return self._brick_shape
+
+    def read_subvolume(self, inline_numbers=None, xline_numbers=None, sample_numbers=None, null=None):
+        """Read a sub-volume as a three-dimensional array.
+
+        Args:
+            inline_numbers: None (the default) for all inlines, a sequence of inline
+                numbers, or a slice to be applied to the sequence of all inline numbers.
+
+            xline_numbers: None (the default) for all crosslines, a sequence of crossline
+                numbers, or a slice to be applied to the sequence of all crossline numbers.
+
+            sample_numbers: None (the default) for all samples, a sequence of zero-based
+                sample numbers, or a slice to be applied to the sequence of all sample numbers.
+
+            null: A null value. When None is specified as the null value a masked
+                array will be returned.
+
+        Returns:
+            A three-dimensional array indexed by inline, crossline and sample. If null
+            is None a masked array will be returned, otherwise a regular array will be
+            returned.
+
+        Raises:
+            ValueError: If any of the requested line or sample numbers are not present.
+        """
+        return self._read(*self._positions(inline_numbers, xline_numbers, sample_numbers), null=null)
+
+    def inline(self, inline_number, xline_numbers=None, sample_numbers=None, null=None):
+        """Read an inline as a two-dimensional array indexed by crossline and sample.
+
+        See read_subvolume() for a description of the arguments.
+        """
+        return self.read_subvolume([inline_number], xline_numbers, sample_numbers, null)[0]
+
+    def xline(self, xline_number, inline_numbers=None, sample_numbers=None, null=None):
+        """Read a crossline as a two-dimensional array indexed by inline and sample.
+
+        See read_subvolume() for a description of the arguments.
+        """
+        return self.read_subvolume(inline_numbers, [xline_number], sample_numbers, null)[:, 0]
+
+    def timeslice(self, sample_number, inline_numbers=None, xline_numbers=None, null=None):
+        """Read a timeslice as a two-dimensional array indexed by inline and crossline.
+
+        See read_subvolume() for a description of the arguments.
+        """
+        return self.read_subvolume(inline_numbers, xline_numbers, [sample_number], null)[:, :, 0]
+
+    def _read(self, inline_positions, xline_positions, sample_positions, null):
+        result = self._make_result(inline_positions, xline_positions, sample_positions, null)
+        for brick_i, result_i, brick_is in _group_by_brick(inline_positions, self._brick_shape[0]):
+            for brick_j, result_j, brick_js in _group_by_brick(xline_positions, self._brick_shape[1]):
+                for brick_k, result_k, brick_ks in _group_by_brick(sample_positions, self._brick_shape[2]):
+                    brick_offset = self._index[brick_i, brick_j, brick_k]
+                    if brick_offset < 0:
+                        continue
+                    brick = np.ndarray(self._brick_shape, dtype=self._encoded_dtype,
+                                       buffer=self._file_bytes, offset=int(brick_offset))
+                    result[np.ix_(result_i, result_j, result_k)] = brick[np.ix_(brick_is, brick_js, brick_ks)]
+
+        return self._mask_missing(result, inline_positions, xline_positions, null)
+
+    def __repr__(self):
+        return '{}(source_filename={!r}, shape={}, brick_shape={})'.format(
+            self.__class__.__name__,
+            self._source_filename,
+            self._shape,
+            self._brick_shape)
+
+
+def _grid_shape(shape, brick_shape):
+    """The number of bricks along each axis needed to cover a volume."""
+    return tuple(-(-size // brick_size) for size, brick_size in zip(shape, brick_shape))
+
+
+def _layout(data_offset, shape, grid_shape):
+    """The offsets of the brick index, the trace mask and the first brick."""
+    index_offset = data_offset
+    mask_offset = index_offset + reduce(mul, grid_shape) * np.dtype('<i8').itemsize
+    bricks_offset = align(mask_offset + shape[0] * shape[1])
+    return index_offset, mask_offset, bricks_offset
+
+
+def _group_by_brick(positions, brick_size):
+    """Group positions along one axis by the brick containing them.
+
+    Yields:
+        3-tuples of the brick number, the indexes into positions of the positions
+        within that brick, and the corresponding positions relative to the brick.
+    """
+    brick_numbers = positions // brick_size
+    for brick_number in np.unique(brick_numbers):
+        selected = np.flatnonzero(brick_numbers == brick_number)
+        yield int(brick_number), selected, positions[selected] - brick_number * brick_size
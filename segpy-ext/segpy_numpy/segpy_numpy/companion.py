@@ -0,0 +1,268 @@
+"""Companion files which store the samples of 3D SEG Y volumes in alternative layouts.
+
+A companion file begins with an eight byte magic number identifying the
+kind of file, followed by the length of a JSON metadata document, the
+document itself and padding so that the data following the header is
+aligned to a page boundary, which suits memory-mapping.
+
+Companion files are written from a slab of neighbouring inlines at a
+time, read with read_inline_slab(), and are read through subclasses of
+CompanionReader.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from segpy.util import ensure_superset
+from segpy_numpy import __version__
+from segpy_numpy.dtypes import make_dtype
+from segpy_numpy.extract import make_array, trace_index_grid
+
+# Data following a companion header starts at a multiple of this many bytes.
+COMPANION_ALIGNMENT_NUM_BYTES = 4096
+
+# The default upper limit on the memory used to buffer samples while writing companion files.
+DEFAULT_BUFFER_NUM_BYTES = 256 * 1024 * 1024
+
+_LENGTH_STRUCT = struct.Struct('<Q')
+
+
+def align(offset, alignment=COMPANION_ALIGNMENT_NUM_BYTES):
+    """Round an offset up to the next multiple of alignment."""
+    return -(-offset // alignment) * alignment
+
+
+def companion_header_length(magic, metadata):
+    """The number of bytes which will be occupied by a companion header, including padding.
+
+    Args:
+        magic: An eight byte bytes object identifying the kind of companion file.
+
+        metadata: A JSON-serialisable dictionary.
+
+    Returns:
+        The offset at which data following the header will begin.
+    """
+    return align(len(magic) + _LENGTH_STRUCT.size + len(_encode_metadata(metadata)))
+
+
+def write_companion_header(fh, magic, metadata):
+    """Write a companion file header at the start of a file.
+
+    Args:
+        fh: A file-like object open for binary writing.
+
+        magic: An eight byte bytes object identifying the kind of companion file.
+
+        metadata: A JSON-serialisable dictionary. The segpy_numpy version is
+            added under the key 'segpy_numpy_version'.
+
+    Returns:
+        The offset at which data following the header should be written.
+
+    Raises:
+        ValueError: If magic is not eight bytes long.
+    """
+    if len(magic) != 8:
+        raise ValueError("Companion file magic {!r} is not eight bytes long".format(magic))
+    encoded = _encode_metadata(metadata)
+    data_offset = align(len(magic) + _LENGTH_STRUCT.size + len(encoded))
+    fh.seek(0)
+    fh.write(magic)
+    fh.write(_LENGTH_STRUCT.pack(len(encoded)))
+    fh.write(encoded)
+    fh.write(bytes(data_offset - fh.tell()))
+    return data_offset
+
+
+def read_companion_header(fh, magic):
+    """Read a companion file header from the start of a file.
+
+    Args:
+        fh: A file-like object open for binary reading.
+
+        magic: The expected eight byte bytes object identifying the kind of companion file.
+
+    Returns:
+        A 2-tuple containing the metadata dictionary and the offset at which
+        data following the header begins.
+
+    Raises:
+        ValueError: If the file does not start with a companion header of the expected kind.
+    """
+    fh.seek(0)
+    actual_magic = fh.read(len(magic))
+    if actual_magic != magic:
+        raise ValueError("File does not begin with companion file magic {!r}".format(magic))
+    length_data = fh.read(_LENGTH_STRUCT.size)
+    if len(length_data) != _LENGTH_STRUCT.size:
+        raise ValueError("Truncated companion file header")
+    length, = _LENGTH_STRUCT.unpack(length_data)
+    encoded = fh.read(length)
+    if len(encoded) != length:
+        raise ValueError("Truncated companion file header")
+    metadata = json.loads(encoded.decode('utf-8'))
+    return metadata, align(len(magic) + _LENGTH_STRUCT.size + length)
+
+
+def volume_metadata(reader_3d, encoded_dtype):
+    """The metadata describing the volume of a 3D SEG Y file, common to all kinds of companion file.
+
+    Args:
+        reader_3d: A SegYReader3D.
+
+        encoded_dtype: The numpy dtype with which samples are stored in the companion file.
+
+    Returns:
+        A JSON-serialisable dictionary.
+    """
+    return dict(inline_numbers=list(reader_3d.inline_numbers()),
+                xline_numbers=list(reader_3d.xline_numbers()),
+                num_samples=reader_3d.max_num_trace_samples(),
+                dtype=encoded_dtype.str,
+                data_sample_format=reader_3d.data_sample_format,
+                source_filename=reader_3d.filename)
+
+
+def volume_shape(metadata):
+    """The (num_inlines, num_xlines, num_samples) shape of the volume described by metadata."""
+    return len(metadata['inline_numbers']), len(metadata['xline_numbers']), metadata['num_samples']
+
+
+def num_buffered(item_num_bytes, buffer_num_bytes):
+    """The number of items, such as inlines, which fit in a buffer, and at least one."""
+    if item_num_bytes == 0:
+        return 1
+    return max(1, buffer_num_bytes // item_num_bytes)
+
+
+def read_inline_slab(reader_3d, slab, inline_numbers, xline_numbers, mask):
+    """Read the traces of a slab of neighbouring inlines into an array.
+
+    The traces are read in file order. Elements of the slab for missing
+    traces, and for samples beyond the end of short traces, are left
+    unchanged.
+
+    Args:
+        reader_3d: A SegYReader3D.
+
+        slab: An array indexed by inline, crossline and sample, which may be
+            a transposed view of an array in another layout. It must be at
+            least as large as the inlines, crosslines and samples to be read.
+
+        inline_numbers: A sequence of the inline numbers of the slab.
+
+        xline_numbers: A sequence of the crossline numbers of the slab.
+
+        mask: An array indexed by inline and crossline, in which elements for
+            traces which are present will be set to one.
+    """
+    grid = trace_index_grid(reader_3d, inline_numbers, xline_numbers)
+    positions = {int(grid[i, j]): (i, j) for i, j in zip(*np.nonzero(grid != -1))}
+    for trace_index, trace_samples in reader_3d.iter_trace_samples(positions):
+        i, j = positions[trace_index]
+        slab[i, j, :len(trace_samples)] = np.asarray(trace_samples, slab.dtype)
+        mask[i, j] = 1
+
+
+class CompanionReader:
+    """The base class for readers of companion files.
+
+    The file is memory-mapped. Subclasses identify the kind of file with
+    MAGIC, and locate their data within the file by overriding _map().
+    """
+
+    MAGIC = None
+
+    def __init__(self, fh):
+        """Initialize a CompanionReader.
+
+        Args:
+            fh: A file object, opened for binary reading, for a file on disk
+                which can be memory-mapped.
+
+        Raises:
+            ValueError: If the file is not a companion file of the expected kind.
+        """
+        metadata, data_offset = read_companion_header(fh, self.MAGIC)
+        self._inline_numbers = metadata['inline_numbers']
+        self._xline_numbers = metadata['xline_numbers']
+        self._inline_positions = {number: position for position, number in enumerate(self._inline_numbers)}
+        self._xline_positions = {number: position for position, number in enumerate(self._xline_numbers)}
+        self._shape = volume_shape(metadata)
+        self._encoded_dtype = np.dtype(metadata['dtype'])
+        self._dtype = make_dtype(metadata['data_sample_format'])
+        self._source_filename = metadata['source_filename']
+        self._file_bytes = np.memmap(fh, dtype=np.uint8, mode='r')
+        self._mask = None
+        self._map(metadata, data_offset)
+
+    def _map(self, metadata, data_offset):
+        """Locate the data following the companion header.
+
+        Subclasses must call _map_mask() with the offset of the trace mask.
+        """
+        raise NotImplementedError
+
+    def _map_mask(self, mask_offset):
+        self._mask = np.ndarray(self._shape[:2], dtype=np.uint8, buffer=self._file_bytes,
+                                offset=mask_offset).astype(bool)
+
+    @property
+    def shape(self):
+        """The (num_inlines, num_xlines, num_samples) shape of the volume."""
+        return self._shape
+
+    @property
+    def dtype(self):
+        """The numpy dtype of arrays returned by queries."""
+        return self._dtype
+
+    @property
+    def source_filename(self):
+        """The filename of the SEG Y file from which the companion file was written."""
+        return self._source_filename
+
+    def inline_numbers(self):
+        """A sorted sequence of inline numbers."""
+        return self._inline_numbers
+
+    def xline_numbers(self):
+        """A sorted sequence of crossline numbers."""
+        return self._xline_numbers
+
+    def _positions(self, inline_numbers, xline_numbers, sample_numbers):
+        """Resolve line and sample numbers, as for segpy.util.ensure_superset(), into arrays of positions.
+
+        Raises:
+            ValueError: If any of the line or sample numbers are not present.
+        """
+        inline_numbers = ensure_superset(self._inline_numbers, inline_numbers)
+        xline_numbers = ensure_superset(self._xline_numbers, xline_numbers)
+        sample_numbers = ensure_superset(range(self._shape[2]), sample_numbers)
+        return (np.array([self._inline_positions[number] for number in inline_numbers], dtype=np.int64),
+                np.array([self._xline_positions[number] for number in xline_numbers], dtype=np.int64),
+                np.asarray(sample_numbers, dtype=np.int64))
+
+    def _make_result(self, inline_positions, xline_positions, sample_positions, null):
+        return make_array((len(inline_positions), len(xline_positions), len(sample_positions)), self._dtype, null)
+
+    def _mask_missing(self, result, inline_positions, xline_positions, null):
+        """Mask, or fill with null, the traces of a result which are missing."""
+        missing = ~self._mask[np.ix_(inline_positions, xline_positions)]
+        result[missing] = np.ma.masked if null is None else null
+        return result
+
+    def __repr__(self):
+        return '{}(source_filename={!r}, shape={})'.format(
+            self.__class__.__name__,
+            self._source_filename,
+            self._shape)
+
+
+def _encode_metadata(metadata):
+    metadata = dict(metadata)
+    metadata['segpy_numpy_version'] = __version__
+    return json.dumps(metadata, sort_keys=True).encode('utf-8')
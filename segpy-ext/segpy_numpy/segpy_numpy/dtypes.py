@@ -2,12 +2,22 @@
 
 import numpy
 
+from segpy.packer import compile_struct
+
 NUMPY_DTYPES = {'ibm':     numpy.dtype('f4'),
                 'int32':   numpy.dtype('i4'),
                 'int16':   numpy.dtype('i2'),
                 'float32': numpy.dtype('f4'),
                 'int8':    numpy.dtype('i1')}
 
+# Numpy type codes for samples as encoded in a SEG Y file, without conversion.
+# IBM floats are presented as the unsigned integers which encode them.
+ENCODED_NUMPY_TYPE_CODES = {'ibm':     'u4',
+                            'int32':   'i4',
+                            'int16':   'i2',
+                            'float32': 'f4',
+                            'int8':    'i1'}
+
 
 def make_dtype(data_sample_format): # TODO: What is the correct name for this arg?
     """Convert a SEG Y data sample format to a compatible numpy dtype.
@@ -30,3 +40,101 @@ def make_dtype(data_sample_format): # TODO: What is the correct name for this ar
         raise ValueError("Unknown data sample format string {!r}".format(data_sample_format))
 
 
+def make_encoded_dtype(data_sample_format, endian='>'):
+    """Make a numpy dtype which matches the encoding of samples in a SEG Y file.
+
+    Arrays of this dtype can be used to view samples in place, for example
+    within a memory-mapped file. Such arrays can be converted to arrays of
+    the dtype returned by make_dtype() using decode_samples().
+
+    Args:
+        data_sample_format: A data sample format string.
+
+        endian: '>' for big-endian data (the standard and default), '<'
+            for little-endian (non-standard).
+
+    Returns:
+        A numpy.dtype instance.
+
+    Raises:
+        ValueError: For unrecognised data sample format strings.
+    """
+    try:
+        type_code = ENCODED_NUMPY_TYPE_CODES[data_sample_format]
+    except KeyError:
+        raise ValueError("Unknown data sample format string {!r}".format(data_sample_format))
+    # IBM floats are always big-endian
+    return numpy.dtype(('>' if data_sample_format == 'ibm' else endian) + type_code)
+
+
+def compile_dtype(header_format_class, endian='>'):
+    """Compile a structured numpy dtype from a header format class.
+
+    The dtype is the numpy counterpart of the struct format produced by
+    segpy.packer.compile_struct(). Arrays of this dtype can be used to
+    view or decode many headers at once, for example with numpy.frombuffer().
+    Coincident fields share the same bytes, and any bytes not covered by a
+    field are skipped.
+
+    Args:
+        header_format_class: A header format class with START_OFFSET_IN_BYTES
+            and LENGTH_IN_BYTES attributes.
+
+        endian: '>' for big-endian data (the standard and default), '<'
+            for little-endian (non-standard).
+
+    Returns:
+        A structured numpy.dtype with one field for each header field, in
+        declaration order, and an itemsize of LENGTH_IN_BYTES.
+
+    Raises:
+        ValueError: If header_format_class defines no fields, or its fields
+            are inconsistent as described for compile_struct().
+    """
+    start_offset = header_format_class.START_OFFSET_IN_BYTES
+    length_in_bytes = header_format_class.LENGTH_IN_BYTES
+
+    # Validate the format in the same way as for header packing
+    compile_struct(header_format_class, start_offset, length_in_bytes, endian)
+
+    fields = [getattr(header_format_class, name) for name in header_format_class.ordered_field_names()]
+    return numpy.dtype({'names': [field.name for field in fields],
+                        'formats': [make_encoded_dtype(field.value_type.SEG_Y_TYPE, endian) for field in fields],
+                        'offsets': [field.offset - start_offset for field in fields],
+                        'itemsize': length_in_bytes})
+
+
+def decode_samples(encoded, data_sample_format):
+    """Convert samples from their SEG Y encoding into a regular numpy array.
+
+    Args:
+        encoded: An array with a dtype produced by make_encoded_dtype().
+
+        data_sample_format: A data sample format string.
+
+    Returns:
+        A new array of the same shape with the dtype returned by make_dtype().
+    """
+    if data_sample_format == 'ibm':
+        return ibm_to_ieee(encoded)
+    return encoded.astype(make_dtype(data_sample_format))
+
+
+def ibm_to_ieee(words):
+    """Convert IBM single-precision floats to IEEE single-precision floats.
+
+    Args:
+        words: An array of unsigned 32-bit integers, each of which is the
+            bit pattern of an IBM float.
+
+    Returns:
+        A float32 array of the same shape. IBM floats with magnitudes too
+        large to be represented become infinities.
+    """
+    words = numpy.asarray(words, dtype=numpy.uint32)
+    sign = numpy.where(words & 0x80000000, -1.0, 1.0)
+    exponent = ((words >> 24) & 0x7f).astype(numpy.int32)
+    fraction = (words & 0x00ffffff).astype(numpy.float64)
+    # value = fraction * 2**-24 * 16**(exponent - 64)
+    with numpy.errstate(over='ignore'):
+        return (sign * numpy.ldexp(fraction, 4 * (exponent - 64) - 24)).astype(numpy.float32)
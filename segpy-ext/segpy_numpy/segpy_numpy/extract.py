@@ -1,11 +1,13 @@
 """Tools for interoperability between Segpy and Numpy arrays."""
 from collections import namedtuple
+import os
+
 import numpy as np
 from segpy.header import SubFormatMeta
-from segpy.packer import make_header_packer
 
 from segpy.util import ensure_superset
-from segpy_numpy.dtypes import make_dtype
+from segpy.toolkit import TRACE_HEADER_NUM_BYTES
+from segpy_numpy.dtypes import make_dtype, make_encoded_dtype, decode_samples, compile_dtype
 
 
 def extract_trace_headers(reader, fields, trace_indexes=None):
@@ -24,30 +26,50 @@ def extract_trace_headers(reader, fields, trace_indexes=None):
     Returns:
         A namedtuple with attributes which are one-dimensionsal Numpy arrays.
     """
-    if trace_indexes is None:
-        trace_indexes = reader.trace_indexes()
-
     field_names = [_extract_field_name(field) for field in fields]
+    table = extract_trace_header_table(reader, field_names, trace_indexes)
+    trace_header_arrays_cls = namedtuple('trace_header_arrays_cls', field_names)
+    return trace_header_arrays_cls(*(np.ascontiguousarray(table[field_name]) for field_name in field_names))
 
-    class SubFormat(metaclass=SubFormatMeta,
-                    parent_format=reader.trace_header_format_class,
-                    parent_field_names=field_names):
-        pass
 
-    sub_header_packer = make_header_packer(SubFormat, reader.endian)
-    trace_header_arrays_cls = namedtuple('trace_header_arrays_cls', field_names)
+def extract_trace_header_table(reader, fields=None, trace_indexes=None):
+    """Extract trace header fields from the specified trace headers as a table.
 
-    trace_headers = [reader.trace_header(trace_index, sub_header_packer)
-                     for trace_index in trace_indexes]
+    The trace headers are decoded together, using a dtype produced by compile_dtype(),
+    rather than being unpacked one at a time.
 
-    trace_header_arrays = trace_header_arrays_cls(
-        *(np.fromiter((getattr(trace_header, field_name) for trace_header in trace_headers),
-                      dtype=make_dtype(getattr(SubFormat, field_name).value_type.SEG_Y_TYPE),
-                      count=len(trace_headers))
-          for field_name in field_names)
-    )
+    Args:
+        reader: A SegYReader
 
-    return trace_header_arrays
+        fields: An optional iterable series where each item is either the name of a field as a
+            string or an object such as a NamedField with a 'name' attribute which in turn is the
+            name of a field as a string. If not provided or None, all fields will be extracted.
+
+        trace_indexes: An optional iterable series of trace_indexes. If not provided or None,
+            the headers for all trace indexes will be returned.
+
+    Returns:
+        A one-dimensional structured Numpy array with one item per trace index and one field,
+        in native byte order, per trace header field.
+
+    Raises:
+        AttributeError: If the the named fields do not exist in the trace header definition.
+        ValueError: If any trace index is out of range.
+    """
+    header_format_class = reader.trace_header_format_class
+    if fields is not None:
+        header_format_class = _sub_format(header_format_class,
+                                          [_extract_field_name(field) for field in fields])
+
+    records = _read_trace_header_records(reader, header_format_class, trace_indexes)
+
+    field_names = header_format_class.ordered_field_names()
+    table = np.empty(len(records), dtype=[(field_name,
+                                           make_dtype(getattr(header_format_class, field_name).value_type.SEG_Y_TYPE))
+                                          for field_name in field_names])
+    for field_name in field_names:
+        table[field_name] = records[field_name]
+    return table
 
 
 def extract_trace_header_field_3d(reader_3d, fields, inline_numbers=None, xline_numbers=None, null=None):
@@ -108,31 +130,21 @@ def extract_trace_header_field_3d(reader_3d, fields, inline_numbers=None, xline_
     xline_numbers = ensure_superset(reader_3d.xline_numbers(), xline_numbers)
     shape = (len(inline_numbers), len(xline_numbers))
 
-    class SubFormat(metaclass=SubFormatMeta,
-                    parent_format=reader_3d.trace_header_format_class,
-                    parent_field_names=field_names):
-        pass
-
-    sub_header_packer = make_header_packer(SubFormat, reader_3d.endian)
+    SubFormat = _sub_format(reader_3d.trace_header_format_class, field_names)
     TraceHeaderArrays = namedtuple('TraceHeaderArrays', field_names)
 
-    arrays = (_make_array(shape,
-                          make_dtype(getattr(SubFormat, field_name).value_type.SEG_Y_TYPE),
-                          null)
+    arrays = (make_array(shape,
+                         make_dtype(getattr(SubFormat, field_name).value_type.SEG_Y_TYPE),
+                         null)
               for field_name in field_names)
 
     trace_header_arrays = TraceHeaderArrays(*arrays)
 
-    for inline_index, inline_number in enumerate(inline_numbers):
-        for xline_index, xline_number in enumerate(xline_numbers):
-            inline_xline_number = (inline_number, xline_number)
-            if reader_3d.has_trace_index(inline_xline_number):
-                trace_index = reader_3d.trace_index((inline_number, xline_number))
-                trace_header = reader_3d.trace_header(trace_index, sub_header_packer)
-
-                for field_name, a in zip(field_names, trace_header_arrays):
-                    field_value = getattr(trace_header, field_name)
-                    a[inline_index, xline_index] = field_value
+    grid = trace_index_grid(reader_3d, inline_numbers, xline_numbers)
+    present = grid != -1
+    records = _read_trace_header_records(reader_3d, SubFormat, grid[present])
+    for field_name, a in zip(field_names, trace_header_arrays):
+        a[present] = records[field_name]
 
     return trace_header_arrays
 
@@ -230,41 +242,25 @@ def extract_inline_3d(reader_3d, inline_number, xline_numbers=None, sample_numbe
     sample_numbers = ensure_superset(range(0, reader_3d.max_num_trace_samples()), sample_numbers)
     shape = (len(xline_numbers), len(sample_numbers))
     dtype = make_dtype(reader_3d.data_sample_format)
-    array = _make_array(shape, dtype, null)
-
-    if isinstance(sample_numbers, range):
-        _populate_inline_array_over_sample_range(reader_3d, inline_number, xline_numbers, sample_numbers, array)
+    array = make_array(shape, dtype, null)
+    if len(sample_numbers) > 0 and reader_3d.inline_range(inline_number) is not None:
+        # The inline is contiguous, so fetch it with a single read
+        trace_indexes, line_samples = reader_3d.inline_samples(inline_number)
+        line_samples = np.asarray(line_samples)
+        rows = trace_index_grid(reader_3d, [inline_number], xline_numbers)[0]
+        present = rows != -1
+        sample_numbers = np.asarray(sample_numbers)
+        available = sample_numbers < line_samples.shape[1]
+        array[np.ix_(present, available)] = line_samples[np.ix_(rows[present] - trace_indexes.start,
+                                                                sample_numbers[available])]
     else:
-        _populate_inline_array_numbered_samples(reader_3d, inline_number, xline_numbers, sample_numbers, array)
-
+        populate_trace_array(reader_3d,
+                              [(inline_number, xline_number) for xline_number in xline_numbers],
+                              sample_numbers,
+                              array)
     return array
 
 
-def _populate_inline_array_numbered_samples(reader_3d, inline_number, xline_numbers, sample_numbers, array):
-    for xline_index, xline_number in enumerate(xline_numbers):
-        inline_xline_number = (inline_number, xline_number)
-        if reader_3d.has_trace_index(inline_xline_number):
-            trace_index = reader_3d.trace_index(inline_xline_number)
-            num_trace_samples = reader_3d.num_trace_samples(trace_index)
-            trace_sample_start = sample_numbers[0]
-            trace_sample_stop = min(sample_numbers[-1] + 1, num_trace_samples)
-            trace_samples = reader_3d.trace_samples(trace_index, start=trace_sample_start, stop=trace_sample_stop)
-            for sample_index, sample_number in enumerate(sample_numbers):
-                array[xline_index, sample_index] = trace_samples[sample_number - trace_sample_start]
-
-
-def _populate_inline_array_over_sample_range(reader_3d, inline_number, xline_numbers, sample_numbers, array):
-    for xline_index, xline_number in enumerate(xline_numbers):
-        inline_xline_number = (inline_number, xline_number)
-        if reader_3d.has_trace_index(inline_xline_number):
-            trace_index = reader_3d.trace_index(inline_xline_number)
-            num_trace_samples = reader_3d.num_trace_samples(trace_index)
-            trace_sample_stop = min(sample_numbers.stop, num_trace_samples)
-            trace_samples = reader_3d.trace_samples(trace_index)
-            source_slice = slice(sample_numbers.start, trace_sample_stop, sample_numbers.step)
-            array[xline_index, :] = trace_samples[source_slice]
-
-
 def extract_xline_3d(reader_3d, xline_number, inline_numbers=None, sample_numbers=None, null=None):
     """Extract an inline as a two-dimensional array.
 
@@ -319,46 +315,21 @@ def extract_xline_3d(reader_3d, xline_number, inline_numbers=None, sample_number
     sample_numbers = ensure_superset(range(0, reader_3d.max_num_trace_samples()), sample_numbers)
     shape = (len(inline_numbers), len(sample_numbers))
     dtype = make_dtype(reader_3d.data_sample_format)
-    array = _make_array(shape, dtype, null)
-
-    if isinstance(sample_numbers, range):
-        _populate_xline_array_over_sample_range(reader_3d, xline_number, inline_numbers, sample_numbers, array)
-    else:
-        _populate_xline_array_numbered_samples(reader_3d, xline_number, inline_numbers, sample_numbers, array)
-
+    array = make_array(shape, dtype, null)
+    populate_trace_array(reader_3d,
+                          [(inline_number, xline_number) for inline_number in inline_numbers],
+                          sample_numbers,
+                          array)
     return array
 
 
-def _populate_xline_array_numbered_samples(reader_3d, xline_number, inline_numbers, sample_numbers, array):
-    for inline_index, inline_number in enumerate(inline_numbers):
-        inline_xline_number = (inline_number, xline_number)
-        if reader_3d.has_trace_index(inline_xline_number):
-            trace_index = reader_3d.trace_index(inline_xline_number)
-            num_trace_samples = reader_3d.num_trace_samples(trace_index)
-            trace_sample_start = sample_numbers[0]
-            trace_sample_stop = min(sample_numbers[-1] + 1, num_trace_samples)
-            trace_samples = reader_3d.trace_samples(trace_index, start=trace_sample_start, stop=trace_sample_stop)
-            for sample_index, sample_number in enumerate(sample_numbers):
-                array[inline_index, sample_index] = trace_samples[sample_number - trace_sample_start]
-
-
-def _populate_xline_array_over_sample_range(reader_3d, xline_number, inline_numbers, sample_numbers, array):
-    for inline_index, inline_number in enumerate(inline_numbers):
-        inline_xline_number = (inline_number, xline_number)
-        if reader_3d.has_trace_index(inline_xline_number):
-            trace_index = reader_3d.trace_index(inline_xline_number)
-            num_trace_samples = reader_3d.num_trace_samples(trace_index)
-            trace_sample_stop = min(sample_numbers.stop, num_trace_samples)
-            trace_samples = reader_3d.trace_samples(trace_index)
-            source_slice = slice(sample_numbers.start, trace_sample_stop, sample_numbers.step)
-            array[inline_index, :] = trace_samples[source_slice]
-
-
 def extract_timeslice_3d(reader_3d, sample_number, inline_numbers=None, xline_numbers=None, null=None):
-    """Extract a single timeslice header field from all trace headers as an array.
+    """Extract a single timeslice as a two-dimensional array.
 
     Args:
-        reader_3d: A SegYReader3D
+        reader_3d: A SegYReader3D, or a companion file reader with a timeslice()
+            method, such as a SampleMajorReader or a BrickReader, to which
+            extraction will be delegated.
 
         sample_number: The zero-based sample index.
 
@@ -392,38 +363,284 @@ def extract_timeslice_3d(reader_3d, sample_number, inline_numbers=None, xline_nu
                 crossline numbers. For example xline_numbers=slice(100, -100) will omit the first
                 one hundred and the last one hundred traces, irrespective of their numbers.
 
-        null: An optional null value for missing traces. The null value must be convertible
-            to all field value types.
+        null: A null value. When None is specified as the null value a masked array will be returned.
 
     Returns:
-        An namedtuple object with attributes which are two-dimensional Numpy arrays.
-        If a null value was specified the arrays will be ndarrays, otherwise they
-        will be masked arrays.  The attributes of the named tuple are in the same
-        order as the fields specified in the `fields` argument.
-
-    Raises:
-        AttributeError: If the the named fields do not exist in the trace header definition.
+        A two-dimensional array. If null is None a masked array will be returned, otherwise
+        a regular array will be returned. The first index will correspond to the inlines and
+        the second index to the crosslines.
     """
+    if hasattr(reader_3d, 'timeslice'):
+        return reader_3d.timeslice(sample_number, inline_numbers, xline_numbers, null)
+    return extract_timeslices_3d(reader_3d, [sample_number], inline_numbers, xline_numbers, null)[:, :, 0]
+
 
+def extract_timeslices_3d(reader_3d, sample_numbers=None, inline_numbers=None, xline_numbers=None, null=None):
+    """Extract several timeslices as a three-dimensional array in a single pass.
+
+    When the traces in the file all have the same length and are stored
+    at regular intervals, the file is memory-mapped and the samples are
+    gathered directly with strided array indexing. Otherwise each trace is
+    read once, in file order, from the first to the last requested sample.
+
+    Args:
+        reader_3d: A SegYReader3D
+
+        sample_numbers: The zero-based sample indexes of the timeslices.
+            This argument can be specified in three ways:
+
+            None (the default) - All samples will be extracted.
+
+            sequence - When a sequence, such as a range or a list is provided only those samples at
+                sample numbers corresponding to the items in the sequence will be extracted. The
+                samples will always be extracted in increasing numeric order and duplicate entries
+                will be ignored.
+
+            slice - When a slice object is provided the slice will be applied to the sequence of all
+                sample numbers.
+
+        inline_numbers: The inline numbers for which traces are to be extracted. See
+            extract_timeslice_3d() for details.
+
+        xline_numbers: The crossline numbers at which traces are to be extracted. See
+            extract_timeslice_3d() for details.
+
+        null: A null value. When None is specified as the null value a masked array will be returned.
+
+    Returns:
+        A three-dimensional array. If null is None a masked array will be returned, otherwise
+        a regular array will be returned. The indexes correspond to the inlines, the crosslines
+        and the timeslices, in that order.
+    """
     inline_numbers = ensure_superset(reader_3d.inline_numbers(), inline_numbers)
     xline_numbers = ensure_superset(reader_3d.xline_numbers(), xline_numbers)
-    shape = (len(inline_numbers), len(xline_numbers))
+    sample_numbers = ensure_superset(range(0, reader_3d.max_num_trace_samples()), sample_numbers)
+    shape = (len(inline_numbers), len(xline_numbers), len(sample_numbers))
     dtype = make_dtype(reader_3d.data_sample_format)
-    array = _make_array(shape, dtype, null)
-    sample_number_stop = sample_number + 1
-
-    for inline_index, inline_number in enumerate(inline_numbers):
-        for xline_index, xline_number in enumerate(xline_numbers):
-            inline_xline_number = (inline_number, xline_number)
-            if reader_3d.has_trace_index(inline_xline_number):
-                trace_index = reader_3d.trace_index((inline_number, xline_number))
-                trace_samples = reader_3d.trace_samples(trace_index, start=sample_number, stop=sample_number_stop)
-                array[inline_index, xline_index] = trace_samples[0]
+    array = make_array(shape, dtype, null)
+
+    grid = trace_index_grid(reader_3d, inline_numbers, xline_numbers)
+    present = grid >= 0
+    trace_indexes = grid[present]
+    if len(trace_indexes) == 0 or len(sample_numbers) == 0:
+        return array
+
+    mapped_samples = map_trace_samples(reader_3d)
+    if mapped_samples is not None:
+        # Gather in file order for locality of reference, then restore the grid order
+        order = np.argsort(trace_indexes, kind='mergesort')
+        encoded = np.empty((len(trace_indexes), len(sample_numbers)), mapped_samples.dtype)
+        encoded[order] = mapped_samples[np.ix_(trace_indexes[order], np.asarray(sample_numbers))]
+        array[present] = decode_samples(encoded, reader_3d.data_sample_format)
+    else:
+        trace_sample_start = sample_numbers[0]
+        trace_sample_stop = sample_numbers[-1] + 1
+        sample_offsets = np.asarray(sample_numbers) - trace_sample_start
+        positions = {trace_index: position for position, trace_index in enumerate(trace_indexes)}
+        gathered = np.empty((len(trace_indexes), len(sample_numbers)), dtype)
+        for trace_index, trace_samples in reader_3d.iter_trace_samples(trace_indexes.tolist(),
+                                                                      trace_sample_start,
+                                                                      trace_sample_stop):
+            gathered[positions[trace_index]] = np.asarray(trace_samples, dtype)[sample_offsets]
+        array[present] = gathered
     return array
 
 
-def _make_array(shape, dtype, null=None):
-    """Make an array"""
+def map_trace_samples(reader):
+    """Memory-map the samples of all traces as a two-dimensional array.
+
+    Only files in which all traces have the same number of samples and are
+    stored at regular intervals can be mapped. The samples are presented
+    as encoded in the file, without copying or conversion.
+
+    Args:
+        reader: A SegYReader reading from a named file.
+
+    Returns:
+        A read-only two-dimensional array, with a dtype produced by
+        make_encoded_dtype(), indexed by trace index and sample number. If
+        the file cannot be mapped, None.
+    """
+    layout = reader.regular_trace_layout()
+    if layout is None or not os.path.isfile(reader.filename):
+        return None
+    encoded_dtype = make_encoded_dtype(reader.data_sample_format, reader.endian)
+    file_bytes = np.memmap(reader.filename, dtype=np.uint8, mode='r')
+    return np.ndarray(shape=(reader.num_traces(), layout.num_samples),
+                      dtype=encoded_dtype,
+                      buffer=file_bytes,
+                      offset=layout.first_trace_offset + TRACE_HEADER_NUM_BYTES,
+                      strides=(layout.trace_stride, encoded_dtype.itemsize))
+
+
+def map_trace_headers(reader, header_format_class=None):
+    """Memory-map the headers of all traces as a structured array.
+
+    Only files in which all traces have the same number of samples and are
+    stored at regular intervals can be mapped. The header fields are presented
+    as encoded in the file, without copying or conversion.
+
+    Args:
+        reader: A SegYReader reading from a named file.
+
+        header_format_class: An optional trace header format class, such as a
+            SubFormat of the reader's trace header format class, describing the
+            fields to be mapped. If not provided or None, the reader's trace
+            header format class will be used.
+
+    Returns:
+        A read-only one-dimensional array, with a dtype produced by compile_dtype(),
+        indexed by trace index. If the file cannot be mapped, None.
+    """
+    layout = reader.regular_trace_layout()
+    if layout is None or not os.path.isfile(reader.filename):
+        return None
+    if header_format_class is None:
+        header_format_class = reader.trace_header_format_class
+    header_dtype = compile_dtype(header_format_class, reader.endian)
+    file_bytes = np.memmap(reader.filename, dtype=np.uint8, mode='r')
+    return np.ndarray(shape=(reader.num_traces(),),
+                      dtype=header_dtype,
+                      buffer=file_bytes,
+                      offset=layout.first_trace_offset,
+                      strides=(layout.trace_stride,))
+
+
+def _read_trace_header_records(reader, header_format_class, trace_indexes=None):
+    """Read trace headers as an array of records encoded as in the file.
+
+    The headers are viewed in place and gathered from a memory-map if possible. Otherwise
+    they are read one after another into a single buffer which is then decoded as a whole.
+
+    Args:
+        reader: A SegYReader
+
+        header_format_class: A trace header format class describing the fields to be read.
+
+        trace_indexes: An optional iterable series of trace_indexes. If not provided or None,
+            the headers for all trace indexes will be read.
+
+    Returns:
+        A one-dimensional array, with a dtype produced by compile_dtype(), containing
+        an item for each trace index.
+
+    Raises:
+        ValueError: If any trace index is out of range.
+    """
+    if trace_indexes is None:
+        trace_indexes = np.arange(reader.num_traces())
+    elif isinstance(trace_indexes, np.ndarray):
+        trace_indexes = trace_indexes.astype(np.int64, copy=False).ravel()
+    else:
+        trace_indexes = np.fromiter(trace_indexes, dtype=np.int64)
+
+    if len(trace_indexes) > 0 and not (0 <= trace_indexes.min() and trace_indexes.max() < reader.num_traces()):
+        raise ValueError("Trace indexes must be in the range 0 to {}".format(reader.num_traces() - 1))
+
+    mapped_headers = map_trace_headers(reader, header_format_class)
+    if mapped_headers is not None:
+        return mapped_headers[trace_indexes]
+
+    header_dtype = compile_dtype(header_format_class, reader.endian)
+    buffer = bytearray().join(reader.trace_header(trace_index, _BUFFER_PACKER)
+                              for trace_index in trace_indexes.tolist())
+    return np.frombuffer(buffer, dtype=header_dtype)
+
+
+class _BufferPacker:
+    """A stand-in header packer which returns the buffer from which a header would be unpacked."""
+
+    @staticmethod
+    def unpack(buffer):
+        return buffer
+
+
+_BUFFER_PACKER = _BufferPacker()
+
+
+def populate_trace_array(reader_3d, inline_xline_numbers, sample_numbers, array):
+    """Read traces into the rows of a two-dimensional array.
+
+    All traces are read in a single pass in file order, with reads of nearby
+    traces combined, and the samples are then scattered into the array.
+    Missing traces are left unchanged, as are samples beyond the end of
+    short traces.
+
+    Args:
+        reader_3d: A SegYReader3D object.
+
+        inline_xline_numbers: A sequence of (inline_number, xline_number) tuples,
+            one for each row of the array.
+
+        sample_numbers: A sorted sequence of distinct sample numbers, one for each
+            column of the array.
+
+        array: A two-dimensional array to be populated.
+    """
+    if len(sample_numbers) == 0:
+        return
+    keys = np.asarray(inline_xline_numbers, dtype=np.int64).reshape(-1, 2)
+    trace_indexes = reader_3d.trace_indexes_many(keys, missing=-1)
+    rows = np.flatnonzero(trace_indexes != -1)
+    positions = dict(zip(trace_indexes[rows].tolist(), rows.tolist()))
+    if len(positions) == 0:
+        return
+
+    trace_sample_start = sample_numbers[0]
+    trace_sample_stop = sample_numbers[-1] + 1
+    if any(reader_3d.num_trace_samples(trace_index) < trace_sample_stop for trace_index in positions):
+        trace_sample_stop = None  # Some traces are short, so read each to its end
+    sample_offsets = np.asarray(sample_numbers) - trace_sample_start
+
+    for trace_index, trace_samples in reader_3d.iter_trace_samples(positions, trace_sample_start, trace_sample_stop):
+        trace_array = np.asarray(trace_samples, array.dtype)
+        num_available = np.searchsorted(sample_offsets, len(trace_array))
+        array[positions[trace_index], :num_available] = trace_array[sample_offsets[:num_available]]
+
+
+def trace_index_grid(reader_3d, inline_numbers, xline_numbers):
+    """The trace indexes of a grid of inlines and crosslines.
+
+    Args:
+        reader_3d: A SegYReader3D.
+
+        inline_numbers: A sequence of inline numbers.
+
+        xline_numbers: A sequence of crossline numbers.
+
+    Returns:
+        A two-dimensional array of trace indexes, or -1 for missing traces,
+        indexed by position in inline_numbers and position in xline_numbers.
+    """
+    inline_grid, xline_grid = np.meshgrid(np.asarray(inline_numbers, dtype=np.int64),
+                                          np.asarray(xline_numbers, dtype=np.int64),
+                                          indexing='ij')
+    inline_xline_numbers = np.column_stack((inline_grid.ravel(), xline_grid.ravel()))
+    return reader_3d.trace_indexes_many(inline_xline_numbers, missing=-1).reshape(inline_grid.shape)
+
+
+def _sub_format(header_format_class, field_names):
+    """A SubFormat of header_format_class containing only the named fields."""
+
+    class SubFormat(metaclass=SubFormatMeta,
+                    parent_format=header_format_class,
+                    parent_field_names=field_names):
+        pass
+
+    return SubFormat
+
+
+def make_array(shape, dtype, null=None):
+    """Make an array filled with a null value.
+
+    Args:
+        shape: The shape of the array.
+
+        dtype: The numpy dtype of the array.
+
+        null: The value with which to fill the array. If None, a fully
+            masked array is returned.
+    """
     if null is None:
         return np.ma.masked_all(shape, dtype)
     array = np.empty(shape, dtype)
@@ -0,0 +1,157 @@
+"""Sample-major companion files for fast timeslice access.
+
+A SEG Y file stores the samples of each trace together, so reading a
+timeslice touches every trace in the file. A sample-major file stores the
+same volume transposed, indexed by [sample][inline][crossline], so that
+every timeslice is a single contiguous block.
+
+A sample-major file consists of a companion header, followed by a mask
+recording which traces are present, and then the transposed samples.
+
+Usage:
+
+    with open('survey.segy', 'rb') as segy_file, open('survey.smj', 'w+b') as sample_major_file:
+        reader_3d = create_reader(segy_file)
+        write_sample_major(reader_3d, sample_major_file)
+
+    with open('survey.smj', 'rb') as sample_major_file:
+        sample_major_reader = SampleMajorReader(sample_major_file)
+        timeslice = extract_timeslice_3d(sample_major_reader, 250)
+"""
+
+import numpy as np
+
+from segpy_numpy.companion import (align, write_companion_header, volume_metadata, volume_shape, num_buffered,
+                                   read_inline_slab, CompanionReader, DEFAULT_BUFFER_NUM_BYTES)
+from segpy_numpy.dtypes import make_dtype
+
+SAMPLE_MAJOR_MAGIC = b'SEGPYSMJ'
+
+
+def write_sample_major(reader_3d, fh, null=0, buffer_num_bytes=DEFAULT_BUFFER_NUM_BYTES, progress=None):
+    """Write a sample-major copy of a 3D seismic volume.
+
+    The source is read once, in slabs of as many inlines as will fit in the
+    buffer. Each slab is transposed in memory and written as one contiguous
+    block per sample, so memory use is bounded by the buffer size rather
+    than the size of the volume.
+
+    Args:
+        reader_3d: A SegYReader3D.
+
+        fh: A file-like object open for binary writing, which must support seeking.
+
+        null: The value stored for missing traces and for samples beyond the end
+            of short traces.
+
+        buffer_num_bytes: The approximate maximum number of bytes of samples to
+            hold in memory. At least one inline is always buffered.
+
+        progress: A unary callable which will be passed a number between zero
+            and one indicating the progress made. If provided, this callback
+            will be invoked at least once with an argument equal to one.
+
+    Raises:
+        TypeError: If progress is not callable.
+    """
+    progress_callback = progress if progress is not None else lambda p: None
+
+    if not callable(progress_callback):
+        raise TypeError("write_sample_major(): progress callback must be callable")
+
+    dtype = make_dtype(reader_3d.data_sample_format).newbyteorder('<')
+    metadata = volume_metadata(reader_3d, dtype)
+    inline_numbers = metadata['inline_numbers']
+    xline_numbers = metadata['xline_numbers']
+    shape = volume_shape(metadata)
+    data_offset = write_companion_header(fh, SAMPLE_MAJOR_MAGIC, metadata)
+    mask_offset, samples_offset = _layout(data_offset, shape)
+    timeslice_num_bytes = shape[0] * shape[1] * dtype.itemsize
+
+    mask = np.zeros(shape[:2], dtype=np.uint8)
+    fh.truncate(samples_offset + shape[2] * timeslice_num_bytes)
+
+    num_slab_inlines = num_buffered(shape[1] * shape[2] * dtype.itemsize, buffer_num_bytes)
+    for inline_begin in range(0, shape[0], num_slab_inlines):
+        slab_inline_numbers = inline_numbers[inline_begin:inline_begin + num_slab_inlines]
+        slab = np.full((shape[2], len(slab_inline_numbers), shape[1]), null, dtype)
+        read_inline_slab(reader_3d, slab.transpose(1, 2, 0), slab_inline_numbers, xline_numbers,
+                         mask[inline_begin:inline_begin + len(slab_inline_numbers)])
+
+        # Within each timeslice the inlines of the slab are contiguous
+        slab_offset = inline_begin * shape[1] * dtype.itemsize
+        for sample_number in range(shape[2]):
+            fh.seek(samples_offset + sample_number * timeslice_num_bytes + slab_offset)
+            fh.write(slab[sample_number].tobytes())
+
+        progress_callback((inline_begin + len(slab_inline_numbers)) / shape[0])
+
+    fh.seek(mask_offset)
+    fh.write(mask.tobytes())
+    progress_callback(1)
+
+
+class SampleMajorReader(CompanionReader):
+    """Read timeslices from a sample-major file produced by write_sample_major().
+
+    The file is memory-mapped, and each timeslice is read as a single contiguous block.
+    A SampleMajorReader can be passed to extract_timeslice_3d() in place of a SegYReader3D.
+    """
+
+    MAGIC = SAMPLE_MAJOR_MAGIC
+
+    def _map(self, metadata, data_offset):
+        mask_offset, samples_offset = _layout(data_offset, self._shape)
+        self._map_mask(mask_offset)
+        self._samples = np.ndarray((self._shape[2], self._shape[0], self._shape[1]),
+                                   dtype=self._encoded_dtype,
+                                   buffer=self._file_bytes,
+                                   offset=samples_offset)
+
+    def timeslice(self, sample_number, inline_numbers=None, xline_numbers=None, null=None):
+        """Read a timeslice as a two-dimensional array indexed by inline and crossline.
+
+        Args:
+            sample_number: The zero-based sample index.
+
+            inline_numbers: None (the default) for all inlines, a sequence of inline
+                numbers, or a slice to be applied to the sequence of all inline numbers.
+
+            xline_numbers: None (the default) for all crosslines, a sequence of crossline
+                numbers, or a slice to be applied to the sequence of all crossline numbers.
+
+            null: A null value. When None is specified as the null value a masked
+                array will be returned.
+
+        Returns:
+            A two-dimensional array. If null is None a masked array will be returned,
+            otherwise a regular array will be returned.
+
+        Raises:
+            ValueError: If the sample number or any of the line numbers are not present.
+        """
+        if not (0 <= sample_number < self._shape[2]):
+            raise ValueError("Sample number {} out of range 0 to {}".format(sample_number, self._shape[2]))
+        return self.timeslices([sample_number], inline_numbers, xline_numbers, null)[:, :, 0]
+
+    def timeslices(self, sample_numbers=None, inline_numbers=None, xline_numbers=None, null=None):
+        """Read several timeslices as a three-dimensional array indexed by inline, crossline and sample.
+
+        See timeslice() for a description of the arguments. sample_numbers may
+        be None (the default) for all samples, a sequence of zero-based sample
+        numbers, or a slice to be applied to the sequence of all sample numbers.
+        """
+        inline_positions, xline_positions, sample_numbers = self._positions(inline_numbers, xline_numbers,
+                                                                            sample_numbers)
+        result = self._make_result(inline_positions, xline_positions, sample_numbers, null)
+        for sample_index, sample_number in enumerate(sample_numbers):
+            timeslice = np.array(self._samples[sample_number])  # A single contiguous read
+            result[:, :, sample_index] = timeslice[np.ix_(inline_positions, xline_positions)]
+        return self._mask_missing(result, inline_positions, xline_positions, null)
+
+
+def _layout(data_offset, shape):
+    """The offsets of the trace mask and the first sample."""
+    mask_offset = data_offset
+    samples_offset = align(mask_offset + shape[0] * shape[1])
+    return mask_offset, samples_offset
@@ -0,0 +1,139 @@
+"""A lazy array-like view of a 3D seismic volume."""
+
+from numbers import Integral
+
+import numpy as np
+
+from segpy_numpy.dtypes import make_dtype
+from segpy_numpy.extract import populate_trace_array
+
+
+class VolumeArray:
+    """A read-only, array-like view of the samples in a SegYReader3D.
+
+    The view is indexed by (inline index, crossline index, sample index),
+    where the inline and crossline indexes are zero-based positions in the
+    sorted sequences of inline and crossline numbers. Nothing is read until
+    the view is indexed, at which point only the traces and samples needed
+    are read, in file order, with reads of neighbouring traces combined.
+
+    Usage:
+
+        volume = reader_3d.as_array()
+        inline = volume[10]
+        timeslice = volume[:, :, 250]
+        subvolume = volume[100:200, 300:400:2, 0:500]
+    """
+
+    def __init__(self, reader_3d, null=0):
+        """Initialize a VolumeArray.
+
+        Args:
+            reader_3d: A SegYReader3D.
+
+            null: The value presented for samples of missing traces and for
+                samples beyond the end of short traces.
+        """
+        self._reader_3d = reader_3d
+        self._null = null
+        self._inline_numbers = reader_3d.inline_numbers()
+        self._xline_numbers = reader_3d.xline_numbers()
+        self._shape = (len(self._inline_numbers), len(self._xline_numbers), reader_3d.max_num_trace_samples())
+        self._dtype = make_dtype(reader_3d.data_sample_format)
+
+    @property
+    def shape(self):
+        """The (num_inlines, num_xlines, num_samples) shape of the volume."""
+        return self._shape
+
+    @property
+    def dtype(self):
+        """The numpy dtype of the samples."""
+        return self._dtype
+
+    @property
+    def ndim(self):
+        return len(self._shape)
+
+    @property
+    def size(self):
+        return self._shape[0] * self._shape[1] * self._shape[2]
+
+    @property
+    def null(self):
+        """The value presented for missing samples."""
+        return self._null
+
+    def __len__(self):
+        return self._shape[0]
+
+    def __getitem__(self, key):
+        """Read part of the volume.
+
+        Args:
+            key: An integer, a slice, or a tuple of up to three integers and
+                slices, optionally including one Ellipsis. Integers remove the
+                corresponding dimension from the result.
+
+        Returns:
+            A numpy array, or a scalar if three integers are given.
+
+        Raises:
+            IndexError: If an integer index is out of range or there are too many indexes.
+            TypeError: If an index is neither an integer nor a slice.
+        """
+        indexes = self._normalize_key(key)
+        positions = [self._positions(index, length) for index, length in zip(indexes, self._shape)]
+        inline_positions, xline_positions, sample_positions = positions
+
+        # Samples are read in ascending order and reversed afterwards if necessary
+        reverse_samples = len(sample_positions) > 1 and sample_positions[0] > sample_positions[-1]
+        sample_numbers = sample_positions[::-1] if reverse_samples else sample_positions
+
+        inline_xline_numbers = [(self._inline_numbers[i], self._xline_numbers[j])
+                                for i in inline_positions
+                                for j in xline_positions]
+        array = np.full((len(inline_xline_numbers), len(sample_numbers)), self._null, self._dtype)
+        populate_trace_array(self._reader_3d, inline_xline_numbers, sample_numbers, array)
+
+        array = array.reshape((len(inline_positions), len(xline_positions), len(sample_numbers)))
+        if reverse_samples:
+            array = array[:, :, ::-1]
+        squeeze = tuple(axis for axis, index in enumerate(indexes) if isinstance(index, Integral))
+        return array.squeeze(axis=squeeze)[()] if squeeze else array
+
+    def __array__(self, dtype=None, copy=None):
+        array = self[...]
+        return array if dtype is None else array.astype(dtype)
+
+    def _normalize_key(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        num_ellipses = sum(1 for index in key if index is Ellipsis)
+        if num_ellipses > 1:
+            raise IndexError("{} index can only have a single ellipsis".format(self.__class__.__name__))
+        if num_ellipses == 1:
+            position = key.index(Ellipsis)
+            key = key[:position] + (slice(None),) * (self.ndim - len(key) + 1) + key[position + 1:]
+        if len(key) > self.ndim:
+            raise IndexError("Too many indices for {} of dimension {}".format(self.__class__.__name__, self.ndim))
+        return key + (slice(None),) * (self.ndim - len(key))
+
+    @staticmethod
+    def _positions(index, length):
+        if isinstance(index, slice):
+            return range(*index.indices(length))
+        if isinstance(index, Integral):
+            position = index + length if index < 0 else index
+            if not (0 <= position < length):
+                raise IndexError("Index {} out of range for axis of length {}".format(index, length))
+            return range(position, position + 1)
+        raise TypeError("{} indices must be integers or slices, not {}"
+                        .format(VolumeArray.__name__, type(index).__name__))
+
+    def __repr__(self):
+        return '{}(reader_3d={!r}, shape={}, dtype={})'.format(
+            self.__class__.__name__,
+            self._reader_3d,
+            self._shape,
+            self._dtype)
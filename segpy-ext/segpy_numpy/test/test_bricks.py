@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import segpy_numpy.bricks
+from segpy_numpy.bricks import BrickReader, write_bricks
+from segpy_numpy.companion import read_inline_slab
+from test.util import make_cube_reader
+
+
+@pytest.fixture
+def cube():
+    return np.arange(5 * 7 * 9, dtype=np.float32).reshape(5, 7, 9)
+
+
+def build_bricks(tmpdir, reader_3d, brick_shape=(2, 3, 4), buffer_num_bytes=10 ** 6):
+    path = str(tmpdir / 'cube.bricks')
+    with open(path, 'w+b') as fh:
+        write_bricks(reader_3d, fh, brick_shape, buffer_num_bytes=buffer_num_bytes)
+    return open(path, 'rb')
+
+
+class TestBricks:
+
+    def test_read_subvolume(self, tmpdir, cube):
+        with build_bricks(tmpdir, make_cube_reader(cube)) as fh:
+            brick_reader = BrickReader(fh)
+            assert brick_reader.shape == cube.shape
+            assert np.array_equal(brick_reader.read_subvolume(), cube)
+            subvolume = brick_reader.read_subvolume(range(2, 5), [1, 4, 7], slice(3, 8))
+            assert np.array_equal(subvolume, cube[1:4][:, [0, 3, 6]][:, :, 3:8])
+
+    def test_slices(self, tmpdir, cube):
+        with build_bricks(tmpdir, make_cube_reader(cube)) as fh:
+            brick_reader = BrickReader(fh)
+            assert np.array_equal(brick_reader.inline(3), cube[2])
+            assert np.array_equal(brick_reader.xline(6, sample_numbers=[0, 8]), cube[:, 5, [0, 8]])
+            assert np.array_equal(brick_reader.timeslice(7), cube[:, :, 7])
+
+    @pytest.mark.parametrize("buffer_num_bytes", [1, 2 * 6 * 12 * 4, 10 ** 6])
+    def test_missing_traces(self, tmpdir, cube, buffer_num_bytes):
+        # Inlines 1 and 2 at crosslines 1 to 3 fill a whole column of bricks
+        missing = {(i, j) for i in (1, 2) for j in (1, 2, 3)} | {(5, 7)}
+        with build_bricks(tmpdir, make_cube_reader(cube, missing=missing), buffer_num_bytes=buffer_num_bytes) as fh:
+            brick_reader = BrickReader(fh)
+            timeslice = brick_reader.timeslice(4)
+            expected_mask = np.zeros(cube.shape[:2], dtype=bool)
+            for i, j in missing:
+                expected_mask[i - 1, j - 1] = True
+            assert np.array_equal(timeslice.mask, expected_mask)
+            assert np.array_equal(timeslice.compressed(), cube[:, :, 4][~expected_mask])
+            assert (brick_reader.inline(1, null=-1)[:3] == -1).all()
+
+    def test_slabs_are_bounded_by_buffer(self, tmpdir, cube, monkeypatch):
+        slab_shapes = []
+
+        def recording_read_inline_slab(reader_3d, slab, *args):
+            slab_shapes.append(slab.shape)
+            read_inline_slab(reader_3d, slab, *args)
+
+        monkeypatch.setattr(segpy_numpy.bricks, 'read_inline_slab', recording_read_inline_slab)
+        # Two columns of bricks, each of 2 inlines, 3 crosslines and 12 padded samples
+        with build_bricks(tmpdir, make_cube_reader(cube), buffer_num_bytes=2 * 2 * 3 * 12 * 4) as fh:
+            assert np.array_equal(BrickReader(fh).read_subvolume(), cube)
+        assert set(slab_shapes) == {(2, 6, 12), (2, 3, 12)}
+
+    def test_not_a_brick_file_raises_value_error(self, tmpdir):
+        path = tmpdir / 'not.bricks'
+        path.write_binary(b'0123456789abcdef')
+        with open(str(path), 'rb') as fh:
+            with pytest.raises(ValueError):
+                BrickReader(fh)
+
+    def test_progress(self, tmpdir, cube):
+        progress = []
+        with open(str(tmpdir / 'cube.bricks'), 'w+b') as fh:
+            write_bricks(make_cube_reader(cube), fh, (2, 3, 4), progress=progress.append)
+        assert progress[-1] == 1
+        assert progress == sorted(progress)
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from segpy.field_types import Int16, Int32
+from segpy.header import FormatMeta, field
+from segpy.packer import make_header_packer
+from segpy.reader import create_reader
+from segpy.trace_header import TraceHeaderRev1
+from segpy_numpy.dtypes import compile_dtype
+from segpy_numpy.extract import (extract_trace_headers, extract_trace_header_table,
+                                 extract_trace_header_field_3d, map_trace_headers)
+from test.util import make_cube_reader, write_cube
+
+
+class ShuffledHeader(metaclass=FormatMeta):
+
+    START_OFFSET_IN_BYTES = 1
+    LENGTH_IN_BYTES = 10
+
+    second = field(Int16, offset=5, default=2, documentation="The second field.")
+    first = field(Int32, offset=1, default=1, documentation="The first field.")
+    alias = field(Int16, offset=5, default=2, documentation="Coincides with the second field.")
+
+
+class OverlappingHeader(metaclass=FormatMeta):
+
+    START_OFFSET_IN_BYTES = 1
+    LENGTH_IN_BYTES = 8
+
+    first = field(Int32, offset=1, default=0, documentation="The first field.")
+    second = field(Int32, offset=3, default=0, documentation="Overlaps the first field.")
+
+
+@pytest.fixture(params=['>', '<'])
+def endian(request):
+    return request.param
+
+
+class TestCompileDtype:
+
+    def test_decodes_packed_trace_header(self, endian):
+        header = TraceHeaderRev1(line_sequence_num=7, inline_number=-3, cdp_x=123456, num_samples=1000)
+        buffer = make_header_packer(TraceHeaderRev1, endian).pack(header)
+        record = np.frombuffer(buffer, dtype=compile_dtype(TraceHeaderRev1, endian))[0]
+        assert record.dtype.names == TraceHeaderRev1.ordered_field_names()
+        assert all(record[name] == getattr(header, name) for name in record.dtype.names)
+
+    def test_coincident_fields_share_bytes(self, endian):
+        dtype = compile_dtype(ShuffledHeader, endian)
+        assert dtype.itemsize == 10
+        assert dtype.fields['second'][1] == dtype.fields['alias'][1] == 4
+        buffer = make_header_packer(ShuffledHeader, endian).pack(ShuffledHeader(first=-1, second=5, alias=5))
+        record = np.frombuffer(buffer, dtype=dtype)[0]
+        assert (record['first'], record['second'], record['alias']) == (-1, 5, 5)
+
+    def test_overlapping_fields_raise_value_error(self):
+        with pytest.raises(ValueError):
+            compile_dtype(OverlappingHeader)
+
+
+def make_cube(shape):
+    return np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+
+
+class TestExtractTraceHeaders:
+
+    def test_unmapped_table_matches_trace_headers(self):
+        reader = make_cube_reader(make_cube((3, 4, 5)), missing={(2, 2)})
+        assert map_trace_headers(reader) is None
+        table = extract_trace_header_table(reader)
+        assert table.dtype.names == TraceHeaderRev1.ordered_field_names()
+        for trace_index in reader.trace_indexes():
+            header = reader.trace_header(trace_index)
+            assert all(table[trace_index][name] == getattr(header, name) for name in table.dtype.names)
+
+    def test_mapped_and_unmapped_tables_agree(self, tmpdir):
+        cube = make_cube((3, 4, 5))
+        path = tmpdir / 'cube.segy'
+        write_cube(path, cube)
+        with open(str(path), 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None, dimensionality=3)
+            assert map_trace_headers(reader) is not None
+            mapped = extract_trace_header_table(reader, ['inline_number', TraceHeaderRev1.crossline_number],
+                                                trace_indexes=[5, 0, 11])
+        unmapped = extract_trace_header_table(make_cube_reader(cube), ['inline_number', 'crossline_number'],
+                                              trace_indexes=[5, 0, 11])
+        assert mapped.tolist() == unmapped.tolist() == [(2, 2), (1, 1), (3, 4)]
+
+    def test_extract_trace_headers(self):
+        reader = make_cube_reader(make_cube((2, 3, 5)))
+        headers = extract_trace_headers(reader, ['crossline_number', 'file_sequence_num'], trace_indexes=range(1, 4))
+        assert headers.crossline_number.tolist() == [2, 3, 1]
+        assert headers.file_sequence_num.tolist() == [2, 3, 4]
+        assert headers.crossline_number.dtype == np.dtype('i4')
+
+    def test_out_of_range_trace_index_raises_value_error(self):
+        reader = make_cube_reader(make_cube((2, 3, 5)))
+        with pytest.raises(ValueError):
+            extract_trace_header_table(reader, ['inline_number'], trace_indexes=[6])
+
+    def test_header_field_3d_with_missing_trace(self):
+        reader = make_cube_reader(make_cube((3, 4, 5)), missing={(2, 3)})
+        headers = extract_trace_header_field_3d(reader, ['ensemble_num'], inline_numbers=[2, 3], null=-1)
+        assert headers.ensemble_num.tolist() == [[4, 5, -1, 6], [7, 8, 9, 10]]
@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+import numpy as np
+
+from segpy_numpy.extract import extract_inline_3d, extract_xline_3d
+from test.util import make_cube_reader
+
+
+def make_cube(shape):
+    return np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+
+
+class TestExtractLines:
+
+    def test_inline(self):
+        cube = make_cube((3, 4, 10))
+        reader = make_cube_reader(cube)
+        assert np.array_equal(extract_inline_3d(reader, 2), cube[1])
+
+    def test_xline_with_numbered_samples(self):
+        cube = make_cube((5, 4, 10))
+        reader = make_cube_reader(cube)
+        xline = extract_xline_3d(reader, 3, inline_numbers=[1, 4, 5], sample_numbers=[0, 4, 9])
+        assert np.array_equal(xline, cube[[0, 3, 4], 2][:, [0, 4, 9]])
+
+    def test_missing_traces_are_null(self):
+        cube = make_cube((3, 4, 6))
+        reader = make_cube_reader(cube, missing={(2, 3)})
+        xline = extract_xline_3d(reader, 3, sample_numbers=range(1, 5), null=-1)
+        expected = cube[:, 2, 1:5].copy()
+        expected[1] = -1
+        assert np.array_equal(xline, expected)
+
+    def test_xline_read_in_a_single_pass(self):
+        cube = make_cube((6, 5, 8))
+        reader = make_cube_reader(cube)
+        with patch.object(reader, 'trace_samples', side_effect=AssertionError):
+            xline = extract_xline_3d(reader, 2)
+        assert np.array_equal(xline, cube[:, 1])
+
+    def test_contiguous_inline_read_with_single_read(self):
+        cube = make_cube((3, 4, 10))
+        reader = make_cube_reader(cube, missing={(2, 3)})
+        with patch.object(reader._fh, 'read', wraps=reader._fh.read) as read:
+            inline = extract_inline_3d(reader, 2, xline_numbers=[1, 2, 4], sample_numbers=range(2, 8), null=-1)
+        assert read.call_count == 1
+        assert np.array_equal(inline, cube[1][[0, 1, 3]][:, 2:8])
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from segpy.reader import create_reader
+from segpy_numpy.dtypes import ibm_to_ieee
+from segpy_numpy.extract import extract_timeslice_3d, extract_timeslices_3d, map_trace_samples
+from test.util import make_cube_reader, write_cube
+
+
+def make_cube(shape, data_sample_format):
+    cube = np.arange(np.prod(shape)).reshape(shape)
+    return cube if data_sample_format in (2, 3) else cube / np.float32(8)
+
+
+@pytest.fixture(params=[1, 2, 3, 5])
+def data_sample_format(request):
+    return request.param
+
+
+class TestExtractTimeslices:
+
+    def test_mapped_timeslices(self, tmpdir, data_sample_format):
+        cube = make_cube((3, 4, 10), data_sample_format)
+        path = tmpdir / 'cube.segy'
+        write_cube(path, cube, data_sample_format)
+        with open(str(path), 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None, dimensionality=3)
+            assert map_trace_samples(reader) is not None
+            slices = extract_timeslices_3d(reader, [2, 5, 9])
+            assert np.array_equal(slices, cube[:, :, [2, 5, 9]])
+            timeslice = extract_timeslice_3d(reader, 7, inline_numbers=[2, 3], xline_numbers=slice(1, None))
+            assert np.array_equal(timeslice, cube[1:3, 1:, 7])
+
+    def test_unmapped_timeslices(self, data_sample_format):
+        cube = make_cube((3, 4, 10), data_sample_format)
+        reader = make_cube_reader(cube, data_sample_format)
+        assert map_trace_samples(reader) is None
+        slices = extract_timeslices_3d(reader, range(3, 8, 2))
+        assert np.array_equal(slices, cube[:, :, 3:8:2])
+
+    def test_missing_traces_are_masked(self, tmpdir):
+        cube = make_cube((2, 2, 5), 5)
+        path = tmpdir / 'cube.segy'
+        write_cube(path, cube, missing={(2, 1)})
+        with open(str(path), 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None, dimensionality=3)
+            timeslice = extract_timeslice_3d(reader, 3)
+        assert timeslice.mask.tolist() == [[False, False], [True, False]]
+        assert timeslice[0, 1] == cube[0, 1, 3]
+        assert timeslice[1, 1] == cube[1, 1, 3]
+
+
+class TestIbmToIeee:
+
+    @pytest.mark.parametrize("word, value", [(0x00000000, 0.0),
+                                             (0x41100000, 1.0),
+                                             (0xc1100000, -1.0),
+                                             (0x42640000, 100.0),
+                                             (0x40800000, 0.5),
+                                             (0xc276a000, -118.625)])
+    def test_known_values(self, word, value):
+        assert ibm_to_ieee(np.array([word], dtype=np.uint32))[0] == value
+
+    def test_overflow_is_infinite(self):
+        assert np.isinf(ibm_to_ieee(np.array([0x7fffffff], dtype=np.uint32))[0])
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from segpy_numpy.extract import extract_timeslice_3d
+from segpy_numpy.transpose import SampleMajorReader, write_sample_major
+from test.util import make_cube_reader
+
+
+@pytest.fixture
+def cube():
+    return np.arange(5 * 7 * 9, dtype=np.float32).reshape(5, 7, 9)
+
+
+def build_sample_major(tmpdir, reader_3d, buffer_num_bytes):
+    path = str(tmpdir / 'cube.smj')
+    with open(path, 'w+b') as fh:
+        write_sample_major(reader_3d, fh, buffer_num_bytes=buffer_num_bytes)
+    return open(path, 'rb')
+
+
+class TestSampleMajor:
+
+    @pytest.mark.parametrize("buffer_num_bytes", [1, 2 * 7 * 9 * 4, 10 ** 6])
+    def test_timeslices(self, tmpdir, cube, buffer_num_bytes):
+        with build_sample_major(tmpdir, make_cube_reader(cube), buffer_num_bytes) as fh:
+            reader = SampleMajorReader(fh)
+            assert reader.shape == cube.shape
+            assert np.array_equal(reader.timeslices(), cube)
+            for sample_number in range(cube.shape[2]):
+                assert np.array_equal(reader.timeslice(sample_number), cube[:, :, sample_number])
+
+    def test_extract_timeslice_delegates(self, tmpdir, cube):
+        with build_sample_major(tmpdir, make_cube_reader(cube, missing={(3, 4)}), 1000) as fh:
+            reader = SampleMajorReader(fh)
+            timeslice = extract_timeslice_3d(reader, 6, inline_numbers=range(2, 5), xline_numbers=[1, 4], null=-1)
+        expected = cube[1:4][:, [0, 3], 6]
+        expected[1, 1] = -1
+        assert np.array_equal(timeslice, expected)
+
+    def test_sample_number_out_of_range_raises_value_error(self, tmpdir, cube):
+        with build_sample_major(tmpdir, make_cube_reader(cube), 1000) as fh:
+            with pytest.raises(ValueError):
+                SampleMajorReader(fh).timeslice(9)
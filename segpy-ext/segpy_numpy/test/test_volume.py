@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from segpy_numpy.volume import VolumeArray
+from test.util import make_cube_reader
+
+
+@pytest.fixture
+def cube():
+    return np.arange(4 * 5 * 6, dtype=np.float32).reshape(4, 5, 6)
+
+
+class TestVolumeArray:
+
+    @pytest.mark.parametrize("key", [
+        0,
+        -1,
+        (1, 2),
+        (1, 2, 3),
+        (slice(None), slice(None), 3),
+        (slice(1, 3), slice(None, None, 2), slice(2, 5)),
+        (slice(None, None, -1), 4, slice(5, 0, -2)),
+        (Ellipsis, 2),
+        (2, Ellipsis),
+        slice(10, 20),
+    ])
+    def test_indexing_matches_numpy(self, cube, key):
+        volume = make_cube_reader(cube).as_array()
+        assert volume.shape == cube.shape
+        assert volume.dtype == cube.dtype
+        assert np.array_equal(volume[key], cube[key])
+
+    def test_asarray(self, cube):
+        volume = make_cube_reader(cube).as_array()
+        assert np.array_equal(np.asarray(volume), cube)
+
+    def test_missing_traces_are_null(self, cube):
+        volume = VolumeArray(make_cube_reader(cube, missing={(2, 3)}), null=-1)
+        assert (volume[1, 2] == -1).all()
+        assert np.array_equal(volume[1, 3], cube[1, 3])
+
+    @pytest.mark.parametrize("key", [4, (0, 5), (0, 0, -7), (0, 0, 0, 0)])
+    def test_out_of_range_raises_index_error(self, cube, key):
+        with pytest.raises(IndexError):
+            make_cube_reader(cube).as_array()[key]
+
+    def test_non_integer_index_raises_type_error(self, cube):
+        with pytest.raises(TypeError):
+            make_cube_reader(cube).as_array()[1.5]
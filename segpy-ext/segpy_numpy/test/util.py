@@ -0,0 +1,81 @@
+from io import BytesIO
+
+from segpy.binary_reel_header import BinaryReelHeader
+from segpy.dataset import Dataset
+from segpy.reader import create_reader
+from segpy.toolkit import CARDS_PER_HEADER
+from segpy.trace_header import TraceHeaderRev1
+from segpy.writer import write_segy
+
+
+class CubeDataset(Dataset):
+    """A Dataset of traces from a three-dimensional numpy array.
+
+    Inline and crossline numbers are one-based array indexes. Traces are
+    sorted by inline then crossline.
+    """
+
+    def __init__(self, samples, data_sample_format=5, missing=()):
+        """
+        Args:
+            samples: A three-dimensional array indexed by inline index, crossline
+                index and sample index.
+
+            data_sample_format: The SEG Y data sample format code. Defaults
+                to IEEE float32.
+
+            missing: An optional collection of (inline_number, xline_number)
+                tuples for which no trace will be present.
+        """
+        self._samples = samples
+        self._inline_xline_numbers = [(i + 1, j + 1)
+                                      for i in range(samples.shape[0])
+                                      for j in range(samples.shape[1])
+                                      if (i + 1, j + 1) not in missing]
+        self._binary_reel_header = BinaryReelHeader(num_samples=samples.shape[2],
+                                                    data_sample_format=data_sample_format,
+                                                    sample_interval=4000,
+                                                    format_revision_num=256)
+
+    @property
+    def textual_reel_header(self):
+        return [''] * CARDS_PER_HEADER
+
+    @property
+    def binary_reel_header(self):
+        return self._binary_reel_header
+
+    @property
+    def extended_textual_header(self):
+        return []
+
+    def trace_indexes(self):
+        return iter(range(self.num_traces()))
+
+    def num_traces(self):
+        return len(self._inline_xline_numbers)
+
+    def trace_header(self, trace_index):
+        inline_number, xline_number = self._inline_xline_numbers[trace_index]
+        return TraceHeaderRev1(file_sequence_num=trace_index + 1,
+                               ensemble_num=trace_index,
+                               inline_number=inline_number,
+                               crossline_number=xline_number,
+                               num_samples=self._samples.shape[2])
+
+    def trace_samples(self, trace_index, start=None, stop=None):
+        inline_number, xline_number = self._inline_xline_numbers[trace_index]
+        return self._samples[inline_number - 1, xline_number - 1, start:stop].tolist()
+
+
+def write_cube(path, samples, data_sample_format=5, missing=()):
+    """Write a three-dimensional array to a SEG Y file. See CubeDataset."""
+    with open(str(path), 'wb') as fh:
+        write_segy(fh, CubeDataset(samples, data_sample_format, missing))
+
+
+def make_cube_reader(samples, data_sample_format=5, missing=()):
+    """Write a three-dimensional array to an in-memory SEG Y file and create an uncached reader for it."""
+    write_stream = BytesIO()
+    write_segy(write_stream, CubeDataset(samples, data_sample_format, missing))
+    return create_reader(BytesIO(write_stream.getvalue()), cache_directory=None, dimensionality=3)
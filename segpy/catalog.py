@@ -9,12 +9,29 @@ the CatalogBuilder class which will analyse the contents of the
 mapping to find a space and time efficient representation.
 """
 
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import Mapping, Sequence, OrderedDict
 from fractions import Fraction
 import reprlib
 from segpy.sorted_set import SortedFrozenSet
 
-from segpy.util import contains_duplicates, measure_stride, make_sorted_distinct_sequence
+from segpy.util import contains_duplicates, measure_stride, measure_runs, make_sorted_distinct_sequence
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Set to True to build catalogs in pure Python even when NumPy is available.
+force_python_catalog_builder = False
+
+# The value returned by get_many() for keys which are not present
+MISSING = -1
+
+# The largest signed 64-bit integer. NumPy arithmetic on int64 arrays wraps silently, so
+# results which could exceed this are computed in pure Python instead.
+_INT64_MAX = 2 ** 63 - 1
 
 
 class CatalogBuilder(object):
@@ -26,6 +43,12 @@ class CatalogBuilder(object):
     accumulates values and then, once all values have been added, analyzes
     the keys and values to produce a more optimized representation of the
     mapping.
+
+    Items are accumulated economically. While integer keys and values
+    arrive with constant strides only the description of the progression
+    is retained. When the regularity is first broken, or for keys which are
+    pairs of integers, items are accumulated in typed arrays. Only other
+    kinds of key or value are held in a list.
     """
 
     def __init__(self, mapping=None):
@@ -34,7 +57,7 @@ class CatalogBuilder(object):
         Args:
             mapping: An optional mapping (such as a dictionary) of items.
         """
-        self._catalog = []
+        self._catalog = None
         if mapping is not None:
             for key, value in mapping.items():
                 self.add(key, value)
@@ -47,54 +70,164 @@ class CatalogBuilder(object):
         accepted by this call without complaint.
 
         """
-        self._catalog.append((index, value))
-
-    def create(self):
+        if self._catalog is None:
+            self._catalog = _initial_items(index, value)
+        elif self._catalog.append(index, value):
+            return
+        else:
+            # The items can no longer be held in their current form
+            self._catalog = _general_items(self._catalog, index, value)
+
+    def create(self, allow_duplicates=False):
         """Create a possibly more optimized representation of the mapping.
 
         In this worst case, this method returns an object which is
         essentially an immutable dictionary. In the best case, the
         space savings can be vast.
 
+        Args:
+            allow_duplicates: If True, and some indexes were added more than
+                once, a MultiValuedCatalog or MultiValuedCatalog2D mapping
+                each index to all of its values is returned.
+
         Returns:
             A mapping, if a unique mapping from indexes to values is
-            possible, otherwise None.
+            possible or duplicates are allowed and the items are integers,
+            otherwise None.
 
         """
 
         # This method examines the contents of the mapping using
         # various heuristics to come up with a better representation.
 
+        if self._catalog is None:
+            self._catalog = _ListItems()
+
         if len(self._catalog) < 2:
             return DictionaryCatalog(self._catalog)
 
+        if isinstance(self._catalog, _RegularItems):
+            # Keys and values were regular as they were added
+            return self._catalog.create()
+
+        columns = self._vectorizable_columns()
+        if columns is not None:
+            return self._create_vectorized(columns, allow_duplicates)
+
         # In-place sort by index
-        self._catalog.sort(key=lambda index_value: index_value[0])
+        self._catalog.sort()
 
         if contains_duplicates(index for index, value in self._catalog):
-            return None
+            return self._create_multi_valued() if allow_duplicates else None
 
-        if all(isinstance(index, Sequence) and (len(index) == 2)
-               for index, value in self._catalog):
-            return self._create_catalog_2()
+        if all(isinstance(index, Sequence) for index, value in self._catalog):
+            if all(len(index) == 2 for index, value in self._catalog):
+                return self._create_catalog_2()
+            # Dictionary strategy - composite keys of other lengths
+            return DictionaryCatalog(self._catalog)
 
         return self._create_catalog_1()
 
-    def _create_catalog_1(self):
+    def _vectorizable_columns(self):
+        """NumPy views of the item arrays, or None if the items should be classified in pure Python."""
+        if numpy is None or force_python_catalog_builder or not isinstance(self._catalog, _ArrayItems):
+            return None
+        columns = [numpy.frombuffer(column, dtype=numpy.int64) for column in self._catalog.columns]
+        # The differences between items, which are computed throughout classification, must not overflow.
+        # Products of differences are checked where they are computed.
+        if any(int(column.max()) - int(column.min()) > _INT64_MAX for column in columns):
+            return None
+        return columns
+
+    def _create_vectorized(self, columns, allow_duplicates=False):
+        """Create a catalog using NumPy operations over the item arrays.
+
+        The catalog produced is identical to that produced in pure Python.
+        """
+        order = numpy.lexsort(columns[-2::-1])
+        columns = [column[order] for column in columns]
+        self._catalog = _ArrayItems.from_columns([_array_from_numpy(column) for column in columns])
+
+        key_diffs_are_zero = [numpy.diff(column) == 0 for column in columns[:-1]]
+        if numpy.logical_and.reduce(key_diffs_are_zero).any():
+            # Contains duplicates
+            return self._create_multi_valued(columns) if allow_duplicates else None
+
+        if len(columns) == 3:
+            return self._create_catalog_2(columns)
+        return self._create_catalog_1(columns)
+
+    def _create_multi_valued(self, columns=None):
+        """Create a catalog mapping each distinct key to the run of values added with it.
+
+        The items must already be sorted by key.
+
+        Args:
+            columns: Optional NumPy arrays of the sorted keys (or key components) and
+                values, which are used to accelerate locating the runs.
+
+        Returns:
+            A MultiValuedCatalog or MultiValuedCatalog2D, or None if the keys are
+            not integers or pairs of integers, or the values are not integers.
+        """
+        if columns is not None:
+            key_changes = numpy.logical_or.reduce([numpy.diff(column) != 0 for column in columns[:-1]])
+            starts = numpy.concatenate(([0], numpy.flatnonzero(key_changes) + 1))
+            key_columns = [_array_from_numpy(column[starts]) for column in columns[:-1]]
+            offsets = _array_from_numpy(numpy.append(starts, len(columns[-1])))
+            values = self._catalog.columns[-1]
+        else:
+            keys = []
+            offsets = array('q')
+            for position, (index, value) in enumerate(self._catalog):
+                if position == 0 or index != keys[-1]:
+                    keys.append(index)
+                    offsets.append(position)
+            offsets.append(len(self._catalog))
+            if all(_is_integer(key) for key in keys):
+                key_columns = [_int64_array(keys)]
+            elif all(isinstance(key, Sequence) and len(key) == 2 for key in keys):
+                key_columns = [_int64_array(i for i, j in keys), _int64_array(j for i, j in keys)]
+            else:
+                return None
+            values = _int64_array(value for index, value in self._catalog)
+            if values is None or any(column is None for column in key_columns):
+                return None
+
+        if len(key_columns) == 1:
+            return MultiValuedCatalog(key_columns[0], offsets, values)
+        i_range = make_sorted_distinct_sequence(sorted(set(key_columns[0])))
+        j_range = make_sorted_distinct_sequence(sorted(set(key_columns[1])))
+        return MultiValuedCatalog2D(i_range, j_range, key_columns[0], key_columns[1], offsets, values)
+
+    def _create_catalog_1(self, columns=None):
         """Create a catalog for one-dimensional integer keys (i.e. scalars)
+
+        Args:
+            columns: Optional NumPy arrays of the sorted keys and values, which
+                are used to accelerate the classification.
         """
         index_min = self._catalog[0][0]
         index_max = self._catalog[-1][0]
-        index_stride = measure_stride(index for index, value in self._catalog)
+        if columns is None:
+            index_stride = measure_stride(index for index, value in self._catalog)
+        else:
+            index_stride = _numpy_stride(columns[0])
         assert index_stride != 0
 
         value_start = self._catalog[0][1]
         value_stop = self._catalog[-1][1]
-        value_stride = measure_stride(value for index, value in self._catalog)
+        if columns is None:
+            value_stride = measure_stride(value for index, value in self._catalog)
+        else:
+            value_stride = _numpy_stride(columns[1])
 
         if index_stride is None and value_stride is None:
-            # Dictionary strategy - arbitrary keys and values
-            return DictionaryCatalog(self._catalog)
+            # Piecewise linear or sorted array strategy - arbitrary keys and values
+            piecewise_catalog = self._create_piecewise_catalog_1(columns)
+            if piecewise_catalog is not None:
+                return piecewise_catalog
+            return self._create_sorted_catalog_1()
 
         if index_stride is not None and value_stride == 0:
             assert value_start == value_stop
@@ -110,7 +243,11 @@ class CatalogBuilder(object):
                     value_start)
 
         if index_stride is not None and value_stride is None:
-            # Regular index - regular keys and arbitrary values
+            # Regular index - regular keys and arbitrary values, unless
+            # the values are mostly regular
+            piecewise_catalog = self._create_piecewise_catalog_1(columns)
+            if piecewise_catalog is not None:
+                return piecewise_catalog
             return RegularCatalog(index_min,
                                   index_max,
                                   index_stride,
@@ -125,30 +262,161 @@ class CatalogBuilder(object):
                                         value_stop,
                                         value_stride)
 
-        return DictionaryCatalog(self._catalog)
+        return self._create_sorted_catalog_1()
+
+    def _create_piecewise_catalog_1(self, columns=None):
+        """Create a catalog from runs of regularly spaced keys and values.
+
+        Returns:
+            A PiecewiseLinearCatalog, or None if the runs would occupy more
+            space than a SortedArrayCatalog of the same items.
+        """
+        # The smallest number of runs which would occupy at least as much space as sorted arrays
+        max_num_runs = -(-2 * len(self._catalog) // PiecewiseLinearCatalog.NUM_RUN_FIELDS)
+        if columns is None:
+            runs = measure_runs(self._catalog)
+        else:
+            runs = _numpy_measure_runs(columns[0], columns[1], max_num_runs)
+        if runs is None or len(runs) >= max_num_runs:
+            return None
+        columns = [_int64_array(run[field] for run in runs)
+                   for field in range(PiecewiseLinearCatalog.NUM_RUN_FIELDS)]
+        if any(column is None for column in columns):
+            return None
+        return PiecewiseLinearCatalog(*columns)
+
+    def _create_sorted_catalog_1(self):
+        """Create a catalog for arbitrary scalar keys and values.
+
+        Keys and values which can be represented as 64-bit integers are stored
+        in arrays. Otherwise a dictionary is used.
+        """
+        if isinstance(self._catalog, _ArrayItems):
+            return SortedArrayCatalog(*self._catalog.columns)
+        keys = _int64_array(index for index, value in self._catalog)
+        values = _int64_array(value for index, value in self._catalog)
+        if keys is None or values is None:
+            return DictionaryCatalog(self._catalog)
+        return SortedArrayCatalog(keys, values)
 
-    def _create_catalog_2(self):
+    def _create_catalog_2(self, columns=None):
         """Create a catalog for two-dimensional integer keys.
 
         Each key must be a two-element sequence.
+
+        Args:
+            columns: Optional NumPy arrays of the sorted i and j key components and
+                values, which are used to accelerate the classification.
         """
-        i_sorted = make_sorted_distinct_sequence(i for (i, j), value in self._catalog)
-        j_sorted = make_sorted_distinct_sequence(j for (i, j), value in self._catalog)
+        if columns is None:
+            i_sorted = make_sorted_distinct_sequence(i for (i, j), value in self._catalog)
+            j_sorted = make_sorted_distinct_sequence(j for (i, j), value in self._catalog)
+        else:
+            i_sorted = make_sorted_distinct_sequence(numpy.unique(columns[0]).tolist())
+            j_sorted = make_sorted_distinct_sequence(numpy.unique(columns[1]).tolist())
 
         i_is_regular = isinstance(i_sorted, range)
         j_is_regular = isinstance(j_sorted, range)
 
         if i_is_regular and j_is_regular:
-            is_rm, diff = self._is_row_major(i_sorted, j_sorted)
+            is_rm, diff = self._is_row_major(i_sorted, j_sorted, columns)
             if is_rm:
                 return RowMajorCatalog2D(i_sorted, j_sorted, diff)
+            coefficients = self._linear_coefficients(i_sorted, j_sorted, columns)
+            if coefficients is not None:
+                return LinearRegularCatalog2D(i_sorted, j_sorted, *coefficients)
+            masked_catalog = self._create_masked_catalog_2(i_sorted, j_sorted, columns)
+            if masked_catalog is not None:
+                return masked_catalog
+
+        if isinstance(self._catalog, _ArrayItems):
+            return SortedArrayCatalog2D(i_sorted, j_sorted, *self._catalog.columns)
+        i_keys = _int64_array(i for (i, j), value in self._catalog)
+        j_keys = _int64_array(j for (i, j), value in self._catalog)
+        values = _int64_array(value for index, value in self._catalog)
+        if i_keys is None or j_keys is None or values is None:
+            return DictionaryCatalog2D(i_sorted, j_sorted, self._catalog)
+        return SortedArrayCatalog2D(i_sorted, j_sorted, i_keys, j_keys, values)
+
+    def _create_masked_catalog_2(self, i_sorted, j_sorted, columns=None):
+        """Create a catalog for a regular grid with holes.
 
-        return DictionaryCatalog2D(i_sorted, j_sorted, self._catalog)
+        Returns:
+            A MaskedRowMajorCatalog2D if the values, in row-major key order,
+            are regularly spaced and the grid is dense enough for a bitmap to
+            occupy less space than a SortedArrayCatalog2D, otherwise None.
+        """
+        num_cells = len(i_sorted) * len(j_sorted)
+        if num_cells > MaskedRowMajorCatalog2D.MAX_CELLS_PER_ITEM * len(self._catalog):
+            return None
+        if columns is None:
+            value_stride = measure_stride(value for index, value in self._catalog)
+        else:
+            value_stride = _numpy_stride(columns[2])
+        if not value_stride:
+            return None
+        num_j = len(j_sorted)
+        num_words = -(-num_cells // MaskedRowMajorCatalog2D.WORD_NUM_BITS)
+        if columns is None:
+            words = array('Q', [0]) * num_words
+            for (i, j), value in self._catalog:
+                cell = i_sorted.index(i) * num_j + j_sorted.index(j)
+                word_index, bit = divmod(cell, MaskedRowMajorCatalog2D.WORD_NUM_BITS)
+                words[word_index] |= 1 << bit
+        else:
+            cells = (((columns[0] - i_sorted.start) // i_sorted.step) * num_j
+                     + (columns[1] - j_sorted.start) // j_sorted.step)
+            bits = numpy.left_shift(numpy.uint64(1), (cells % MaskedRowMajorCatalog2D.WORD_NUM_BITS).astype(numpy.uint64))
+            numpy_words = numpy.zeros(num_words, dtype=numpy.uint64)
+            numpy.bitwise_or.at(numpy_words, cells // MaskedRowMajorCatalog2D.WORD_NUM_BITS, bits)
+            words = array('Q')
+            words.frombytes(numpy_words.tobytes())
+        return MaskedRowMajorCatalog2D(i_sorted, j_sorted, words, self._catalog[0][1], value_stride)
+
+    def _linear_coefficients(self, i_sorted, j_sorted, columns=None):
+        """Determine whether values are a linear function of the positions of keys in a complete grid.
+
+        This recognises row-major and column-major orderings, in ascending
+        or descending order along either axis, with any constant offset.
 
-    def _is_row_major(self, i_sorted, j_sorted):
+        Returns:
+            An (i_coefficient, j_coefficient, constant) tuple, or None if the values
+            are not a linear function of the key positions.
+        """
+        num_i = len(i_sorted)
+        num_j = len(j_sorted)
+        if len(self._catalog) != num_i * num_j:
+            return None
+        # Sorted keys of a complete grid are in row-major order
+        constant = self._catalog[0][1]
+        j_coefficient = self._catalog[1][1] - constant if num_j > 1 else 0
+        i_coefficient = self._catalog[num_j][1] - constant if num_i > 1 else 0
+        max_magnitude = abs(constant) + (num_i - 1) * abs(i_coefficient) + (num_j - 1) * abs(j_coefficient)
+        if columns is not None and max_magnitude <= _INT64_MAX:
+            i_positions, j_positions = numpy.divmod(numpy.arange(len(self._catalog)), num_j)
+            predicted_values = constant + i_positions * i_coefficient + j_positions * j_coefficient
+            if not numpy.array_equal(predicted_values, columns[2]):
+                return None
+            return i_coefficient, j_coefficient, constant
+        for position, (index, actual_value) in enumerate(self._catalog):
+            i_position, j_position = divmod(position, num_j)
+            if actual_value != constant + i_position * i_coefficient + j_position * j_coefficient:
+                return None
+        return i_coefficient, j_coefficient, constant
+
+    def _is_row_major(self, i_sorted, j_sorted, columns=None):
+        # A row-major catalog contains every (i, j) combination of unit-stride ranges
+        if i_sorted.step != 1 or j_sorted.step != 1 or len(self._catalog) != len(i_sorted) * len(j_sorted):
+            return False, None
         i_min = i_sorted[0]
         j_min = j_sorted[0]
         j_max = j_sorted[-1]
+        max_proposed_value = (i_sorted[-1] - i_min) * (j_max + 1 - j_min) + (j_max - j_min)
+        if columns is not None and max_proposed_value + _numpy_max_magnitude(columns[2]) <= _INT64_MAX:
+            diffs = columns[2] - ((columns[0] - i_min) * (j_max + 1 - j_min) + (columns[1] - j_min))
+            if (diffs != diffs[0]).any():
+                return False, None
+            return True, int(diffs[0])
         diff = None
         for (i, j), actual_value in self._catalog:
             proposed_value = (i - i_min) * (j_max + 1 - j_min) + (j - j_min)
@@ -160,7 +428,404 @@ class CatalogBuilder(object):
         return True, diff
 
 
-class Catalog2D(Mapping):
+def _numpy_stride(column):
+    """The difference between successive items of an array if it is constant, otherwise None."""
+    diffs = numpy.diff(column)
+    if (diffs != diffs[0]).any():
+        return None
+    return int(diffs[0])
+
+
+def _numpy_max_magnitude(column):
+    """The largest absolute value of the items of an array, as a Python integer."""
+    return max(abs(int(column.min())), abs(int(column.max())))
+
+
+def _numpy_measure_runs(keys, values, max_num_runs):
+    """Compute the same runs as util.measure_runs() from arrays of sorted keys and values.
+
+    Returns:
+        A list of runs, or None if there would be max_num_runs or more.
+    """
+    num_items = len(keys)
+    key_diffs = numpy.diff(keys)
+    value_diffs = numpy.diff(values)
+    # The positions of the last difference of each segment of equal successive differences
+    segment_ends = numpy.flatnonzero((key_diffs[1:] != key_diffs[:-1]) | (value_diffs[1:] != value_diffs[:-1]))
+    segment_ends = numpy.append(segment_ends, num_items - 2)
+    # Each run spans at most two segments, so there are at least half as many runs as segments
+    if (len(segment_ends) + 1) // 2 >= max_num_runs:
+        return None
+    runs = []
+    begin = 0
+    while begin < num_items:
+        if len(runs) >= max_num_runs:
+            return None
+        if begin + 1 == num_items:
+            runs.append((int(keys[begin]), 0, int(values[begin]), 0, 1))
+            break
+        # A run extends for as long as the differences equal those between its first two items
+        end = int(segment_ends[numpy.searchsorted(segment_ends, begin)]) + 2
+        runs.append((int(keys[begin]), int(key_diffs[begin]), int(values[begin]), int(value_diffs[begin]), end - begin))
+        begin = end
+    return runs
+
+
+def _array_from_numpy(column):
+    result = array('q')
+    result.frombytes(column.astype(numpy.int64).tobytes())
+    return result
+
+
+class _ListItems(list):
+    """A list of (key, value) items of any kind."""
+
+    def append(self, index, value):
+        super().append((index, value))
+        return True
+
+    def sort(self):
+        super().sort(key=lambda index_value: index_value[0])
+
+
+class _RegularItems(Sequence):
+    """Integer items with keys and values in arithmetic progression, described without storing them."""
+
+    def __init__(self, index, value):
+        self._index_start = index
+        self._value_start = value
+        self._index_stride = None
+        self._value_stride = None
+        self._len = 1
+
+    def append(self, index, value):
+        """Append an item if it continues the progression, returning True, otherwise return False."""
+        if not (_is_integer(index) and _is_integer(value)):
+            return False
+        if self._len == 1:
+            if index == self._index_start:
+                return False
+            self._index_stride = index - self._index_start
+            self._value_stride = value - self._value_start
+        elif (index != self._index_start + self._len * self._index_stride or
+              value != self._value_start + self._len * self._value_stride):
+            return False
+        self._len += 1
+        return True
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self._len
+        if not (0 <= position < self._len):
+            raise IndexError("{} index out of range".format(self.__class__.__name__))
+        return (self._index_start + position * (self._index_stride or 0),
+                self._value_start + position * (self._value_stride or 0))
+
+    def __len__(self):
+        return self._len
+
+    def create(self):
+        """Create a catalog of two or more items."""
+        index_stride, value_stride = self._index_stride, self._value_stride
+        index_min, value_start = self[0]
+        index_max, value_stop = self[-1]
+        if index_stride < 0:
+            index_min, index_max = index_max, index_min
+            value_start, value_stop = value_stop, value_start
+            index_stride, value_stride = -index_stride, -value_stride
+        if value_stride == 0:
+            return RegularConstantCatalog(index_min, index_max, index_stride, value_start)
+        return LinearRegularCatalog(index_min, index_max, index_stride, value_start, value_stop, value_stride)
+
+
+class _ArrayItems(Sequence):
+    """Items with integer keys, or pairs of integer keys, and integer values, held in arrays('q')."""
+
+    def __init__(self, key_arity):
+        self._key_arity = key_arity
+        self._columns = tuple(array('q') for _ in range(key_arity + 1))
+
+    @classmethod
+    def from_columns(cls, columns):
+        items = cls(key_arity=len(columns) - 1)
+        items._columns = tuple(columns)
+        return items
+
+    @property
+    def columns(self):
+        """The arrays of keys, or of each component of the keys, followed by the array of values."""
+        return self._columns
+
+    def append(self, index, value):
+        """Append an item if it can be represented, returning True, otherwise return False."""
+        if self._key_arity == 1:
+            if not (_is_integer(index) and _is_integer(value)):
+                return False
+            fields = (index, value)
+        else:
+            if not (isinstance(index, Sequence) and len(index) == 2
+                    and _is_integer(index[0]) and _is_integer(index[1]) and _is_integer(value)):
+                return False
+            fields = (index[0], index[1], value)
+        try:
+            for column, field in zip(self._columns, fields):
+                column.append(field)
+        except OverflowError:
+            # Remove any partially appended item
+            for column in self._columns:
+                del column[len(self._columns[-1]):]
+            return False
+        return True
+
+    def __getitem__(self, position):
+        if self._key_arity == 1:
+            keys, values = self._columns
+            return keys[position], values[position]
+        i_keys, j_keys, values = self._columns
+        return (i_keys[position], j_keys[position]), values[position]
+
+    def __iter__(self):
+        if self._key_arity == 1:
+            return zip(*self._columns)
+        i_keys, j_keys, values = self._columns
+        return zip(zip(i_keys, j_keys), values)
+
+    def __len__(self):
+        return len(self._columns[-1])
+
+    def sort(self):
+        """Sort the items by key, if they are not already sorted."""
+        if self._key_arity == 1:
+            key = self._columns[0].__getitem__
+        else:
+            i_keys, j_keys = self._columns[:2]
+
+            def key(position):
+                return i_keys[position], j_keys[position]
+
+        if all(key(position) < key(position + 1) for position in range(len(self) - 1)):
+            return
+        order = sorted(range(len(self)), key=key)
+        self._columns = tuple(array('q', (column[position] for position in order)) for column in self._columns)
+
+
+def _is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _initial_items(index, value):
+    """The most economical item store for a first item."""
+    if _is_integer(index) and _is_integer(value):
+        return _RegularItems(index, value)
+    items = _ArrayItems(key_arity=2)
+    if items.append(index, value):
+        return items
+    items = _ListItems()
+    items.append(index, value)
+    return items
+
+
+def _general_items(items, index, value):
+    """Copy items, with an additional item, to a more general item store."""
+    if isinstance(items, _RegularItems):
+        general = _ArrayItems(key_arity=1)
+        if all(general.append(*item) for item in items) and general.append(index, value):
+            return general
+    general = _ListItems(items)
+    general.append(index, value)
+    return general
+
+
+class Catalog(Mapping):
+    """An abstract base class for catalogs.
+
+    In addition to the mapping protocol, catalogs support looking up many
+    integer-valued keys in a single call. When the keys are supplied as a
+    NumPy array the lookups are vectorized, in closed form for the regular
+    catalog types, otherwise each key is looked up in turn.
+    """
+
+    # The NumPy arrays used by vectorized lookups, by the name of the attribute
+    # from which each was converted. Created on first use, and not pickled.
+    _numpy_arrays = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_numpy_arrays', None)
+        return state
+
+    def get_many(self, keys, missing=MISSING):
+        """Look up the values corresponding to many keys.
+
+        Args:
+            keys: A sequence of keys. Keys of two-dimensional catalogs may
+                also be supplied as a NumPy array of shape (n, 2).
+            missing: The integer to use in place of the value for keys which are not
+                present.
+
+        Returns:
+            An int64 NumPy array of values if keys is a NumPy array, otherwise an
+            array('q') of values.
+
+        Raises:
+            TypeError: If a value is not an integer.
+            OverflowError: If a value cannot be represented in 64 bits.
+        """
+        if _is_numpy_array(keys):
+            keys = _numpy_keys(keys)
+            if len(self) == 0:
+                return numpy.full(len(keys), missing, dtype=numpy.int64)
+            try:
+                return self._get_many_vectorized(keys, missing)
+            except OverflowError:
+                # Keys or values beyond 64 bits - fall back to per-key lookup
+                return Catalog._get_many_vectorized(self, keys, missing)
+        return array('q', (self.get(key, missing) for key in keys))
+
+    def contains_many(self, keys):
+        """Determine whether each of many keys is present.
+
+        Args:
+            keys: A sequence of keys. Keys of two-dimensional catalogs may
+                also be supplied as a NumPy array of shape (n, 2).
+
+        Returns:
+            A boolean NumPy array if keys is a NumPy array, otherwise a list of bools.
+        """
+        if _is_numpy_array(keys):
+            keys = _numpy_keys(keys)
+            if len(self) == 0:
+                return numpy.zeros(len(keys), dtype=bool)
+            try:
+                return self._contains_many_vectorized(keys)
+            except OverflowError:
+                return Catalog._contains_many_vectorized(self, keys)
+        return [key in self for key in keys]
+
+    def values_at(self, key):
+        """All of the values corresponding to a key.
+
+        Args:
+            key: The key to look up.
+
+        Returns:
+            A sequence of values. For catalogs other than the multi-valued
+            catalogs this contains the single value corresponding to the key.
+
+        Raises:
+            KeyError: If the key is not present.
+        """
+        return (self[key],)
+
+    def _get_many_vectorized(self, keys, missing):
+        """Look up the values of an int64 NumPy array of keys.
+
+        Subclasses should override this to avoid looking up each key in turn.
+        """
+        return _int64_numpy_array([self.get(key, missing) for key in _python_keys(keys)])
+
+    def _contains_many_vectorized(self, keys):
+        """Determine whether each key of an int64 NumPy array of keys is present.
+
+        Subclasses should override this to avoid looking up each key in turn.
+        """
+        return numpy.array([key in self for key in _python_keys(keys)], dtype=bool)
+
+    def _numpy_attribute(self, name, convert=None):
+        """An int64 NumPy array of the items of a sequence attribute, converted once on first use.
+
+        Args:
+            name: The name of the attribute.
+            convert: A function converting the sequence to an int64 NumPy array. By default
+                the array shares the buffer of the sequence where possible.
+
+        Raises:
+            TypeError: If an item is not an integer.
+            OverflowError: If an item cannot be represented in 64 bits.
+        """
+        if self._numpy_arrays is None:
+            self._numpy_arrays = {}
+        if name not in self._numpy_arrays:
+            self._numpy_arrays[name] = (convert or _numpy_array)(getattr(self, name))
+        return self._numpy_arrays[name]
+
+
+def _is_numpy_array(keys):
+    return numpy is not None and isinstance(keys, numpy.ndarray)
+
+
+def _numpy_keys(keys):
+    return keys.astype(numpy.int64, copy=False)
+
+
+def _python_keys(keys):
+    """Convert a NumPy array of keys to a list of integers or of (i, j) tuples."""
+    if keys.ndim == 1:
+        return keys.tolist()
+    return [tuple(key) for key in keys.tolist()]
+
+
+def _numpy_array(sequence):
+    """An int64 NumPy array of the items of a sequence, sharing its buffer where possible."""
+    if isinstance(sequence, (array, memoryview)) and sequence.itemsize == 8:
+        return numpy.frombuffer(sequence, dtype=numpy.int64)
+    return numpy.asarray(sequence, dtype=numpy.int64)
+
+
+def _int64_numpy_array(values):
+    """An int64 NumPy array of integer values.
+
+    Raises:
+        TypeError: If a value is not an integer.
+        OverflowError: If a value cannot be represented in 64 bits.
+    """
+    return numpy.frombuffer(array('q', values), dtype=numpy.int64)
+
+
+def _numpy_range_positions(sequence, items):
+    """The positions of items within a range.
+
+    Args:
+        sequence: A range.
+        items: An int64 NumPy array.
+
+    Returns:
+        A 2-tuple containing an array of the positions of the items within the
+        range, and a boolean array which is True where an item is in the range.
+        Positions of items not in the range are zero.
+    """
+    offsets = items - sequence.start
+    positions = offsets // sequence.step
+    present = (offsets % sequence.step == 0) & (positions >= 0) & (positions < len(sequence))
+    return numpy.where(present, positions, 0), present
+
+
+def _numpy_regular_positions(key_min, key_max, key_stride, keys):
+    return _numpy_range_positions(range(key_min, key_max + 1, key_stride), keys)
+
+
+def _numpy_bisect_left(sequence, items, lo, hi):
+    """Vectorized bisect_left() of each item within sequence[lo:hi], for arrays of items, lo and hi."""
+    active = lo < hi
+    while active.any():
+        mid = (lo + hi) // 2
+        right = active & (sequence[numpy.where(active, mid, 0)] < items)
+        lo = numpy.where(right, mid + 1, lo)
+        hi = numpy.where(active & ~right, mid, hi)
+        active = lo < hi
+    return lo
+
+
+def _numpy_popcount(words):
+    """The number of set bits in each item of a uint64 NumPy array."""
+    words = words - ((words >> numpy.uint64(1)) & numpy.uint64(0x5555555555555555))
+    words = ((words & numpy.uint64(0x3333333333333333))
+             + ((words >> numpy.uint64(2)) & numpy.uint64(0x3333333333333333)))
+    words = (words + (words >> numpy.uint64(4))) & numpy.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((words * numpy.uint64(0x0101010101010101)) >> numpy.uint64(56)).astype(numpy.int64)
+
+
+class Catalog2D(Catalog):
     """An abstract base class for 2D catalogs.
     """
 
@@ -264,6 +929,16 @@ class RowMajorCatalog2D(Catalog2D):
         return (key[0] in self._i_range) and \
                (key[1] in self._j_range)
 
+    def _get_many_vectorized(self, keys, missing):
+        values = ((keys[:, 0] - self.i_min) * (self.j_max + 1 - self.j_min)
+                  + (keys[:, 1] - self.j_min)
+                  + self._c)
+        return numpy.where(self._contains_many_vectorized(keys), values, missing)
+
+    def _contains_many_vectorized(self, keys):
+        return (_numpy_range_positions(self._i_range, keys[:, 0])[1]
+                & _numpy_range_positions(self._j_range, keys[:, 1])[1])
+
     def __len__(self):
         return len(self._i_range) * len(self._j_range)
 
@@ -276,7 +951,193 @@ class RowMajorCatalog2D(Catalog2D):
             self.i_range, self.j_range, self._c)
 
 
-class DictionaryCatalog(Mapping):
+class LinearRegularCatalog2D(Catalog2D):
+    """A mapping for keys forming a complete regular grid, with values linear in the key positions.
+
+    A LinearRegularCatalog2D predicts the value v from the key (i, j) according
+    to the following formula:
+
+        v = i_position * i_coefficient + j_position * j_coefficient + c
+
+    where i_position and j_position are the zero-based positions of i and j
+    within their ranges. This describes row-major (j varying fastest) and
+    column-major (i varying fastest) orderings, in ascending or descending
+    order along either axis, of grids with any line spacing.
+    """
+
+    def __init__(self, i_range, j_range, i_coefficient, j_coefficient, constant):
+        """Initialize a LinearRegularCatalog2D.
+
+        Args:
+            i_range: A range which can generate all and only valid i indexes.
+            j_range: A range which can generate all and only valid j indexes.
+            i_coefficient: The change in value between successive i indexes.
+            j_coefficient: The change in value between successive j indexes.
+            constant: The value at (i_min, j_min).
+        """
+        super().__init__(i_range, j_range)
+        self._i_coefficient = i_coefficient
+        self._j_coefficient = j_coefficient
+        self._c = constant
+
+    @property
+    def i_coefficient(self):
+        return self._i_coefficient
+
+    @property
+    def j_coefficient(self):
+        return self._j_coefficient
+
+    @property
+    def constant(self):
+        return self._c
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError("{!r} key {!r} out of range".format(self, key))
+        i, j = key
+        return (self._i_range.index(i) * self._i_coefficient
+                + self._j_range.index(j) * self._j_coefficient
+                + self._c)
+
+    def __contains__(self, key):
+        return (key[0] in self._i_range) and \
+               (key[1] in self._j_range)
+
+    def _get_many_vectorized(self, keys, missing):
+        i_positions, i_present = _numpy_range_positions(self._i_range, keys[:, 0])
+        j_positions, j_present = _numpy_range_positions(self._j_range, keys[:, 1])
+        values = i_positions * self._i_coefficient + j_positions * self._j_coefficient + self._c
+        return numpy.where(i_present & j_present, values, missing)
+
+    def _contains_many_vectorized(self, keys):
+        return (_numpy_range_positions(self._i_range, keys[:, 0])[1]
+                & _numpy_range_positions(self._j_range, keys[:, 1])[1])
+
+    def __len__(self):
+        return len(self._i_range) * len(self._j_range)
+
+    def __iter__(self):
+        yield from ((i, j) for i in self._i_range for j in self._j_range)
+
+    def __repr__(self):
+        return '{}(i_range={}, j_range={}, i_coefficient={}, j_coefficient={}, c={})'.format(
+            self.__class__.__name__,
+            self.i_range, self.j_range,
+            self._i_coefficient, self._j_coefficient, self._c)
+
+
+class MaskedRowMajorCatalog2D(Catalog2D):
+    """A mapping for keys on a regular grid with holes, with values regularly spaced in row-major order.
+
+    The presence of each cell of the grid is recorded in a bitmap, held as
+    64-bit words, together with the number of cells present before each
+    word. The value of a key is determined from its rank - the number of
+    present cells preceding it in row-major order - as:
+
+        v = value_start + rank * value_stride
+
+    so lookups take constant time and the catalog occupies about two bits
+    per grid cell.
+    """
+
+    WORD_NUM_BITS = 64
+
+    # A bitmap is only used if it occupies less space than sorted arrays of the keys and values
+    MAX_CELLS_PER_ITEM = 96
+
+    def __init__(self, i_range, j_range, words, value_start, value_stride):
+        """Initialize a MaskedRowMajorCatalog2D.
+
+        Args:
+            i_range: A range of all valid i indexes.
+            j_range: A range of all valid j indexes.
+            words: An array('Q') bitmap in which bit (c % 64) of word (c // 64) is set if
+                cell c = (i_range.index(i) * len(j_range) + j_range.index(j)) is present.
+            value_start: The value of the first present cell.
+            value_stride: The difference between the values of successive present cells.
+        """
+        super().__init__(i_range, j_range)
+        self._words = words
+        self._value_start = value_start
+        self._value_stride = value_stride
+        self._ranks = array('q', [0]) * len(words)
+        count = 0
+        for word_index, word in enumerate(words):
+            self._ranks[word_index] = count
+            count += _popcount(word)
+        self._len = count
+
+    def _rank(self, key):
+        """The rank of a key, or None if it is not present."""
+        try:
+            i, j = key
+            cell = self._i_range.index(i) * len(self._j_range) + self._j_range.index(j)
+        except (TypeError, ValueError):
+            return None
+        word_index, bit = divmod(cell, self.WORD_NUM_BITS)
+        word = self._words[word_index]
+        if not (word >> bit) & 1:
+            return None
+        return self._ranks[word_index] + _popcount(word & ((1 << bit) - 1))
+
+    def __getitem__(self, key):
+        rank = self._rank(key)
+        if rank is None:
+            raise KeyError("{!r} does not contain key {!r}".format(self, key))
+        return self._value_start + rank * self._value_stride
+
+    def __contains__(self, key):
+        return self._rank(key) is not None
+
+    def _ranks_vectorized(self, keys):
+        """An array of the ranks of the keys, and a boolean array which is True where a key is present."""
+        i_positions, i_present = _numpy_range_positions(self._i_range, keys[:, 0])
+        j_positions, j_present = _numpy_range_positions(self._j_range, keys[:, 1])
+        cells = i_positions * len(self._j_range) + j_positions
+        word_indexes = cells // self.WORD_NUM_BITS
+        bits = (cells % self.WORD_NUM_BITS).astype(numpy.uint64)
+        words = numpy.frombuffer(self._words, dtype=numpy.uint64)[word_indexes]
+        present = i_present & j_present & ((words >> bits) & numpy.uint64(1)).astype(bool)
+        preceding_bits = words & ((numpy.uint64(1) << bits) - numpy.uint64(1))
+        ranks = numpy.frombuffer(self._ranks, dtype=numpy.int64)[word_indexes] + _numpy_popcount(preceding_bits)
+        return ranks, present
+
+    def _get_many_vectorized(self, keys, missing):
+        ranks, present = self._ranks_vectorized(keys)
+        return numpy.where(present, self._value_start + ranks * self._value_stride, missing)
+
+    def _contains_many_vectorized(self, keys):
+        return self._ranks_vectorized(keys)[1]
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        num_j = len(self._j_range)
+        for word_index, word in enumerate(self._words):
+            bit = 0
+            while word:
+                if word & 1:
+                    i_index, j_index = divmod(word_index * self.WORD_NUM_BITS + bit, num_j)
+                    yield self._i_range[i_index], self._j_range[j_index]
+                word >>= 1
+                bit += 1
+
+    def __repr__(self):
+        return '{}(i_range={}, j_range={}, len={}, value_start={}, value_stride={})'.format(
+            self.__class__.__name__,
+            self.i_range, self.j_range,
+            self._len,
+            self._value_start,
+            self._value_stride)
+
+
+def _popcount(word):
+    return bin(word).count('1')
+
+
+class DictionaryCatalog(Catalog):
     """An immutable, ordered, dictionary mapping.
     """
 
@@ -327,7 +1188,474 @@ class DictionaryCatalog2D(Catalog2D):
             reprlib.repr(self._items.items()))
 
 
-class RegularConstantCatalog(Mapping):
+class SortedArrayCatalog(Catalog):
+    """An immutable mapping from integer keys to integer values, stored as sorted arrays.
+
+    Keys and values are held in arrays of 64-bit integers and keys are
+    located by binary search, so each item occupies sixteen bytes rather
+    than the hundred or more bytes used by a dictionary of boxed integers.
+    The arrays are pickled as raw buffers.
+    """
+
+    def __init__(self, keys, values):
+        """Initialize a SortedArrayCatalog.
+
+        Args:
+            keys: A sequence of distinct integers in ascending order, such
+                as an array('q').
+            values: A sequence of integers corresponding to the keys.
+
+        Raises:
+            ValueError: If the numbers of keys and values differ.
+        """
+        if len(keys) != len(values):
+            raise ValueError("{} inconsistent number of keys {} and values {}"
+                             .format(self.__class__.__name__, len(keys), len(values)))
+        self._keys = keys
+        self._values = values
+
+    @property
+    def key_array(self):
+        """The sorted keys."""
+        return self._keys
+
+    @property
+    def value_array(self):
+        """The values, in key order."""
+        return self._values
+
+    def _position(self, key):
+        """The position of a key, or None if it is not present."""
+        try:
+            position = bisect_left(self._keys, key)
+        except TypeError:
+            return None
+        if position < len(self._keys) and self._keys[position] == key:
+            return position
+        return None
+
+    def _positions_vectorized(self, keys):
+        """An array of the positions of the keys, and a boolean array which is True where a key is present."""
+        sorted_keys = self._numpy_attribute('_keys')
+        positions = numpy.searchsorted(sorted_keys, keys)
+        present = positions < len(sorted_keys)
+        positions = numpy.where(present, positions, 0)
+        present &= sorted_keys[positions] == keys
+        return positions, present
+
+    def _get_many_vectorized(self, keys, missing):
+        positions, present = self._positions_vectorized(keys)
+        return numpy.where(present, self._numpy_attribute('_values')[positions], missing)
+
+    def _contains_many_vectorized(self, keys):
+        return self._positions_vectorized(keys)[1]
+
+    def __getitem__(self, key):
+        position = self._position(key)
+        if position is None:
+            raise KeyError("{!r} does not contain key {!r}".format(self, key))
+        return self._values[position]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return self._position(key) is not None
+
+    def __repr__(self):
+        return '{}(keys={}, values={})'.format(
+            self.__class__.__name__,
+            reprlib.repr(self._keys),
+            reprlib.repr(self._values))
+
+
+class SortedArrayCatalog2D(Catalog2D):
+    """An immutable mapping from (i, j) integer keys to integer values, stored as sorted arrays.
+
+    The i and j components of the keys are held in separate arrays, sorted
+    by i and then by j. A key is located by a binary search for the run of
+    items with its i component, followed by a binary search of their j
+    components within that run.
+    """
+
+    def __init__(self, i_range, j_range, i_keys, j_keys, values):
+        """Initialize a SortedArrayCatalog2D.
+
+        Args:
+            i_range: A sorted sequence of all and only valid i indexes.
+            j_range: A sorted sequence of all and only valid j indexes.
+            i_keys: A sequence of integer i components in ascending order.
+            j_keys: A sequence of integer j components, ascending within each run of equal i components.
+            values: A sequence of integers corresponding to the keys.
+
+        Raises:
+            ValueError: If the numbers of key components and values differ.
+        """
+        super().__init__(i_range, j_range)
+        if not (len(i_keys) == len(j_keys) == len(values)):
+            raise ValueError("{} inconsistent number of keys {} and values {}"
+                             .format(self.__class__.__name__, len(i_keys), len(values)))
+        self._i_keys = i_keys
+        self._j_keys = j_keys
+        self._values = values
+
+    @property
+    def i_key_array(self):
+        """The sorted i components of the keys."""
+        return self._i_keys
+
+    @property
+    def j_key_array(self):
+        """The j components of the keys."""
+        return self._j_keys
+
+    @property
+    def value_array(self):
+        """The values, in key order."""
+        return self._values
+
+    def _position(self, key):
+        """The position of a key, or None if it is not present."""
+        try:
+            i, j = key
+            lo = bisect_left(self._i_keys, i)
+            hi = bisect_right(self._i_keys, i, lo)
+            position = bisect_left(self._j_keys, j, lo, hi)
+        except (TypeError, ValueError):
+            return None
+        if position < hi and self._j_keys[position] == j:
+            return position
+        return None
+
+    def _positions_vectorized(self, keys):
+        """An array of the positions of the keys, and a boolean array which is True where a key is present."""
+        i_keys = self._numpy_attribute('_i_keys')
+        j_keys = self._numpy_attribute('_j_keys')
+        lo = numpy.searchsorted(i_keys, keys[:, 0], side='left')
+        hi = numpy.searchsorted(i_keys, keys[:, 0], side='right')
+        positions = _numpy_bisect_left(j_keys, keys[:, 1], lo, hi)
+        present = positions < hi
+        positions = numpy.where(present, positions, 0)
+        present &= j_keys[positions] == keys[:, 1]
+        return positions, present
+
+    def _get_many_vectorized(self, keys, missing):
+        positions, present = self._positions_vectorized(keys)
+        return numpy.where(present, self._numpy_attribute('_values')[positions], missing)
+
+    def _contains_many_vectorized(self, keys):
+        return self._positions_vectorized(keys)[1]
+
+    def __getitem__(self, key):
+        position = self._position(key)
+        if position is None:
+            raise KeyError("{!r} does not contain key {!r}".format(self, key))
+        return self._values[position]
+
+    def __iter__(self):
+        return zip(self._i_keys, self._j_keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return self._position(key) is not None
+
+    def __repr__(self):
+        return '{}(i_range={}, j_range={}, values={})'.format(
+            self.__class__.__name__,
+            self.i_range, self.j_range,
+            reprlib.repr(self._values))
+
+
+class MultiValuedCatalog(Catalog):
+    """An immutable mapping from integer keys to runs of integer values.
+
+    The distinct keys are held in a sorted array. The values are held in a
+    single array in which the values of each key are contiguous, and a
+    further array gives the offset of the first value of each key, followed
+    by the total number of values, in the manner of a compressed sparse row
+    matrix.
+
+    So that a MultiValuedCatalog can be used wherever a catalog with unique
+    keys is expected, the mapping protocol presents the first value of each
+    key. Use values_at() to obtain all of the values of a key.
+    """
+
+    def __init__(self, keys, offsets, values):
+        """Initialize a MultiValuedCatalog.
+
+        Args:
+            keys: A sequence of distinct integers in ascending order, such as an array('q').
+            offsets: A sequence of one more integer than there are keys, such that
+                the values of keys[n] are values[offsets[n]:offsets[n + 1]].
+            values: A sequence of integers.
+
+        Raises:
+            ValueError: If the numbers of keys, offsets and values are inconsistent.
+        """
+        self._check_offsets(len(keys), offsets, values)
+        self._positions = SortedArrayCatalog(keys, range(len(keys)))
+        self._offsets = offsets
+        self._values = values
+
+    def _check_offsets(self, num_keys, offsets, values):
+        if len(offsets) != num_keys + 1 or offsets[-1] != len(values):
+            raise ValueError("{} inconsistent number of keys {}, offsets {} and values {}"
+                             .format(self.__class__.__name__, num_keys, len(offsets), len(values)))
+
+    @property
+    def key_array(self):
+        """The distinct keys, in ascending order."""
+        return self._positions.key_array
+
+    @property
+    def offset_array(self):
+        """The offset of the first value of each key, followed by the number of values."""
+        return self._offsets
+
+    @property
+    def value_array(self):
+        """The values, in key order."""
+        return self._values
+
+    @property
+    def num_values(self):
+        """The total number of values for all keys."""
+        return len(self._values)
+
+    def _position(self, key):
+        try:
+            return self._positions[key]
+        except KeyError:
+            raise KeyError("{!r} does not contain key {!r}".format(self, key))
+
+    def values_at(self, key):
+        """All of the values corresponding to a key, in the order in which they were added.
+
+        Args:
+            key: The key to look up.
+
+        Returns:
+            A sequence of values.
+
+        Raises:
+            KeyError: If the key is not present.
+        """
+        position = self._position(key)
+        return self._values[self._offsets[position]:self._offsets[position + 1]]
+
+    def __getitem__(self, key):
+        return self._values[self._offsets[self._position(key)]]
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def _get_many_vectorized(self, keys, missing):
+        positions = self._positions._get_many_vectorized(keys, -1)
+        present = positions != -1
+        first_offsets = self._numpy_attribute('_offsets')[numpy.where(present, positions, 0)]
+        return numpy.where(present, self._numpy_attribute('_values')[first_offsets], missing)
+
+    def _contains_many_vectorized(self, keys):
+        return self._positions._contains_many_vectorized(keys)
+
+    def __repr__(self):
+        return '{}(keys={}, num_values={})'.format(
+            self.__class__.__name__,
+            reprlib.repr(list(self._positions)),
+            self.num_values)
+
+
+class MultiValuedCatalog2D(MultiValuedCatalog):
+    """An immutable mapping from (i, j) integer keys to runs of integer values.
+
+    The keys are stored as for a SortedArrayCatalog2D, and the values as for
+    a MultiValuedCatalog.
+    """
+
+    def __init__(self, i_range, j_range, i_keys, j_keys, offsets, values):
+        """Initialize a MultiValuedCatalog2D.
+
+        Args:
+            i_range: A sorted sequence of all and only valid i indexes.
+            j_range: A sorted sequence of all and only valid j indexes.
+            i_keys: A sequence of integer i components in ascending order.
+            j_keys: A sequence of integer j components, ascending within each run of equal i components.
+            offsets: A sequence of one more integer than there are keys, such that
+                the values of the nth key are values[offsets[n]:offsets[n + 1]].
+            values: A sequence of integers.
+
+        Raises:
+            ValueError: If the numbers of keys, offsets and values are inconsistent.
+        """
+        self._check_offsets(len(i_keys), offsets, values)
+        self._positions = SortedArrayCatalog2D(i_range, j_range, i_keys, j_keys, range(len(i_keys)))
+        self._offsets = offsets
+        self._values = values
+
+    @property
+    def i_range(self):
+        return self._positions.i_range
+
+    @property
+    def j_range(self):
+        return self._positions.j_range
+
+    @property
+    def i_key_array(self):
+        """The i components of the distinct keys."""
+        return self._positions.i_key_array
+
+    @property
+    def j_key_array(self):
+        """The j components of the distinct keys."""
+        return self._positions.j_key_array
+
+    def __repr__(self):
+        return '{}(i_range={}, j_range={}, num_values={})'.format(
+            self.__class__.__name__,
+            self.i_range, self.j_range,
+            self.num_values)
+
+
+class PiecewiseLinearCatalog(Catalog):
+    """A mapping composed of runs within which keys and values are regularly spaced.
+
+    Each run is described by five integers: the first key, the key stride,
+    the first value, the value stride and the number of items. Within a run
+    the value v is predicted from the key k according to:
+
+        v = value_start + (k - key_start) // key_stride * value_stride
+
+    Keys are located by a binary search over the first keys of the runs.
+    This is compact for mappings which are regular over long runs, such as
+    the offsets of traces of constant length broken by a few traces of
+    different length.
+    """
+
+    NUM_RUN_FIELDS = 5
+
+    def __init__(self, key_starts, key_strides, value_starts, value_strides, counts):
+        """Initialize a PiecewiseLinearCatalog.
+
+        Args:
+            key_starts: The first key of each run, in ascending order, such that
+                runs do not overlap.
+            key_strides: The positive difference between successive keys in each run,
+                or zero for runs of one item.
+            value_starts: The value of the first key of each run.
+            value_strides: The difference between successive values in each run.
+            counts: The positive number of items in each run.
+
+        Raises:
+            ValueError: If the run descriptions are inconsistent.
+        """
+        if not (len(key_starts) == len(key_strides) == len(value_starts) == len(value_strides) == len(counts)):
+            raise ValueError("{} inconsistent numbers of run fields".format(self.__class__.__name__))
+        for key_stride, count in zip(key_strides, counts):
+            if count < 1 or (key_stride <= 0 and count > 1):
+                raise ValueError("{} run with key stride {} and count {} is invalid"
+                                 .format(self.__class__.__name__, key_stride, count))
+        self._key_starts = key_starts
+        self._key_strides = key_strides
+        self._value_starts = value_starts
+        self._value_strides = value_strides
+        self._counts = counts
+        self._len = sum(counts)
+
+    @property
+    def num_runs(self):
+        return len(self._key_starts)
+
+    def runs(self):
+        """An iterator over (key_start, key_stride, value_start, value_stride, count) tuples."""
+        return zip(self._key_starts, self._key_strides, self._value_starts, self._value_strides, self._counts)
+
+    def _locate(self, key):
+        """The run index and position within the run of a key, or None if it is not present."""
+        try:
+            run_index = bisect_right(self._key_starts, key) - 1
+        except TypeError:
+            return None
+        if run_index < 0:
+            return None
+        offset = key - self._key_starts[run_index]
+        if offset == 0:
+            return run_index, 0
+        key_stride = self._key_strides[run_index]
+        if key_stride == 0 or offset % key_stride != 0:
+            return None
+        position = offset // key_stride
+        if position >= self._counts[run_index]:
+            return None
+        return run_index, position
+
+    def _locate_vectorized(self, keys):
+        """Arrays of the run indexes of the keys and their positions within the runs,
+        and a boolean array which is True where a key is present."""
+        key_starts = self._numpy_attribute('_key_starts')
+        key_strides = self._numpy_attribute('_key_strides')
+        run_indexes = numpy.searchsorted(key_starts, keys, side='right') - 1
+        present = run_indexes >= 0
+        run_indexes = numpy.where(present, run_indexes, 0)
+        offsets = keys - key_starts[run_indexes]
+        strides = key_strides[run_indexes]
+        positions = offsets // numpy.where(strides == 0, 1, strides)
+        present &= (offsets == positions * strides) & (positions < self._numpy_attribute('_counts')[run_indexes])
+        return run_indexes, positions, present
+
+    def _get_many_vectorized(self, keys, missing):
+        run_indexes, positions, present = self._locate_vectorized(keys)
+        values = (self._numpy_attribute('_value_starts')[run_indexes]
+                  + positions * self._numpy_attribute('_value_strides')[run_indexes])
+        return numpy.where(present, values, missing)
+
+    def _contains_many_vectorized(self, keys):
+        return self._locate_vectorized(keys)[2]
+
+    def __getitem__(self, key):
+        location = self._locate(key)
+        if location is None:
+            raise KeyError("{!r} does not contain key {!r}".format(self, key))
+        run_index, position = location
+        return self._value_starts[run_index] + position * self._value_strides[run_index]
+
+    def __contains__(self, key):
+        return self._locate(key) is not None
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for key_start, key_stride, _, _, count in self.runs():
+            yield from range(key_start, key_start + count * key_stride, key_stride) if count > 1 else (key_start,)
+
+    def __repr__(self):
+        return '{}(num_runs={}, runs={})'.format(
+            self.__class__.__name__,
+            self.num_runs,
+            reprlib.repr(list(self.runs())))
+
+
+def _int64_array(items):
+    """An array('q') of the items, or None if any item is not an integer representable in 64 bits."""
+    try:
+        return array('q', items)
+    except (OverflowError, TypeError):
+        return None
+
+
+class RegularConstantCatalog(Catalog):
     """Mapping with keys ordered with regular spacing along the number line.
 
     The values associated with the keys are constant.
@@ -362,8 +1690,15 @@ class RegularConstantCatalog(Mapping):
             raise KeyError("{!r} does not contain key {!r}".format(self, key))
         return self._value
 
+    def _get_many_vectorized(self, keys, missing):
+        value = _int64_numpy_array([self._value])[0]
+        return numpy.where(self._contains_many_vectorized(keys), value, missing)
+
+    def _contains_many_vectorized(self, keys):
+        return _numpy_regular_positions(self._key_min, self._key_max, self._key_stride, keys)[1]
+
     def __len__(self):
-        return 1 + (self._key_max - self._key_min) / self._key_stride
+        return 1 + (self._key_max - self._key_min) // self._key_stride
 
     def __contains__(self, key):
         return (self._key_min <= key <= self._key_max) and \
@@ -383,7 +1718,7 @@ class RegularConstantCatalog(Mapping):
             self._value)
 
 
-class ConstantCatalog(Mapping):
+class ConstantCatalog(Catalog):
     """Mapping with arbitrary keys and a single constant value.
     """
 
@@ -423,7 +1758,7 @@ class ConstantCatalog(Mapping):
             self._value)
 
 
-class RegularCatalog(Mapping):
+class RegularCatalog(Catalog):
     """Mapping with keys ordered with regular spacing along the number line.
 
     The values associated with the keys are arbitrary.
@@ -468,6 +1803,13 @@ class RegularCatalog(Mapping):
         index = offset // self._key_stride
         return self._values[index]
 
+    def _get_many_vectorized(self, keys, missing):
+        positions, present = _numpy_regular_positions(self._key_min, self._key_max, self._key_stride, keys)
+        return numpy.where(present, self._numpy_attribute('_values', _int64_numpy_array)[positions], missing)
+
+    def _contains_many_vectorized(self, keys):
+        return _numpy_regular_positions(self._key_min, self._key_max, self._key_stride, keys)[1]
+
     def __len__(self):
         return len(self._values)
 
@@ -489,7 +1831,7 @@ class RegularCatalog(Mapping):
             reprlib.repr(self._values))
 
 
-class LinearRegularCatalog(Mapping):
+class LinearRegularCatalog(Catalog):
     """A mapping which assumes a linear relationship between keys and values.
 
     A LinearRegularCatalog predicts the value v from the key according to the
@@ -565,6 +1907,13 @@ class LinearRegularCatalog(Mapping):
         assert v.denominator == 1
         return v.numerator
 
+    def _get_many_vectorized(self, keys, missing):
+        positions, present = _numpy_regular_positions(self._key_min, self._key_max, self._key_stride, keys)
+        return numpy.where(present, self._value_start + positions * self._value_stride, missing)
+
+    def _contains_many_vectorized(self, keys):
+        return _numpy_regular_positions(self._key_min, self._key_max, self._key_stride, keys)[1]
+
     def __len__(self):
         return 1 + (self._key_max - self._key_min) // self._key_stride
 
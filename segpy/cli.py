@@ -23,6 +23,7 @@ import sys
 from docopt_subcommands import Subcommands
 
 from segpy.reader import create_reader
+from segpy.statistics import amplitude_statistics, load_statistics
 
 def common_option_handler(config):
     log_level = config['--log-level']
@@ -93,6 +94,10 @@ def report(args):
         except AttributeError:
             pass
 
+        statistics = load_statistics(segy_reader)
+        if statistics is not None:
+            print_statistics(statistics)
+
         print("=== BEGIN TEXTUAL REEL HEADER ===")
         for line in segy_reader.textual_reel_header:
             print(line[3:])
@@ -103,6 +108,59 @@ def report(args):
         print("=== END EXTENDED TEXTUAL_HEADER ===")
 
 
+@commands.command('stats')
+def handle_stats(args):
+    """Usage: {program} {command} [options] <filename>
+
+    Compute amplitude statistics in a single pass and store them for later
+    use by the report command.
+
+    Options:
+      --workers=N     The number of worker processes. [default: 0]
+      --range=MIN,MAX The range of the amplitude histogram.
+      --bins=N        The number of histogram bins. [default: 256]
+    """
+    filename = args['<filename>']
+    try:
+        workers = int(args['--workers'])
+        num_bins = int(args['--bins'])
+        histogram_range = (tuple(float(limit) for limit in args['--range'].split(','))
+                           if args['--range'] else None)
+    except ValueError:
+        return os.EX_USAGE
+    if histogram_range is not None and len(histogram_range) != 2:
+        return os.EX_USAGE
+
+    with open(filename, 'rb') as segy_file:
+        segy_reader = create_reader(segy_file)
+        statistics = amplitude_statistics(segy_reader, histogram_range, num_bins, workers=workers)
+        print_statistics(statistics)
+
+
+def print_statistics(statistics):
+    volume = statistics.volume
+    print("Number of samples:    ", volume.count)
+    if volume.num_nans != 0:
+        print("Number of NaNs:       ", volume.num_nans)
+    if volume.count == 0:
+        return
+    print("Minimum amplitude:    ", volume.minimum)
+    print("Maximum amplitude:    ", volume.maximum)
+    print("Mean amplitude:       ", volume.mean)
+    print("RMS amplitude:        ", volume.rms)
+    print("Standard deviation:   ", volume.std)
+    for p in (1, 2, 50, 98, 99):
+        print("{:<22}".format("{}th percentile:".format(p)), statistics.percentile(p))
+    histogram = statistics.histogram
+    if histogram is not None:
+        print("Histogram:")
+        edges = histogram.edges()
+        for lower, upper, count in zip(edges, edges[1:], histogram.counts):
+            print("  [{}, {}): {}".format(lower, upper, count))
+        print("  underflow: {}, overflow: {}".format(histogram.underflow, histogram.overflow))
+    print()
+
+
 def main(argv=None):
     if argv is None:
         argv = sys.argv[1:]
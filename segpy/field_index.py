@@ -0,0 +1,95 @@
+"""Sorted secondary indexes over trace header fields.
+
+A FieldIndex records the value of a single trace header field for every
+trace, sorted by value, so that the traces with values in a given range
+can be found by binary search rather than by reading every trace header.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+import reprlib
+
+
+class FieldIndex:
+    """An immutable index from the values of one trace header field to trace indexes.
+    """
+
+    def __init__(self, field_name, values):
+        """Initialize a FieldIndex.
+
+        Args:
+            field_name: The name of the indexed trace header field.
+
+            values: A sequence of integer field values, where the item at
+                position n is the field value for trace index n.
+        """
+        self._field_name = field_name
+        order = sorted(range(len(values)), key=values.__getitem__)
+        self._values = array('q', (values[trace_index] for trace_index in order))
+        self._trace_indexes = array('q', order)
+
+    @property
+    def field_name(self):
+        """The name of the indexed trace header field."""
+        return self._field_name
+
+    def __len__(self):
+        return len(self._values)
+
+    def min_value(self):
+        """The minimum field value, or None if the index is empty."""
+        return self._values[0] if self._values else None
+
+    def max_value(self):
+        """The maximum field value, or None if the index is empty."""
+        return self._values[-1] if self._values else None
+
+    def select(self, minimum=None, maximum=None):
+        """Select the traces with field values in a closed interval.
+
+        Args:
+            minimum: The optional inclusive lower bound. If None, there is
+                no lower bound.
+
+            maximum: The optional inclusive upper bound. If None, there is
+                no upper bound.
+
+        Returns:
+            An array of trace indexes in ascending order.
+        """
+        start = 0 if minimum is None else bisect_left(self._values, minimum)
+        stop = len(self._values) if maximum is None else bisect_right(self._values, maximum)
+        return array('q', sorted(self._trace_indexes[start:stop]))
+
+    def __repr__(self):
+        return '{}(field_name={!r}, values={})'.format(
+            self.__class__.__name__,
+            self._field_name,
+            reprlib.repr(self._values))
+
+
+def intersect_sorted(a, b):
+    """Intersect two ascending sequences of distinct integers.
+
+    The shorter sequence is scanned while the longer is searched, so the
+    cost is proportional to the length of the shorter sequence.
+
+    Args:
+        a: An ascending sequence of distinct integers.
+        b: An ascending sequence of distinct integers.
+
+    Returns:
+        An array of the integers common to both sequences, in ascending order.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    result = array('q')
+    lo = 0
+    hi = len(b)
+    for item in a:
+        lo = bisect_left(b, item, lo, hi)
+        if lo == hi:
+            break
+        if b[lo] == item:
+            result.append(item)
+    return result
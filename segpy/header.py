@@ -1,5 +1,4 @@
 from collections import OrderedDict
-from weakref import WeakKeyDictionary
 from itertools import chain
 
 from segpy import __version__
@@ -8,7 +7,14 @@ from segpy.util import underscores_to_camelcase, first_sentence, super_class, co
 
 
 class Header:
-    """An abstract base class for header format definitions."""
+    """An abstract base class for header format definitions.
+
+    Header instances store their field values in slots generated by FormatMeta,
+    so have no instance dictionary and cannot be given attributes other than
+    their fields.
+    """
+
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs):
         """Initialise a header instance.
@@ -25,8 +31,11 @@ class Header:
         Raises:
             TypeError: If keyword argument names do not correspond to header fields.
         """
-        for keyword, arg in zip(self.ordered_field_names(), args):
-            setattr(self, keyword, arg)
+        for set_slot, default in zip(self._field_setters, self._field_defaults):
+            set_slot(self, default)
+
+        for descriptor, arg in zip(self._field_descriptors, args):
+            descriptor.__set__(self, arg)
 
         for keyword, arg in kwargs.items():
             try:
@@ -38,6 +47,30 @@ class Header:
                 setattr(self, keyword, arg)
 
     _ordered_field_names = tuple()
+    _field_descriptors = tuple()
+    _field_slots = tuple()
+    _field_setters = tuple()
+    _field_defaults = tuple()
+
+    @classmethod
+    def _from_values(cls, values):
+        """Create a header from trusted field values, without conversion or range checking.
+
+        This is a metamethod which should be called on cls.
+
+        Args:
+            values: An iterable series of values, one for each field in the order
+                given by ordered_field_names(), each of which is known to be in
+                range for its field type; for example, values unpacked using a
+                struct compiled from the header format.
+
+        Returns:
+            A header instance.
+        """
+        obj = cls.__new__(cls)
+        for set_slot, value in zip(cls._field_setters, values):
+            set_slot(obj, value)
+        return obj
 
     @classmethod
     def ordered_field_names(cls):
@@ -54,12 +87,17 @@ class Header:
         return super_class(cls).ordered_field_names() + cls._ordered_field_names
 
     def copy(self, **updates):
-        fields = {name: getattr(self, name) for name in self.ordered_field_names()}
-        fields.update(updates)
-        obj = type(self)(**fields)
+        obj = self._from_values(slot.__get__(self) for slot in self._field_slots)
+        for keyword, arg in updates.items():
+            try:
+                getattr(obj, keyword)
+            except AttributeError as e:
+                raise TypeError("{!r} is not a recognised field name for {!r}"
+                                .format(keyword, self.__class__.__name__)) from e
+            else:
+                setattr(obj, keyword, arg)
         return obj
 
-
     def __copy__(self):
         return self.copy()
 
@@ -72,9 +110,10 @@ class Header:
             ', '.join("{}={}".format(k, getattr(self, k)) for k in self.ordered_field_names()))
 
     def __getstate__(self):
-        state = self.__dict__.copy()
+        state = {}
         state['__version__'] = __version__
-        state['_all_attributes'] = OrderedDict((name, getattr(self, name)) for name in self._ordered_field_names)
+        state['_all_attributes'] = OrderedDict(zip(self.ordered_field_names(),
+                                                   (slot.__get__(self) for slot in self._field_slots)))
         return state
 
     def __setstate__(self, state):
@@ -85,10 +124,9 @@ class Header:
                                     __version__))
         del state['__version__']
 
-        for name, value in state['_all_attributes'].items():
-            setattr(self, name, value)
-        del state['_all_attributes']
-        self.__dict__.update(state)
+        # The attributes were pickled in field order by __getstate__() of the same version
+        for set_slot, value in zip(self._field_setters, state['_all_attributes'].values()):
+            set_slot(self, value)
 
 def are_equal(self, other):
     """Compare two headers for equality.
@@ -96,11 +134,108 @@ def are_equal(self, other):
     Note:
         This is not implemented as __eq__() to prevent recursive behaviour in the header descriptor.
     """
-    if type(self) != type(other):
+    if _format_class(self) != _format_class(other):
         return False
     return all(getattr(self, field_name) == getattr(other, field_name) for field_name in self.ordered_field_names())
 
 
+def _format_class(header):
+    """The header format class of a header or LazyHeader."""
+    if isinstance(header, LazyHeader):
+        return header.header_format_class
+    return type(header)
+
+
+class LazyHeader:
+    """A view of a serialised header which decodes each field when it is first accessed.
+
+    Lazy headers are obtained by unpacking with a LazyHeaderPacker, and have the
+    same field attributes as instances of its header format class. Reading only a
+    few fields from a lazy header is much cheaper than unpacking a complete header.
+    """
+
+    __slots__ = ('_packer', '_buffer', '__dict__')
+
+    def __init__(self, packer, buffer):
+        """
+        Args:
+            packer: The LazyHeaderPacker which unpacked the header.
+
+            buffer: An object supporting the buffer protocol, such as bytes or a
+                memoryview of a memory-mapped file, containing the serialised header.
+                The buffer is retained, not copied.
+        """
+        object.__setattr__(self, '_packer', packer)
+        object.__setattr__(self, '_buffer', buffer)
+
+    @property
+    def header_format_class(self):
+        """The header format class of the header."""
+        return self._packer.header_format_class
+
+    def ordered_field_names(self):
+        """The ordered list of field names.
+
+        Returns:
+            An tuple containing the field names in order.
+        """
+        return self.header_format_class.ordered_field_names()
+
+    def to_header(self):
+        """Decode all fields into a header.
+
+        Returns:
+            An instance of the header format class with the same field values,
+            including any values assigned to the lazy header.
+        """
+        header = self._packer.header_packer.unpack(self._buffer)
+        for name, value in self.__dict__.items():
+            setattr(header, name, value)
+        return header
+
+    def copy(self, **updates):
+        """Decode all fields into a new header, as for to_header(), with any updates applied."""
+        return self.to_header().copy(**updates)
+
+    def __copy__(self):
+        return self.copy()
+
+    def __getattr__(self, name):
+        # Only called for attributes which have not been previously accessed
+        if not name.startswith('_'):
+            try:
+                value = self._packer.unpack_field(self._buffer, name)
+            except KeyError:
+                pass
+            else:
+                self.__dict__[name] = value
+                return value
+        raise AttributeError("Object of type {!r} has no attribute {!r}".format(self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        if name not in self._packer.field_names:
+            raise AttributeError("Can't set non-field attribute {!r} of {!r}".format(name, self.__class__.__name__))
+        value_type = getattr(self.header_format_class, name).value_type
+        try:
+            self.__dict__[name] = value_type(value)
+        except ValueError as e:
+            raise ValueError("Assigned value {!r} for {} attribute must be convertible to {}: {}"
+                             .format(value, name, value_type.__name__, e)) from e
+
+    def __delattr__(self, name):
+        raise AttributeError("Can't delete {} attribute".format(name))
+
+    def __reduce__(self):
+        # Copy the buffer, which may be a memoryview, and retain any accessed or assigned values
+        return LazyHeader, (self._packer, bytes(self._buffer)), self.__dict__.copy()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.to_header())
+
+
 class FormatMeta(type):
     """A metaclass for header format classes.
     """
@@ -119,6 +254,11 @@ class FormatMeta(type):
         namespace['_ordered_field_names'] = tuple(name for name, attr in namespace.items()
                                                   if isinstance(attr, HeaderFieldDescriptor))
 
+        # Each field value is stored in a slot named after the field, rather than
+        # in an instance dictionary, which keeps header instances compact.
+        slot_names = tuple(_slot_name(name) for name in namespace['_ordered_field_names'])
+        namespace['__slots__'] = tuple(namespace.get('__slots__', ())) + slot_names
+
         transitive_bases = set(chain.from_iterable(type(base).mro(base) for base in bases))
 
         if Header not in transitive_bases:
@@ -141,7 +281,21 @@ class FormatMeta(type):
                 attr_class.__name__ = underscores_to_camelcase(attr_name)
                 attr_class.__doc__ = attr.documentation
 
-        return super().__new__(mcs, name, bases, namespace)
+        cls = super().__new__(mcs, name, bases, namespace)
+
+        own_descriptors = tuple(namespace[name] for name in namespace['_ordered_field_names'])
+        for descriptor, slot_name in zip(own_descriptors, slot_names):
+            descriptor._slot = getattr(cls, slot_name)
+
+        cls._field_descriptors = super_class(cls)._field_descriptors + own_descriptors
+        cls._field_slots = tuple(descriptor._slot for descriptor in cls._field_descriptors)
+        cls._field_setters = tuple(slot.__set__ for slot in cls._field_slots)
+        cls._field_defaults = tuple(descriptor._named_field.default for descriptor in cls._field_descriptors)
+        return cls
+
+
+def _slot_name(field_name):
+    return '_' + field_name
 
 
 def is_public_non_field_attr(name, attr):
@@ -278,7 +432,7 @@ class HeaderFieldDescriptor:
 
     def __init__(self, value_type, offset, default, documentation):
         self._named_field = NamedField(value_type, offset, default, documentation)
-        self._instance_data = WeakKeyDictionary()
+        self._slot = None  # Set later by the metaclass
 
     @property
     def _name(self):
@@ -302,14 +456,12 @@ class HeaderFieldDescriptor:
         """
         if instance is None:
             return self._named_field
-        if instance not in self._instance_data:
-            return self._named_field.default
-        return self._instance_data[instance]
+        return self._slot.__get__(instance, owner)
 
     def __set__(self, instance, value):
         """Set the field value."""
         try:
-            self._instance_data[instance] = self._named_field._value_type(value)
+            self._slot.__set__(instance, self._named_field._value_type(value))
         except ValueError as e:
             raise ValueError("Assigned value {!r} for {} attribute must be convertible to {}: {}"
                              .format(value, self._name, self._named_field._value_type.__name__, e)) from e
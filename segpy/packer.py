@@ -4,6 +4,7 @@ from itertools import zip_longest
 
 from segpy import __version__
 from segpy.datatypes import SEG_Y_TYPE_TO_CTYPE
+from segpy.header import LazyHeader
 from segpy.util import pairwise, intervals_partially_overlap, complementary_intervals
 
 
@@ -125,11 +126,34 @@ def make_header_packer(header_format_class, endian='>'):
 
     one_to_one = all(len(fields) == 1 for fields in field_name_allocations)
 
-    if one_to_one:
+    # Bijective unpacking passes values positionally, so it also requires the fields to
+    # have been declared in the same order as their offsets.
+    in_declaration_order = [fields[0] for fields in field_name_allocations] == list(
+        header_format_class.ordered_field_names())
+
+    if one_to_one and in_declaration_order:
         return BijectiveHeaderPacker(header_format_class, structure, field_name_allocations)
     return SurjectiveHeaderPacker(header_format_class, structure, field_name_allocations)
 
 
+def make_lazy_header_packer(header_format_class, endian='>'):
+    """Make a packer which unpacks headers into LazyHeaders.
+
+    Use this packer, for example as the header_packer_override argument to
+    SegYReader.trace_header(), when only a few fields of each header will be read.
+
+    Args:
+        header_format_class: A header format class.
+
+        endian: '>' for big-endian data (the standard and default), '<'
+            for little-endian (non-standard).
+
+    Returns:
+        A LazyHeaderPacker.
+    """
+    return LazyHeaderPacker(make_header_packer(header_format_class, endian), endian)
+
+
 class HeaderPacker:
     """Packing and unpacking header instances."""
 
@@ -193,12 +217,20 @@ class BijectiveHeaderPacker(HeaderPacker):
             The header object.
         """
         values = self._structure.unpack(buffer)
-        return self._header_format_class(*values)
+        return self._header_format_class._from_values(values)
 
 
 class SurjectiveHeaderPacker(HeaderPacker):
     """One-to-many unpacking of serialised values to header fields."""
 
+    def __init__(self, header_format_class, structure, field_name_allocations):
+        super().__init__(header_format_class, structure, field_name_allocations)
+        self._value_indexes = _value_indexes(header_format_class, field_name_allocations)
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._value_indexes = _value_indexes(self._header_format_class, self._field_name_allocations)
+
     def unpack(self, buffer):
         """Unpack a header into a header object.
 
@@ -209,12 +241,106 @@ class SurjectiveHeaderPacker(HeaderPacker):
             The header object.
         """
         values = self._structure.unpack(buffer)
+        return self._header_format_class._from_values([values[index] for index in self._value_indexes])
+
+
+def _value_indexes(header_format_class, field_name_allocations):
+    """For each field of a header format, in declaration order, the index of its unpacked value."""
+    field_name_to_index = {name: index
+                           for index, names in enumerate(field_name_allocations)
+                           for name in names}
+    return [field_name_to_index[name] for name in header_format_class.ordered_field_names()]
+
 
-        kwargs = {name: value
-                  for names, value in zip(self._field_name_allocations, values)
-                  for name in names}
+class LazyHeaderPacker:
+    """Unpacking of headers into LazyHeaders, which decode each field when it is first accessed."""
+
+    def __init__(self, header_packer, endian='>'):
+        """
+        Args:
+            header_packer: A HeaderPacker for the same header format class and
+                endianness, used to decode complete headers.
+
+            endian: '>' for big-endian data (the standard and default), '<'
+                for little-endian (non-standard).
+        """
+        self._header_packer = header_packer
+        self._endian = endian
+        self._field_unpackers = _field_unpackers(header_packer.header_format_class, endian)
 
-        return self._header_format_class(**kwargs)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['__version__'] = __version__
+        del state['_field_unpackers']
+        return state
+
+    def __setstate__(self, state):
+        if state['__version__'] != __version__:
+            raise TypeError("Cannot unpickle {} version {} into version {}"
+                            .format(self.__class__.__name__,
+                                    state['__version__'],
+                                    __version__))
+        del state['__version__']
+        self.__dict__.update(state)
+        self._field_unpackers = _field_unpackers(self._header_packer.header_format_class, self._endian)
+
+    @property
+    def header_format_class(self):
+        return self._header_packer.header_format_class
+
+    @property
+    def header_packer(self):
+        """The HeaderPacker used to decode complete headers."""
+        return self._header_packer
+
+    @property
+    def field_names(self):
+        """A collection of the names of the fields which can be unpacked."""
+        return self._field_unpackers.keys()
+
+    def pack(self, header):
+        """Pack a header or LazyHeader into a buffer.
+        """
+        if isinstance(header, LazyHeader):
+            header = header.to_header()
+        return self._header_packer.pack(header)
+
+    def unpack(self, buffer):
+        """Unpack a header into a LazyHeader.
+
+        No fields are decoded until they are accessed.
+
+        Returns:
+            The LazyHeader object, which retains the buffer.
+        """
+        return LazyHeader(self, buffer)
+
+    def unpack_field(self, buffer, field_name):
+        """Unpack the value of a single field from a buffer.
+
+        Raises:
+            KeyError: If field_name is not the name of a field.
+        """
+        unpack_from, offset = self._field_unpackers[field_name]
+        return unpack_from(buffer, offset)[0]
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__,
+            self.header_format_class.__name__)
+
+
+def _field_unpackers(header_format_class, endian):
+    """A mapping of field names to an (unpack_from, offset) pair for decoding each field value."""
+    structs = {}
+    unpackers = {}
+    for name in header_format_class.ordered_field_names():
+        field = getattr(header_format_class, name)
+        cformat = endian + SEG_Y_TYPE_TO_CTYPE[field.value_type.SEG_Y_TYPE]
+        if cformat not in structs:
+            structs[cformat] = Struct(cformat)
+        unpackers[name] = (structs[cformat].unpack_from, field.offset - header_format_class.START_OFFSET_IN_BYTES)
+    return unpackers
 
 
 def main():
@@ -0,0 +1,272 @@
+"""Apply functions to every trace of a SEG Y file using multiple processes.
+
+The traces are partitioned into chunks of neighbouring traces in file
+order. Worker processes open the SEG Y file by name for each chunk they
+are given, and read the traces of the chunk with as few reads as possible,
+combining reads of traces which are close together in the file in the same
+way as SegYReader.iter_trace_samples(). Only the positions and lengths of
+the traces in each chunk are sent to the workers, rather than the reader
+and its catalogs.
+
+Usage:
+
+    def rms(trace_index, trace_header, samples):
+        return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+    for trace_index, value in map_traces(reader, rms):
+        ...
+
+    total = map_traces(reader, count_live_samples, reduce=operator.add)
+
+Functions passed as func and reduce must be picklable, which usually means
+they must be defined at module level.
+"""
+
+import functools
+import multiprocessing
+import os
+from array import array
+
+from segpy.datatypes import SEG_Y_TYPE_TO_CTYPE, size_in_bytes
+from segpy.header import SubFormatMeta
+from segpy.packer import make_header_packer
+from segpy.reader import coalesce_reads
+from segpy.toolkit import TRACE_HEADER_NUM_BYTES, unpack_ibm_floats, unpack_values
+from segpy.util import UNKNOWN_FILENAME
+
+# The default number of traces in each chunk sent to a worker.
+DEFAULT_CHUNK_NUM_TRACES = 1024
+
+
+def map_traces(reader, func, reduce=None, workers=None, chunk=DEFAULT_CHUNK_NUM_TRACES,
+               header_fields=None, trace_indexes=None, progress=None, initial=None):
+    """Apply a function to traces in parallel.
+
+    Args:
+        reader: A SegYReader for a named file on disk.
+
+        func: A function accepting three arguments: a trace index, a trace header
+            and a sequence of trace samples. The trace header will be None unless
+            header_fields are specified.
+
+        reduce: An optional function of two arguments used to combine the results
+            of func, as for functools.reduce(). Results are combined within each
+            worker process, and the results from each worker combined in the
+            calling process, in file order. The function should be associative.
+
+        workers: The number of worker processes. If None, the number of CPUs is
+            used. If zero, all work is done in the calling process, reading
+            through the reader itself, which is useful for readers of in-memory
+            files and for debugging.
+
+        chunk: The number of traces in each unit of work sent to a worker.
+
+        header_fields: An optional sequence of trace header field names. If
+            provided, func will be passed a trace header containing these fields.
+
+        trace_indexes: An optional iterable series of the trace indexes to be
+            processed. If None, all traces are processed.
+
+        progress: A unary callable which will be passed a number between zero
+            and one indicating the progress made. If provided, this callback
+            will be invoked at least once with an argument equal to one.
+
+        initial: An optional callable of no arguments, used with reduce. If
+            provided, the results of func within each chunk are combined into
+            the value it returns, as for the initializer of functools.reduce(),
+            so reduce must accept either a result of func or a combined value
+            as its second argument. This allows results to be accumulated into
+            a single mutable value per chunk.
+
+    Returns:
+        If reduce is None, an iterator over (trace_index, result) tuples in file
+        order. Otherwise the combined result, or None if there were no traces.
+
+    Raises:
+        ValueError: If workers or chunk are out of range, or if worker processes
+            are needed but the reader's file name is unknown.
+        TypeError: If progress is not callable.
+        ValueError: If initial is provided without reduce.
+    """
+    progress_callback = progress if progress is not None else lambda p: None
+
+    if not callable(progress_callback):
+        raise TypeError("map_traces(): progress callback must be callable")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 0:
+        raise ValueError("map_traces(): workers {} is negative".format(workers))
+    if chunk < 1:
+        raise ValueError("map_traces(): chunk {} is not positive".format(chunk))
+    if initial is not None and reduce is None:
+        raise ValueError("map_traces(): initial requires reduce")
+    if workers > 0 and reader.filename == UNKNOWN_FILENAME:
+        raise ValueError("map_traces(): worker processes cannot open a file with an unknown name; "
+                         "use workers=0")
+
+    header_fields = tuple(header_fields) if header_fields else ()
+    for field_name in header_fields:
+        if field_name not in reader.trace_header_format_class.ordered_field_names():
+            raise ValueError("{!r} is not a field of {}".format(
+                field_name, reader.trace_header_format_class.__name__))
+
+    chunks = _partition(reader, trace_indexes, chunk)
+    chunk_results = _process_chunks(reader, chunks, func, reduce, initial, workers, header_fields,
+                                    progress_callback)
+
+    if reduce is None:
+        return _flatten(chunk_results)
+
+    result = None
+    for index, chunk_result in enumerate(chunk_results):
+        result = chunk_result if index == 0 else reduce(result, chunk_result)
+    return result
+
+
+def _partition(reader, trace_indexes, chunk):
+    """Divide traces into chunks of neighbouring traces in file order.
+
+    Returns:
+        A list of chunks, each of which is a 3-tuple of arrays containing
+        the trace indexes, trace offsets and numbers of samples.
+    """
+    if trace_indexes is None:
+        trace_indexes = reader.trace_indexes()
+    ordered = sorted(trace_indexes, key=reader.trace_offset)
+    chunks = []
+    for begin in range(0, len(ordered), chunk):
+        chunk_trace_indexes = ordered[begin:begin + chunk]
+        chunks.append((array('q', chunk_trace_indexes),
+                       array('q', (reader.trace_offset(trace_index) for trace_index in chunk_trace_indexes)),
+                       array('q', (reader.num_trace_samples(trace_index) for trace_index in chunk_trace_indexes))))
+    return chunks
+
+
+def _process_chunks(reader, chunks, func, reduce, initial, workers, header_fields, progress_callback):
+    """Generate the result for each chunk, in order, reporting progress."""
+    num_traces = sum(len(chunk[0]) for chunk in chunks)
+    num_traces_processed = 0
+    if num_traces == 0:
+        progress_callback(1)
+        return
+    arguments = (reader.endian, reader.data_sample_format, reader.trace_header_format_class,
+                 header_fields, func, reduce, initial)
+
+    if workers == 0:
+        processor = _ReaderTraceChunkProcessor(reader, *arguments)
+        results = map(processor, chunks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(min(workers, len(chunks)),
+                                    initializer=_initialize_worker,
+                                    initargs=(reader.filename,) + arguments)
+        results = pool.imap(_process_chunk_in_worker, chunks)
+    try:
+        for chunk, result in zip(chunks, results):
+            num_traces_processed += len(chunk[0])
+            progress_callback(num_traces_processed / num_traces)
+            yield result
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    progress_callback(1)
+
+
+def _flatten(chunk_results):
+    for chunk_result in chunk_results:
+        yield from chunk_result
+
+
+class _TraceChunkProcessor:
+    """Read the traces in a chunk from a named file and apply a function to each."""
+
+    def __init__(self, filename, endian, seg_y_type, trace_header_format, header_fields, func, reduce,
+                 initial=None):
+        self._filename = filename
+        self._endian = endian
+        self._ctype = SEG_Y_TYPE_TO_CTYPE[seg_y_type]
+        self._item_size = size_in_bytes(self._ctype)
+        self._func = func
+        self._reduce = reduce
+        self._initial = initial
+        self._header_packer = None
+        if header_fields:
+            class ChunkSubFormat(metaclass=SubFormatMeta,
+                                 parent_format=trace_header_format,
+                                 parent_field_names=header_fields):
+                pass
+            self._header_packer = make_header_packer(ChunkSubFormat, endian)
+
+    def __call__(self, chunk):
+        if self._reduce is None:
+            return [(trace_index, self._func(trace_index, trace_header, samples))
+                    for trace_index, trace_header, samples in self._iter_traces(chunk)]
+
+        results = (self._func(trace_index, trace_header, samples)
+                   for trace_index, trace_header, samples in self._iter_traces(chunk))
+        if self._initial is None:
+            return functools.reduce(self._reduce, results)
+        return functools.reduce(self._reduce, results, self._initial())
+
+    def _iter_traces(self, chunk):
+        """Read the traces in a chunk.
+
+        Reads of traces which are close together in the file are combined, but
+        sparse chunks are read with several reads rather than a single read
+        spanning the gaps between traces.
+
+        Yields:
+            A (trace_index, trace_header, samples) 3-tuple for each trace in the chunk.
+        """
+        trace_indexes, offsets, num_samples = chunk
+        # Each read is of a whole trace, so is measured in bytes
+        reads = [(offset, TRACE_HEADER_NUM_BYTES + n * self._item_size, trace_index, n)
+                 for trace_index, offset, n in zip(trace_indexes, offsets, num_samples)]
+        with open(self._filename, 'rb') as fh:
+            for block in coalesce_reads(reads, 1):
+                block_pos = block[0][0]
+                block_end = max(pos + num_bytes for pos, num_bytes, _, _ in block)
+                fh.seek(block_pos, os.SEEK_SET)
+                buf = fh.read(block_end - block_pos)
+                if len(buf) < block_end - block_pos:
+                    raise EOFError("{} bytes requested but only {} available".format(
+                        block_end - block_pos, len(buf)))
+                for pos, _, trace_index, n in block:
+                    header_begin = pos - block_pos
+                    samples_begin = header_begin + TRACE_HEADER_NUM_BYTES
+                    trace_header = (self._header_packer.unpack(buf[header_begin:samples_begin])
+                                    if self._header_packer is not None else None)
+                    data = buf[samples_begin:samples_begin + n * self._item_size]
+                    samples = (unpack_ibm_floats(data, n)
+                               if self._ctype == 'ibm'
+                               else unpack_values(data, self._ctype, self._endian))
+                    yield trace_index, trace_header, samples
+
+
+class _ReaderTraceChunkProcessor(_TraceChunkProcessor):
+    """Read the traces in a chunk through a reader and apply a function to each."""
+
+    def __init__(self, reader, *arguments):
+        super().__init__(reader.filename, *arguments)
+        self._reader = reader
+
+    def _iter_traces(self, chunk):
+        for trace_index, samples in self._reader.iter_trace_samples(chunk[0]):
+            trace_header = (self._reader.trace_header(trace_index, self._header_packer)
+                            if self._header_packer is not None else None)
+            yield trace_index, trace_header, samples
+
+
+# The processor for the current worker process, created by _initialize_worker()
+_worker_processor = None
+
+
+def _initialize_worker(filename, *arguments):
+    global _worker_processor
+    _worker_processor = _TraceChunkProcessor(filename, *arguments)
+
+
+def _process_chunk_in_worker(chunk):
+    return _worker_processor(chunk)
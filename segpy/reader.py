@@ -7,13 +7,21 @@ instance can be used to extract SEG Y data.
 
 import os
 import pickle
+from array import array
+from collections import namedtuple
 from pathlib import Path
+from struct import Struct
 import logging
 
 from segpy import __version__
+from segpy.catalog import MISSING
 from segpy.dataset import Dataset
 from segpy.encoding import ASCII
-from segpy.packer import make_header_packer
+from segpy.field_index import FieldIndex, intersect_sorted
+from segpy.header import SubFormatMeta
+from segpy.packer import make_header_packer, compile_struct
+from segpy.spatial import SpatialIndex, COORDINATE_FIELDS, scale_coordinate
+from segpy.survey_grid import fit_survey_grid
 from segpy.trace_header import TraceHeaderRev1
 from segpy.util import file_length, filename_from_handle, make_sorted_distinct_sequence, hash_for_file, UNKNOWN_FILENAME
 from segpy.datatypes import DATA_SAMPLE_FORMAT_TO_SEG_Y_TYPE, SEG_Y_TYPE_DESCRIPTION, SEG_Y_TYPE_TO_CTYPE, size_in_bytes
@@ -22,7 +30,10 @@ from segpy.toolkit import (extract_revision,
                            read_binary_reel_header,
                            read_trace_header,
                            catalog_traces,
+                           normalize_key_fields,
                            read_binary_values,
+                           unpack_ibm_floats,
+                           unpack_values,
                            REEL_HEADER_NUM_BYTES,
                            TRACE_HEADER_NUM_BYTES,
                            read_textual_reel_header,
@@ -33,6 +44,42 @@ from segpy.toolkit import (extract_revision,
 log = logging.getLogger(__name__)
 log.setLevel('INFO')
 
+# When reading many traces, unwanted bytes between wanted ranges are read and
+# discarded, rather than seeking over them, if the gap is no larger than this.
+MAX_COALESCED_GAP_NUM_BYTES = 64 * 1024
+
+# The maximum size of a single coalesced read.
+MAX_COALESCED_READ_NUM_BYTES = 16 * 1024 * 1024
+
+# The version of the pickled state of readers, as stored in the cache. This
+# is increased when the catalogs held by readers change, so that readers
+# cached by earlier versions are discarded and the file is catalogued again.
+# Version 2: Prestack surveys are catalogued with MultiValuedCatalogs.
+PICKLE_VERSION = 2
+
+# Array type codes used for dense arrays of samples of each SEG Y type.
+# IBM floats can exceed the range of IEEE single precision floats.
+SEG_Y_TYPE_TO_ARRAY_TYPECODE = {
+    'ibm': 'd',
+    'float32': 'f',
+    'int32': 'i',
+    'int16': 'h',
+    'int8': 'b'}
+
+# The layout of a file in which traces of equal length are stored at regular intervals.
+#   first_trace_offset: The byte offset of the header of trace index zero.
+#   trace_stride: The distance in bytes between the headers of successive traces.
+#   num_samples: The number of samples in every trace.
+RegularTraceLayout = namedtuple('RegularTraceLayout', ['first_trace_offset', 'trace_stride', 'num_samples'])
+
+# The location within the file of a line of traces stored contiguously, with equal numbers of samples.
+#   first_trace_index: The index of the first trace of the line.
+#   num_traces: The number of traces in the line.
+#   byte_start: The byte offset of the header of the first trace.
+#   byte_length: The number of bytes occupied by the headers and samples of all traces of the line.
+LineRange = namedtuple('LineRange', ['first_trace_index', 'num_traces', 'byte_start', 'byte_length'])
+
+
 def create_reader(
         fh,
         encoding=None,
@@ -40,7 +87,8 @@ def create_reader(
         endian='>',
         progress=None,
         cache_directory=".segpy",
-        dimensionality=None):
+        dimensionality=None,
+        key_fields=None):
     """Create a SegYReader based on performing a scan of SEG Y data.
 
     This function is the preferred method for creating SegYReader
@@ -80,6 +128,14 @@ def create_reader(
             (the default) various heuristics will be used to guess the
             dimensionality of the data.
 
+        key_fields: An optional mapping from key names to sequences of
+            trace header field names, such as
+            {'shot': ('energy_source_point_num', 'ensemble_trace_num')}.
+            An additional catalog is built for each named key during the
+            same scan of the data, so traces can subsequently be located
+            using SegYReader.trace_index_by(). Keys specified by a single
+            field are scalars; keys specified by several fields are tuples.
+
     Raises:
         ValueError: The file-like object``fh`` is unsuitable for some reason,
             such as not being open, not being seekable, not being in
@@ -125,21 +181,29 @@ def create_reader(
     if dimensionality not in (None, 1, 2, 3):
         raise ValueError("dimensionality {!r} is not an of 1, 2, 3 or None.".format(dimensionality))
 
+    key_fields = normalize_key_fields(key_fields, trace_header_format)
+
     reader = None
     cache_file_path = None
 
     if cache_directory is not None:
-        sha1 = hash_for_file(fh, encoding, trace_header_format, endian)
+        # Key fields only contribute to the hash when present, so existing cache entries remain valid
+        hash_args = (encoding, trace_header_format, endian) + ((tuple(key_fields.items()),) if key_fields else ())
+        sha1 = hash_for_file(fh, *hash_args)
         seg_y_path = filename_from_handle(fh)
         cache_file_path = _locate_cache_file(seg_y_path, cache_directory, sha1)
         if cache_file_path is not None:
             reader = _load_reader_from_cache(cache_file_path, seg_y_path)
 
     if reader is None:
-        reader = _make_reader(fh, encoding, trace_header_format, endian, progress_callback, dimensionality)
+        reader = _make_reader(fh, encoding, trace_header_format, endian, progress_callback, dimensionality,
+                              key_fields)
         if cache_directory is not None:
             _save_reader_to_cache(reader, cache_file_path)
 
+    # Allow indexes which are built on demand to be added to the cache
+    reader._cache_file_path = cache_file_path
+
     progress_callback(1)
 
     return reader
@@ -235,7 +299,7 @@ def _load_reader_from_cache(cache_file_path, seg_y_path):
     return reader
 
 
-def _make_reader(fh, encoding, trace_header_format, endian, progress, dimensionality):
+def _make_reader(fh, encoding, trace_header_format, endian, progress, dimensionality, key_fields=None):
     if encoding is None:
         encoding = guess_textual_header_encoding(fh)
     if encoding is None:
@@ -246,8 +310,11 @@ def _make_reader(fh, encoding, trace_header_format, endian, progress, dimensiona
     extended_textual_header = read_extended_textual_headers(fh, binary_reel_header, encoding)
     bps = bytes_per_sample(binary_reel_header)
 
-    trace_offset_catalog, trace_length_catalog, cdp_catalog, line_catalog = catalog_traces(fh, bps, trace_header_format,
-                                                                                           endian, progress)
+    (trace_offset_catalog,
+     trace_length_catalog,
+     cdp_catalog,
+     line_catalog,
+     key_catalogs) = catalog_traces(fh, bps, trace_header_format, endian, progress, key_fields)
 
     if dimensionality is None:
         if cdp_catalog is not None and line_catalog is None:
@@ -261,13 +328,13 @@ def _make_reader(fh, encoding, trace_header_format, endian, progress, dimensiona
 
     if dimensionality == 1:
         return SegYReader(fh, textual_reel_header, binary_reel_header, extended_textual_header, trace_offset_catalog,
-                          trace_length_catalog, trace_header_format, encoding, endian)
+                          trace_length_catalog, trace_header_format, encoding, endian, key_catalogs)
     elif dimensionality == 2:
         return SegYReader2D(fh, textual_reel_header, binary_reel_header, extended_textual_header, trace_offset_catalog,
-                            trace_length_catalog, cdp_catalog, trace_header_format, encoding, endian)
+                            trace_length_catalog, cdp_catalog, trace_header_format, encoding, endian, key_catalogs)
     elif dimensionality == 3:
         return SegYReader3D(fh, textual_reel_header, binary_reel_header, extended_textual_header, trace_offset_catalog,
-                            trace_length_catalog, line_catalog, trace_header_format, encoding, endian)
+                            trace_length_catalog, line_catalog, trace_header_format, encoding, endian, key_catalogs)
     else:
         assert False, "dimensionality out of range 1-3 inclusive."
 
@@ -288,7 +355,8 @@ class SegYReader(Dataset):
                  trace_length_catalog,
                  trace_header_format,
                  encoding,
-                 endian='>'):
+                 endian='>',
+                 key_catalogs=None):
         """Initialize a SegYReader around a file-like-object.
 
         Note:
@@ -319,6 +387,9 @@ class SegYReader(Dataset):
             endian: '>' for big-endian data (the standard and default), '<' for
                 little-endian (non-standard)
 
+            key_catalogs: An optional mapping from key names to catalogs, each
+                mapping keys to trace_samples indexes.
+
         """
         self._fh = fh
         self._endian = endian
@@ -332,10 +403,15 @@ class SegYReader(Dataset):
 
         self._trace_offset_catalog = trace_offset_catalog
         self._trace_length_catalog = trace_length_catalog
+        self._key_catalogs = dict(key_catalogs) if key_catalogs is not None else {}
+        self._field_indexes = {}
+        self._spatial_indexes = {}
+        self._cache_file_path = None
 
         self._revision = extract_revision(self._binary_reel_header)
         self._bytes_per_sample = bytes_per_sample(self._binary_reel_header)
         self._max_num_trace_samples = None
+        self._regular_trace_layout = None  # None if not yet determined, False if irregular
 
     def __getstate__(self):
         """Copy the reader's state to a pickleable dictionary.
@@ -356,13 +432,17 @@ class SegYReader(Dataset):
         file_mode = self._fh.mode
 
         _ = self.max_num_trace_samples()
+        _ = self.regular_trace_layout()
 
         state = self.__dict__.copy()
         state['__version__'] = __version__
+        state['__pickle_version__'] = PICKLE_VERSION
         state['_file_name'] = filename
         state['_file_pos'] = file_pos
         state['_file_mode'] = file_mode
         del state['_fh']
+        # Only the reader returned by create_reader() maintains the cache
+        state['_cache_file_path'] = None
         return state
 
     def __setstate__(self, state):
@@ -378,6 +458,11 @@ class SegYReader(Dataset):
                                     __version__))
         del state['__version__']
 
+        pickle_version = state.pop('__pickle_version__', None)
+        if pickle_version != PICKLE_VERSION:
+            raise TypeError("Cannot unpickle {} pickle version {} into pickle version {}"
+                            .format(self.__class__.__name__, pickle_version, PICKLE_VERSION))
+
         try:
             fh = open(state['_file_name'], state['_file_mode'])
         except OSError as e:
@@ -413,6 +498,47 @@ class SegYReader(Dataset):
             self._max_num_trace_samples = max(self._trace_length_catalog.values())
         return self._max_num_trace_samples
 
+    def trace_offset(self, trace_index):
+        """The position of a trace within the file.
+
+        Args:
+            trace_index: An integer in the range zero to num_traces() - 1
+
+        Returns:
+            The byte offset of the start of the trace header from the start of the file.
+        """
+        return self._trace_offset_catalog[trace_index]
+
+    def regular_trace_layout(self):
+        """The regular layout of traces within the file, if any.
+
+        When all traces have the same number of samples and are stored
+        contiguously, in trace index order, with no intervening data, the
+        position of any sample of any trace can be computed directly. This
+        allows, for example, the file to be memory-mapped as a
+        two-dimensional array of samples.
+
+        Returns:
+            A RegularTraceLayout if the traces are stored regularly, otherwise None.
+        """
+        if self._regular_trace_layout is None:
+            self._regular_trace_layout = self._determine_regular_trace_layout() or False
+        return self._regular_trace_layout or None
+
+    def _determine_regular_trace_layout(self):
+        num_traces = self.num_traces()
+        if num_traces == 0:
+            return None
+        num_samples = self.num_trace_samples(0)
+        first_trace_offset = self._trace_offset_catalog[0]
+        trace_stride = TRACE_HEADER_NUM_BYTES + num_samples * size_in_bytes(SEG_Y_TYPE_TO_CTYPE[self.data_sample_format])
+        for trace_index in range(num_traces):
+            if self._trace_offset_catalog[trace_index] != first_trace_offset + trace_index * trace_stride:
+                return None
+            if self._trace_length_catalog[trace_index] != num_samples:
+                return None
+        return RegularTraceLayout(first_trace_offset, trace_stride, num_samples)
+
     def num_trace_samples(self, trace_index):
         """The number of samples in the specified trace_samples.
 
@@ -470,6 +596,292 @@ class SegYReader(Dataset):
             self._fh, start_pos, seg_y_type, num_samples_to_read, self._endian)
         return trace_values
 
+    def iter_trace_samples(self, trace_indexes, start=None, stop=None):
+        """Read samples from many traces in file order.
+
+        The traces are read in order of their position in the file rather
+        than in the order given, and reads of traces which are close
+        together in the file are combined, so reading many traces is much
+        faster than calling trace_samples() for each.
+
+        Args:
+            trace_indexes: An iterable series of trace indexes.
+
+            start: Optional zero-based start sample index. The default
+                is to read from the first (i.e. zeroth) sample.
+
+            stop: Optional zero-based stop sample index. Following Python
+                slice convention this is one beyond the end. The default is
+                to read to the end of each trace.
+
+        Yields:
+            A (trace_index, samples) 2-tuple for each trace, in file order.
+
+        Raises:
+            ValueError: If any trace index, or the start or stop sample index
+                for any trace, is out of range.
+        """
+        seg_y_type = self.data_sample_format
+        ctype = SEG_Y_TYPE_TO_CTYPE[seg_y_type]
+        item_size = size_in_bytes(ctype)
+        start_sample = start if start is not None else 0
+
+        reads = []
+        for trace_index in trace_indexes:
+            if not (0 <= trace_index < self.num_traces()):
+                raise ValueError("Trace index {} out of range.".format(trace_index))
+            num_samples_in_trace = self.num_trace_samples(trace_index)
+            stop_sample = stop if stop is not None else num_samples_in_trace
+            if not (0 <= stop_sample <= num_samples_in_trace):
+                raise ValueError("iter_trace_samples(): stop value {} out of range 0 to {} for trace {}"
+                                 .format(stop, num_samples_in_trace, trace_index))
+            if not (0 <= start_sample <= stop_sample):
+                raise ValueError("iter_trace_samples(): start value {} out of range 0 to {} for trace {}"
+                                 .format(start, stop_sample, trace_index))
+            pos = (self._trace_offset_catalog[trace_index]
+                   + TRACE_HEADER_NUM_BYTES
+                   + start_sample * item_size)
+            reads.append((pos, stop_sample - start_sample, trace_index))
+        reads.sort()
+
+        for block in coalesce_reads(reads, item_size):
+            block_pos = block[0][0]
+            block_end = max(pos + num_samples * item_size for pos, num_samples, _ in block)
+            self._fh.seek(block_pos, os.SEEK_SET)
+            buf = self._fh.read(block_end - block_pos)
+            if len(buf) < block_end - block_pos:
+                raise EOFError("{} bytes requested but only {} available".format(
+                    block_end - block_pos, len(buf)))
+            for pos, num_samples, trace_index in block:
+                begin = pos - block_pos
+                data = buf[begin:begin + num_samples * item_size]
+                samples = (unpack_ibm_floats(data, num_samples)
+                           if ctype == 'ibm'
+                           else unpack_values(data, ctype, self._endian))
+                yield trace_index, samples
+
+    def key_names(self):
+        """The names of the additional key catalogs.
+
+        Returns:
+            A sorted list of the key names which can be used with trace_index_by().
+        """
+        return sorted(self._key_catalogs)
+
+    def has_trace_index_by(self, key_name, key):
+        """Determine whether a trace exists for a key in a named key catalog.
+
+        Args:
+            key_name: The name of a key, as specified in the key_fields argument
+                to create_reader().
+
+            key: A key value. For keys specified by a single trace header field
+                this is a scalar, otherwise a tuple of field values.
+
+        Returns:
+            True if the specified trace_samples exists, otherwise False.
+
+        Raises:
+            ValueError: If there is no usable catalog for key_name.
+        """
+        return key in self._key_catalog(key_name)
+
+    def trace_index_by(self, key_name, key):
+        """Obtain the trace_samples index for a key in a named key catalog.
+
+        Args:
+            key_name: The name of a key, as specified in the key_fields argument
+                to create_reader().
+
+            key: A key value. For keys specified by a single trace header field
+                this is a scalar, otherwise a tuple of field values.
+
+        Returns:
+            A trace_samples index which can be used with trace_samples().
+
+        Raises:
+            ValueError: If there is no usable catalog for key_name.
+            KeyError: If there is no trace with the specified key.
+        """
+        return self._key_catalog(key_name)[key]
+
+    def _key_catalog(self, key_name):
+        try:
+            catalog = self._key_catalogs[key_name]
+        except KeyError:
+            raise ValueError("{} has no key catalog named {!r}".format(self.__class__.__name__, key_name))
+        if catalog is None:
+            raise ValueError("Key catalog {!r} could not be built because its keys are not unique".format(key_name))
+        return catalog
+
+    def field_index(self, field_name):
+        """Obtain a sorted secondary index over a trace header field.
+
+        The index is built on first use by reading the field from every trace
+        header. If the reader was created with caching enabled, the index is
+        stored in the cache along with the reader.
+
+        Args:
+            field_name: The name of a field in the trace header format.
+
+        Returns:
+            A FieldIndex.
+
+        Raises:
+            ValueError: If field_name is not a trace header field.
+        """
+        self.build_field_indexes((field_name,))
+        return self._field_indexes[field_name]
+
+    def build_field_indexes(self, field_names):
+        """Build sorted secondary indexes for several trace header fields in one pass.
+
+        Fields which are already indexed are not re-read.
+
+        Args:
+            field_names: An iterable series of trace header field names.
+
+        Raises:
+            ValueError: If any of field_names is not a trace header field.
+        """
+        missing_field_names = [name for name in field_names if name not in self._field_indexes]
+        if len(missing_field_names) == 0:
+            return
+        field_values = self._read_trace_header_fields(missing_field_names)
+        for field_name, values in zip(missing_field_names, field_values):
+            self._field_indexes[field_name] = FieldIndex(field_name, values)
+        self._update_cache()
+
+    def select(self, field_name, minimum=None, maximum=None):
+        """Select traces with trace header field values in a closed interval.
+
+        For example, to select all traces with a trace_identification_code of one:
+
+            live_trace_indexes = reader.select('trace_identification_code', 1, 1)
+
+        Args:
+            field_name: The name of a field in the trace header format.
+
+            minimum: The optional inclusive lower bound. If None, there is
+                no lower bound.
+
+            maximum: The optional inclusive upper bound. If None, there is
+                no upper bound.
+
+        Returns:
+            An array of trace indexes in ascending order.
+        """
+        return self.field_index(field_name).select(minimum, maximum)
+
+    def select_all(self, predicates):
+        """Select traces satisfying all of several trace header field predicates.
+
+        For example, to select all live traces with source_x in a window:
+
+            trace_indexes = reader.select_all([('trace_identification_code', 1, 1),
+                                               ('source_x', 1000, 2000)])
+
+        Args:
+            predicates: An iterable series of (field_name, minimum, maximum)
+                triples with the same meaning as the arguments to select().
+
+        Returns:
+            An array of the trace indexes satisfying all predicates, in ascending order.
+            If there are no predicates all trace indexes are returned.
+        """
+        predicates = list(predicates)
+        self.build_field_indexes(field_name for field_name, _, _ in predicates)
+        selections = sorted((self.select(*predicate) for predicate in predicates), key=len)
+        if len(selections) == 0:
+            return array('q', self.trace_indexes())
+        result = selections[0]
+        for selection in selections[1:]:
+            result = intersect_sorted(result, selection)
+        return result
+
+    def spatial_index(self, coordinates='cdp'):
+        """Obtain a spatial index over trace positions.
+
+        The index is built on first use by reading the coordinates and
+        xy_scalar from every trace header. If the reader was created with
+        caching enabled, the index is stored in the cache along with the reader.
+
+        Usage:
+
+            index = reader.spatial_index()
+            trace_index = index.nearest(x, y)
+            trace_indexes = index.within_box(x_min, y_min, x_max, y_max)
+
+        Args:
+            coordinates: Which trace position to index. One of 'cdp' (the
+                default) for cdp_x and cdp_y, 'source' for source_x and source_y,
+                or 'receiver' for group_x and group_y.
+
+        Returns:
+            A SpatialIndex of scaled coordinates, where the points are
+            identified by trace index.
+
+        Raises:
+            ValueError: If coordinates is not recognised.
+        """
+        if coordinates not in COORDINATE_FIELDS:
+            raise ValueError("Coordinates {!r} not one of {}".format(
+                coordinates, ', '.join(map(repr, sorted(COORDINATE_FIELDS)))))
+        if coordinates not in self._spatial_indexes:
+            x_field_name, y_field_name = COORDINATE_FIELDS[coordinates]
+            xs, ys, xy_scalars = self._read_trace_header_fields((x_field_name, y_field_name, 'xy_scalar'))
+            self._spatial_indexes[coordinates] = SpatialIndex(
+                [scale_coordinate(x, xy_scalar) for x, xy_scalar in zip(xs, xy_scalars)],
+                [scale_coordinate(y, xy_scalar) for y, xy_scalar in zip(ys, xy_scalars)])
+            self._update_cache()
+        return self._spatial_indexes[coordinates]
+
+    def _read_trace_header_fields(self, field_names):
+        """Read the values of specific fields from every trace header.
+
+        Args:
+            field_names: A sequence of trace header field names.
+
+        Returns:
+            A list containing an array of values for each field name, where
+            the item at position n in each array is from trace index n.
+
+        Raises:
+            ValueError: If any of field_names is not a trace header field.
+        """
+        header_format = self.trace_header_format_class
+        for field_name in field_names:
+            if field_name not in header_format.ordered_field_names():
+                raise ValueError("{!r} is not a field of {}".format(field_name, header_format.__name__))
+
+        class FieldSubFormat(metaclass=SubFormatMeta,
+                             parent_format=header_format,
+                             parent_field_names=field_names):
+            pass
+
+        cformat, field_name_allocations = compile_struct(FieldSubFormat,
+                                                         FieldSubFormat.START_OFFSET_IN_BYTES,
+                                                         FieldSubFormat.LENGTH_IN_BYTES,
+                                                         self._endian)
+        structure = Struct(cformat)
+        positions = {name: position
+                     for position, names in enumerate(field_name_allocations)
+                     for name in names}
+        value_positions = [positions[field_name] for field_name in field_names]
+
+        field_values = [array('q') for _ in field_names]
+        for trace_index in self.trace_indexes():
+            self._fh.seek(self._trace_offset_catalog[trace_index])
+            values = structure.unpack(self._fh.read(structure.size))
+            for position, value_array in zip(value_positions, field_values):
+                value_array.append(values[position])
+        return field_values
+
+    def _update_cache(self):
+        """Store the current state of the reader in the cache, if caching is enabled."""
+        if self._cache_file_path is not None:
+            _save_reader_to_cache(self, self._cache_file_path)
+
     def trace_header(self, trace_index, header_packer_override=None):
         """Read a specific trace_samples.
 
@@ -554,6 +966,38 @@ class SegYReader(Dataset):
         return self._endian
 
 
+def coalesce_reads(reads, item_size):
+    """Group reads which are close together in a file.
+
+    Reads separated by no more than MAX_COALESCED_GAP_NUM_BYTES are grouped,
+    provided that a group spans no more than MAX_COALESCED_READ_NUM_BYTES.
+
+    Args:
+        reads: A sequence of (pos, num_items, ...) tuples in ascending order of pos.
+
+        item_size: The size in bytes of each item.
+
+    Yields:
+        Non-empty lists of consecutive reads, each of which can be satisfied
+        by a single read from the start of the first to the end of the last.
+    """
+    block = []
+    block_end = None
+    for read in reads:
+        pos, num_items = read[0], read[1]
+        end = pos + num_items * item_size
+        if block and (pos - block_end > MAX_COALESCED_GAP_NUM_BYTES
+                      or max(end, block_end) - block[0][0] > MAX_COALESCED_READ_NUM_BYTES):
+            yield block
+            block = []
+        if not block:
+            block_end = end
+        block.append(read)
+        block_end = max(block_end, end)
+    if block:
+        yield block
+
+
 class SegYReader3D(SegYReader):
     """A reader for 3D seismic data.
 
@@ -572,7 +1016,8 @@ class SegYReader3D(SegYReader):
                  line_catalog,
                  trace_header_format,
                  encoding,
-                 endian='>'):
+                 endian='>',
+                 key_catalogs=None):
         """Initialize a SegYReader3D around a file-like-object.
 
         Note:
@@ -600,13 +1045,19 @@ class SegYReader3D(SegYReader):
 
             endian: '>' for big-endian data (the standard and default), '<' for
                 little-endian (non-standard)
+
+            key_catalogs: An optional mapping from key names to catalogs, each
+                mapping keys to trace_samples indexes.
         """
         super(SegYReader3D, self).__init__(fh, textual_reel_header, binary_reel_header, extended_textual_headers,
                                            trace_offset_catalog, trace_length_catalog, trace_header_format,
-                                           encoding, endian)
+                                           encoding, endian, key_catalogs)
         self._line_catalog = line_catalog
         self._inline_numbers = None
         self._xline_numbers = None
+        self._survey_grid = None
+        self._inline_ranges = None
+        self._xline_ranges = None
 
     def __getstate__(self):
         # As we're pickling, force evaluation of these properties so they'll be cached
@@ -700,6 +1151,362 @@ class SegYReader3D(SegYReader):
         """
         return self._line_catalog[inline_xline]
 
+    def trace_indexes_at(self, inline_xline):
+        """Obtain the indexes of all traces at an inline and crossline.
+
+        In prestack data, or data containing duplicate traces, several traces
+        may share inline and crossline numbers. In that case trace_index()
+        gives the first of them.
+
+        Args:
+            inline_xline: A 2-tuple of inline number, crossline number.
+
+        Returns:
+            A sequence of trace_samples indexes, in file order.
+
+        Raises:
+            KeyError: If there are no traces at inline_xline.
+        """
+        return self._line_catalog.values_at(inline_xline)
+
+    def trace_indexes_many(self, inline_xlines, missing=MISSING):
+        """Obtain the trace indexes of many traces given their inline and crossline numbers.
+
+        Args:
+            inline_xlines: A sequence of 2-tuples of inline number, crossline number, or
+                a NumPy array of shape (n, 2).
+
+            missing: The integer to use in place of the trace index for traces which
+                do not exist.
+
+        Returns:
+            The trace indexes, as an int64 NumPy array if inline_xlines is a NumPy array,
+            otherwise as an array('q').
+        """
+        return self._line_catalog.get_many(inline_xlines, missing)
+
+    def inline_range(self, inline_number):
+        """The location of an inline stored as a single contiguous range of traces.
+
+        In an inline-sorted file the traces of each inline are usually stored
+        one after another, so the whole inline can be fetched with one read.
+        The ranges of all inlines are determined on first use from the
+        catalogs and, if the reader was created with caching enabled, are
+        stored in the cache along with the reader.
+
+        Args:
+            inline_number: An inline number.
+
+        Returns:
+            A LineRange if the traces of the inline are consecutive, contiguous
+            within the file and have equal numbers of samples, otherwise None.
+
+        Raises:
+            ValueError: If there is no such inline.
+        """
+        if inline_number not in self.inline_numbers():
+            raise ValueError("Inline number {} not present in {}".format(inline_number, self))
+        if self._inline_ranges is None:
+            self._inline_ranges = self._determine_line_ranges(axis=0)
+            self._update_cache()
+        return self._inline_ranges.get(inline_number)
+
+    def xline_range(self, xline_number):
+        """The location of a crossline stored as a single contiguous range of traces.
+
+        This is the crossline counterpart of inline_range(), useful for
+        crossline-sorted files.
+
+        Args:
+            xline_number: A crossline number.
+
+        Returns:
+            A LineRange if the traces of the crossline are consecutive, contiguous
+            within the file and have equal numbers of samples, otherwise None.
+
+        Raises:
+            ValueError: If there is no such crossline.
+        """
+        if xline_number not in self.xline_numbers():
+            raise ValueError("Crossline number {} not present in {}".format(xline_number, self))
+        if self._xline_ranges is None:
+            self._xline_ranges = self._determine_line_ranges(axis=1)
+            self._update_cache()
+        return self._xline_ranges.get(xline_number)
+
+    def _determine_line_ranges(self, axis):
+        """Determine the contiguous lines of traces.
+
+        Args:
+            axis: Zero for inlines or one for crosslines.
+
+        Returns:
+            A dictionary mapping line numbers to LineRanges, for those lines
+            which are contiguous.
+        """
+        trace_indexes_by_line = {}
+        for inline_xline in self._line_catalog:
+            trace_indexes_by_line.setdefault(inline_xline[axis], []).extend(
+                self._line_catalog.values_at(inline_xline))
+
+        layout = self.regular_trace_layout()
+        item_size = size_in_bytes(SEG_Y_TYPE_TO_CTYPE[self.data_sample_format])
+        line_ranges = {}
+        for line_number, trace_indexes in trace_indexes_by_line.items():
+            first_trace_index = min(trace_indexes)
+            num_traces = len(trace_indexes)
+            if max(trace_indexes) - first_trace_index + 1 != num_traces:
+                continue
+            byte_start = self._trace_offset_catalog[first_trace_index]
+            trace_num_bytes = TRACE_HEADER_NUM_BYTES + self.num_trace_samples(first_trace_index) * item_size
+            if layout is None and not self._traces_are_contiguous(first_trace_index, num_traces, trace_num_bytes):
+                continue
+            line_ranges[line_number] = LineRange(first_trace_index, num_traces,
+                                                 byte_start, num_traces * trace_num_bytes)
+        return line_ranges
+
+    def _traces_are_contiguous(self, first_trace_index, num_traces, trace_num_bytes):
+        """Determine whether consecutive traces of equal size follow one another within the file."""
+        byte_start = self._trace_offset_catalog[first_trace_index]
+        num_samples = self.num_trace_samples(first_trace_index)
+        return all(self._trace_offset_catalog[first_trace_index + n] == byte_start + n * trace_num_bytes
+                   and self._trace_length_catalog[first_trace_index + n] == num_samples
+                   for n in range(num_traces))
+
+    def inline_samples(self, inline_number, null=0):
+        """Read the samples of all traces of an inline.
+
+        When the inline is stored contiguously (see inline_range()) it is
+        fetched with a single read and the samples of all of its traces are
+        decoded together. Otherwise its traces are read as by
+        iter_trace_samples().
+
+        Usage:
+
+            trace_indexes, samples = reader.inline_samples(inline_number)
+            value = samples[row, sample_index]
+
+        Args:
+            inline_number: An inline number.
+
+            null: The value to which samples beyond the end of short traces are set.
+
+        Returns:
+            A 2-tuple containing a sorted sequence of the indexes of the traces of
+            the inline and a two-dimensional memoryview with a shape of
+            (number of traces, number of samples in the longest trace), in which
+            each row contains the samples of the corresponding trace.
+
+        Raises:
+            ValueError: If there is no such inline.
+        """
+        line_range = self.inline_range(inline_number)
+        typecode = SEG_Y_TYPE_TO_ARRAY_TYPECODE[self.data_sample_format]
+        if line_range is not None:
+            trace_indexes = range(line_range.first_trace_index, line_range.first_trace_index + line_range.num_traces)
+            num_samples = self.num_trace_samples(line_range.first_trace_index)
+            samples = array(typecode, self._read_line_samples(line_range, num_samples))
+        else:
+            trace_indexes = sorted(trace_index
+                                   for xline_number in self.xline_numbers()
+                                   if (inline_number, xline_number) in self._line_catalog
+                                   for trace_index in self._line_catalog.values_at((inline_number, xline_number)))
+            num_samples = max(self.num_trace_samples(trace_index) for trace_index in trace_indexes)
+            samples = array(typecode, [null]) * (len(trace_indexes) * num_samples)
+            rows = {trace_index: row for row, trace_index in enumerate(trace_indexes)}
+            for trace_index, trace_samples in self.iter_trace_samples(trace_indexes):
+                position = rows[trace_index] * num_samples
+                samples[position:position + len(trace_samples)] = array(typecode, trace_samples)
+        shape = (len(trace_indexes), num_samples)
+        return trace_indexes, memoryview(samples).cast('B').cast(typecode, shape)
+
+    def _read_line_samples(self, line_range, num_samples):
+        """Read a contiguous line with a single read, and decode the samples of all its traces together."""
+        ctype = SEG_Y_TYPE_TO_CTYPE[self.data_sample_format]
+        samples_num_bytes = num_samples * size_in_bytes(ctype)
+        trace_num_bytes = TRACE_HEADER_NUM_BYTES + samples_num_bytes
+        self._fh.seek(line_range.byte_start, os.SEEK_SET)
+        buf = self._fh.read(line_range.byte_length)
+        if len(buf) < line_range.byte_length:
+            raise EOFError("{} bytes requested but only {} available".format(line_range.byte_length, len(buf)))
+        view = memoryview(buf)
+        data = b''.join(view[begin + TRACE_HEADER_NUM_BYTES:begin + trace_num_bytes]
+                        for begin in range(0, line_range.byte_length, trace_num_bytes))
+        num_items = line_range.num_traces * num_samples
+        return (unpack_ibm_floats(data, num_items)
+                if ctype == 'ibm'
+                else unpack_values(data, ctype, self._endian))
+
+    def read_subvolume(self, inline_numbers, xline_numbers, sample_range=None, null=0):
+        """Read a dense sub-volume of samples.
+
+        Only the requested samples of each trace are read, and the traces
+        are read in file order with reads of neighbouring traces combined.
+
+        Usage:
+
+            cube = reader.read_subvolume(range(100, 200), range(300, 400), range(0, 500))
+            value = cube[inline_index, xline_index, sample_index]
+
+        The result supports the buffer protocol, so it can also be wrapped
+        without copying by, for example, numpy.asarray(cube).
+
+        Args:
+            inline_numbers: A sequence of inline numbers, such as a range.
+                These correspond to the first dimension of the result.
+
+            xline_numbers: A sequence of crossline numbers, such as a range.
+                These correspond to the second dimension of the result.
+
+            sample_range: An optional range of sample indexes, which must
+                have a positive step. These correspond to the third dimension
+                of the result. If None, all samples up to
+                max_num_trace_samples() are read.
+
+            null: The value to which samples of missing traces, and samples
+                beyond the end of short traces, are set.
+
+        Returns:
+            A three-dimensional memoryview with a shape of (len(inline_numbers),
+            len(xline_numbers), len(sample_range)), indexed by (inline_index,
+            xline_index, sample_index) tuples. Inline and crossline numbers may
+            be repeated, in which case the same trace appears at each position.
+            Since memoryviews cannot have dimensions of length zero, if any of
+            inline_numbers, xline_numbers or sample_range is empty, an empty
+            one-dimensional memoryview is returned instead.
+
+        Raises:
+            ValueError: If sample_range has a non-positive step or a negative start.
+        """
+        if sample_range is None:
+            sample_range = range(self.max_num_trace_samples())
+        if sample_range.step < 1:
+            raise ValueError("read_subvolume(): sample_range step {} is not positive".format(sample_range.step))
+        if sample_range.start < 0:
+            raise ValueError("read_subvolume(): sample_range start {} is negative".format(sample_range.start))
+
+        shape = (len(inline_numbers), len(xline_numbers), len(sample_range))
+        num_samples = shape[2]
+        typecode = SEG_Y_TYPE_TO_ARRAY_TYPECODE[self.data_sample_format]
+        if shape[0] * shape[1] * num_samples == 0:
+            return memoryview(array(typecode))
+
+        cube = array(typecode, [null]) * (shape[0] * shape[1] * num_samples)
+
+        # Each trace may appear at several positions if line numbers are repeated
+        trace_index_to_positions = {}
+        for i, inline_number in enumerate(inline_numbers):
+            for j, xline_number in enumerate(xline_numbers):
+                inline_xline = (inline_number, xline_number)
+                if inline_xline in self._line_catalog:
+                    trace_index_to_positions.setdefault(self._line_catalog[inline_xline], []).append(
+                        (i * shape[1] + j) * num_samples)
+
+        # Short traces are read up to their last sample, so group the traces by the
+        # sample at which reading stops; within each group reads are in file order.
+        start = sample_range.start
+        stop = sample_range[-1] + 1
+        step = sample_range.step
+        trace_indexes_by_stop = {}
+        for trace_index in trace_index_to_positions:
+            trace_stop = min(stop, self.num_trace_samples(trace_index))
+            if trace_stop > start:
+                trace_indexes_by_stop.setdefault(trace_stop, []).append(trace_index)
+
+        for trace_stop, trace_indexes in trace_indexes_by_stop.items():
+            for trace_index, samples in self.iter_trace_samples(trace_indexes, start, trace_stop):
+                trace_samples = array(typecode, samples[::step])
+                for position in trace_index_to_positions[trace_index]:
+                    cube[position:position + len(trace_samples)] = trace_samples
+
+        return memoryview(cube).cast('B').cast(typecode, shape)
+
+    def as_array(self, null=0):
+        """A lazy, read-only, array-like view of the volume.
+
+        Note:
+            This method requires the optional segpy_numpy package.
+
+        Usage:
+
+            volume = reader.as_array()
+            timeslice = volume[:, :, 250]
+
+        Args:
+            null: The value presented for samples of missing traces and for
+                samples beyond the end of short traces.
+
+        Returns:
+            A segpy_numpy VolumeArray with shape (num_inlines(), num_xlines(),
+            max_num_trace_samples()), indexed by zero-based inline index,
+            crossline index and sample index. Samples are read when the view
+            is indexed.
+
+        Raises:
+            ImportError: If segpy_numpy is not installed.
+        """
+        try:
+            from segpy_numpy.volume import VolumeArray
+        except ImportError as e:
+            raise ImportError("{}.as_array() requires the segpy_numpy package".format(
+                self.__class__.__name__)) from e
+        return VolumeArray(self, null)
+
+    def survey_grid(self):
+        """The affine relationship between line numbers and cdp coordinates.
+
+        The grid is fitted by least squares to the inline_number,
+        crossline_number, cdp_x and cdp_y of every trace when first
+        requested. If the reader was created with caching enabled, the grid
+        is stored in the cache along with the reader. The residuals of the
+        fit indicate how regular the survey is.
+
+        Returns:
+            A SurveyGrid.
+
+        Raises:
+            ValueError: If the traces do not span a two-dimensional grid.
+        """
+        if self._survey_grid is None:
+            inline_numbers, xline_numbers, xs, ys, xy_scalars = self._read_trace_header_fields(
+                ('inline_number', 'crossline_number', 'cdp_x', 'cdp_y', 'xy_scalar'))
+            self._survey_grid = fit_survey_grid(
+                inline_numbers,
+                xline_numbers,
+                [scale_coordinate(x, xy_scalar) for x, xy_scalar in zip(xs, xy_scalars)],
+                [scale_coordinate(y, xy_scalar) for y, xy_scalar in zip(ys, xy_scalars)])
+            self._update_cache()
+        return self._survey_grid
+
+    def world_to_line(self, x, y):
+        """Convert cdp coordinates to line numbers using the survey grid.
+
+        To find the trace nearest to a map position:
+
+            inline, xline = reader.world_to_line(x, y)
+            trace_index = reader.trace_index((round(inline), round(xline)))
+
+        Args:
+            x: An x coordinate.
+            y: A y coordinate.
+
+        Returns:
+            An (inline_number, xline_number) 2-tuple of floats, which are not rounded.
+        """
+        return self.survey_grid().world_to_line(x, y)
+
+    def line_to_world(self, inline_number, xline_number):
+        """Convert line numbers to cdp coordinates using the survey grid.
+
+        Args:
+            inline_number: An inline number.
+            xline_number: A crossline number.
+
+        Returns:
+            An (x, y) 2-tuple.
+        """
+        return self.survey_grid().line_to_world(inline_number, xline_number)
+
 
 class SegYReader2D(SegYReader):
     """A reader for 2D seismic data."""
@@ -714,7 +1521,8 @@ class SegYReader2D(SegYReader):
                  cdp_catalog,
                  trace_header_format,
                  encoding,
-                 endian='>'):
+                 endian='>',
+                 key_catalogs=None):
         """Initialize a SegYReader2D around a file-like-object.
 
         Note:
@@ -741,10 +1549,13 @@ class SegYReader2D(SegYReader):
 
             endian: '>' for big-endian data (the standard and default), '<' for
                 little-endian (non-standard)
+
+            key_catalogs: An optional mapping from key names to catalogs, each
+                mapping keys to trace_samples indexes.
         """
         super(SegYReader2D, self).__init__(fh, textual_reel_header, binary_reel_header, extended_textual_headers,
                                            trace_offset_catalog, trace_length_catalog, trace_header_format,
-                                           encoding, endian)
+                                           encoding, endian, key_catalogs)
         self._cdp_catalog = cdp_catalog
         self._cdp_numbers = None
 
@@ -802,3 +1613,35 @@ class SegYReader2D(SegYReader):
         """
         return self._cdp_catalog[cdp_number]
 
+    def trace_indexes_at(self, cdp_number):
+        """Obtain the indexes of all traces with a CDP number.
+
+        In prestack data, such as CDP gathers, several traces share a CDP
+        number. In that case trace_index() gives the first of them.
+
+        Args:
+            cdp_number: A CDP number.
+
+        Returns:
+            A sequence of trace_samples indexes, in file order.
+
+        Raises:
+            KeyError: If there are no traces with cdp_number.
+        """
+        return self._cdp_catalog.values_at(cdp_number)
+
+    def trace_indexes_many(self, cdp_numbers, missing=MISSING):
+        """Obtain the trace indexes of many traces given their CDP numbers.
+
+        Args:
+            cdp_numbers: A sequence of CDP numbers, or a NumPy array of CDP numbers.
+
+            missing: The integer to use in place of the trace index for traces which
+                do not exist.
+
+        Returns:
+            The trace indexes, as an int64 NumPy array if cdp_numbers is a NumPy array,
+            otherwise as an array('q').
+        """
+        return self._cdp_catalog.get_many(cdp_numbers, missing)
+
@@ -0,0 +1,503 @@
+"""Catalogs and reader handles in shared memory, for use by many processes.
+
+Pickling a SegYReader copies all of its catalogs, so when a reader of an
+irregular survey is sent to many worker processes each holds its own copy
+of what may be very large dictionary catalogs. The functions here place
+such catalogs in shared memory, so that a lightweight handle containing
+only the names of the shared memory blocks and the path of the SEG Y file
+can be sent to workers, each of which attaches to the same single copy.
+
+Note:
+    This module requires multiprocessing.shared_memory, which is available
+    from Python 3.8.
+
+Usage:
+
+    with share_reader(reader) as handle:
+        with multiprocessing.Pool(32) as pool:
+            pool.map(process_inline, ((handle, inline_number) for inline_number in reader.inline_numbers()))
+
+    def process_inline(args):
+        handle, inline_number = args
+        reader = handle.open()
+        ...
+"""
+
+import os
+from array import array
+from collections.abc import Sequence
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from segpy.catalog import (Catalog, DictionaryCatalog, DictionaryCatalog2D, MultiValuedCatalog,
+                           MultiValuedCatalog2D, RegularCatalog, SortedArrayCatalog, SortedArrayCatalog2D)
+from segpy.reader import SegYReader2D, SegYReader3D
+from segpy.util import make_sorted_distinct_sequence
+
+# The types of catalog which are large enough to be worth sharing.
+SHAREABLE_CATALOG_TYPES = (SortedArrayCatalog, SortedArrayCatalog2D,
+                           DictionaryCatalog, DictionaryCatalog2D, RegularCatalog,
+                           MultiValuedCatalog, MultiValuedCatalog2D)
+
+_ITEM_SIZE = array('q').itemsize
+
+_UNSHAREABLE_MESSAGE = ("Only catalogs with 64-bit integer keys, or pairs of such keys, "
+                        "and 64-bit integer values can be shared")
+
+
+def _require_shared_memory():
+    if shared_memory is None:
+        raise ImportError("Shared catalogs require multiprocessing.shared_memory, available from Python 3.8")
+
+
+class SharedCatalog(Catalog):
+    """An immutable mapping from integer keys to integer values held in shared memory.
+
+    The keys and values are stored as for a SortedArrayCatalog. A
+    SharedCatalog is pickled as the names of its shared memory blocks, so
+    unpickling it in another process attaches to the same memory rather than
+    copying the items. Use share_catalog() to create a SharedCatalog.
+    """
+
+    def __init__(self, names, num_items, owner, creator_pid):
+        """Attach to existing shared memory blocks.
+
+        Args:
+            names: The names of the shared memory blocks containing each column of
+                keys, followed by the values.
+
+            num_items: The number of items in the mapping.
+
+            owner: True if this instance is responsible for unlinking the shared memory.
+
+            creator_pid: The id of the process which created the shared memory.
+        """
+        _require_shared_memory()
+        self._names = tuple(names)
+        self._num_items = num_items
+        self._owner = owner
+        self._creator_pid = creator_pid
+        self._blocks = [_attach(name, untrack=(os.getpid() != creator_pid)) for name in self._names]
+        self._columns = [block.buf[:length * _ITEM_SIZE].cast('q')
+                         for block, length in zip(self._blocks, self._column_lengths())]
+        self._catalog = self._make_catalog(self._columns)
+
+    def _column_lengths(self):
+        return [self._num_items] * len(self._names)
+
+    def _make_catalog(self, columns):
+        return SortedArrayCatalog(*columns)
+
+    def __getstate__(self):
+        return dict(names=self._names,
+                    num_items=self._num_items,
+                    creator_pid=self._creator_pid)
+
+    def __setstate__(self, state):
+        self.__init__(state['names'], state['num_items'], owner=False, creator_pid=state['creator_pid'])
+
+    @property
+    def names(self):
+        """The names of the shared memory blocks."""
+        return self._names
+
+    def __getitem__(self, key):
+        return self._catalog[key]
+
+    def __contains__(self, key):
+        return key in self._catalog
+
+    def __len__(self):
+        return self._num_items
+
+    def __iter__(self):
+        return iter(self._catalog)
+
+    def _get_many_vectorized(self, keys, missing):
+        return self._catalog._get_many_vectorized(keys, missing)
+
+    def _contains_many_vectorized(self, keys):
+        return self._catalog._contains_many_vectorized(keys)
+
+    def close(self):
+        """Detach from the shared memory. The catalog cannot be used after it has been closed."""
+        self._catalog = None
+        for column in self._columns:
+            column.release()
+        self._columns = []
+        for block in self._blocks:
+            block.close()
+        self._blocks = []
+
+    def __del__(self):
+        # Release the views before the shared memory blocks are themselves
+        # finalized, which fails while views of their buffers exist.
+        if getattr(self, '_columns', None) is not None:
+            self.close()
+
+    def unlink(self):
+        """Close the catalog and, if this instance owns the shared memory, free it."""
+        self.close()
+        if self._owner:
+            for name in self._names:
+                block = shared_memory.SharedMemory(name=name)
+                block.close()
+                block.unlink()
+            self._owner = False
+
+    def __repr__(self):
+        return '{}(names={!r}, num_items={})'.format(self.__class__.__name__, self._names, self._num_items)
+
+
+class SharedCatalog2D(SharedCatalog):
+    """An immutable mapping from (i, j) integer keys to integer values held in shared memory.
+
+    The keys and values are stored as for a SortedArrayCatalog2D.
+    """
+
+    def __init__(self, names, num_items, owner, creator_pid, i_range, j_range):
+        """Attach to existing shared memory blocks.
+
+        Args:
+            names: The names of the shared memory blocks containing the i and j
+                components of the keys, followed by the values.
+
+            num_items: The number of items in the mapping.
+
+            owner: True if this instance is responsible for unlinking the shared memory.
+
+            creator_pid: The id of the process which created the shared memory.
+
+            i_range: A sorted sequence of all and only valid i indexes.
+
+            j_range: A sorted sequence of all and only valid j indexes.
+        """
+        self._i_range = i_range
+        self._j_range = j_range
+        super().__init__(names, num_items, owner, creator_pid)
+
+    def _make_catalog(self, columns):
+        return SortedArrayCatalog2D(self._i_range, self._j_range, *columns)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.update(i_range=self._i_range, j_range=self._j_range)
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state['names'], state['num_items'], owner=False, creator_pid=state['creator_pid'],
+                      i_range=state['i_range'], j_range=state['j_range'])
+
+    @property
+    def i_range(self):
+        return self._i_range
+
+    @property
+    def j_range(self):
+        return self._j_range
+
+
+class SharedMultiValuedCatalog(SharedCatalog):
+    """An immutable mapping from integer keys to runs of integer values held in shared memory.
+
+    The keys, offsets and values are stored as for a MultiValuedCatalog.
+    """
+
+    def __init__(self, names, num_items, owner, creator_pid, num_values):
+        """Attach to existing shared memory blocks.
+
+        Args:
+            names: The names of the shared memory blocks containing the keys,
+                the offsets and the values.
+
+            num_items: The number of distinct keys.
+
+            owner: True if this instance is responsible for unlinking the shared memory.
+
+            creator_pid: The id of the process which created the shared memory.
+
+            num_values: The total number of values for all keys.
+        """
+        self._num_values = num_values
+        super().__init__(names, num_items, owner, creator_pid)
+
+    def _column_lengths(self):
+        num_key_columns = len(self._names) - 2
+        return [self._num_items] * num_key_columns + [self._num_items + 1, self._num_values]
+
+    def _make_catalog(self, columns):
+        return MultiValuedCatalog(*columns)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.update(num_values=self._num_values)
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state['names'], state['num_items'], owner=False, creator_pid=state['creator_pid'],
+                      num_values=state['num_values'])
+
+    @property
+    def num_values(self):
+        """The total number of values for all keys."""
+        return self._num_values
+
+    def values_at(self, key):
+        """All of the values corresponding to a key, as for MultiValuedCatalog.values_at()."""
+        return self._catalog.values_at(key)
+
+
+class SharedMultiValuedCatalog2D(SharedMultiValuedCatalog):
+    """An immutable mapping from (i, j) integer keys to runs of integer values held in shared memory.
+
+    The keys, offsets and values are stored as for a MultiValuedCatalog2D.
+    """
+
+    def __init__(self, names, num_items, owner, creator_pid, num_values, i_range, j_range):
+        """Attach to existing shared memory blocks.
+
+        Args:
+            names: The names of the shared memory blocks containing the i and j
+                components of the keys, the offsets and the values.
+
+            num_items: The number of distinct keys.
+
+            owner: True if this instance is responsible for unlinking the shared memory.
+
+            creator_pid: The id of the process which created the shared memory.
+
+            num_values: The total number of values for all keys.
+
+            i_range: A sorted sequence of all and only valid i indexes.
+
+            j_range: A sorted sequence of all and only valid j indexes.
+        """
+        self._i_range = i_range
+        self._j_range = j_range
+        super().__init__(names, num_items, owner, creator_pid, num_values)
+
+    def _make_catalog(self, columns):
+        return MultiValuedCatalog2D(self._i_range, self._j_range, *columns)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.update(i_range=self._i_range, j_range=self._j_range)
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state['names'], state['num_items'], owner=False, creator_pid=state['creator_pid'],
+                      num_values=state['num_values'], i_range=state['i_range'], j_range=state['j_range'])
+
+    @property
+    def i_range(self):
+        return self._i_range
+
+    @property
+    def j_range(self):
+        return self._j_range
+
+
+def share_catalog(catalog):
+    """Copy a catalog into shared memory.
+
+    Args:
+        catalog: A mapping from integers, or 2-tuples of integers, to integers.
+
+    Returns:
+        A SharedCatalog, or a SharedCatalog2D for 2-tuple keys, which owns the
+        shared memory. A MultiValuedCatalog or MultiValuedCatalog2D is shared
+        as a SharedMultiValuedCatalog or SharedMultiValuedCatalog2D. Call its unlink() method when the memory is no longer
+        required by any process.
+
+    Raises:
+        ValueError: If the catalog keys or values are not of a supported kind.
+        ImportError: If shared memory is not available.
+    """
+    _require_shared_memory()
+    if not isinstance(catalog, (SortedArrayCatalog, SortedArrayCatalog2D, MultiValuedCatalog)):
+        catalog = _sorted_array_catalog(catalog)
+
+    if isinstance(catalog, MultiValuedCatalog2D):
+        blocks = [_create_block(column) for column in _int64_columns(
+                      catalog.i_key_array, catalog.j_key_array, catalog.offset_array, catalog.value_array)]
+        shared = SharedMultiValuedCatalog2D([block.name for block in blocks], len(catalog), owner=True,
+                                            creator_pid=os.getpid(), num_values=catalog.num_values,
+                                            i_range=catalog.i_range, j_range=catalog.j_range)
+    elif isinstance(catalog, MultiValuedCatalog):
+        blocks = [_create_block(column) for column in _int64_columns(
+                      catalog.key_array, catalog.offset_array, catalog.value_array)]
+        shared = SharedMultiValuedCatalog([block.name for block in blocks], len(catalog), owner=True,
+                                          creator_pid=os.getpid(), num_values=catalog.num_values)
+    elif isinstance(catalog, SortedArrayCatalog2D):
+        blocks = [_create_block(column) for column in _int64_columns(
+                      catalog.i_key_array, catalog.j_key_array, catalog.value_array)]
+        shared = SharedCatalog2D([block.name for block in blocks], len(catalog), owner=True,
+                                 creator_pid=os.getpid(), i_range=catalog.i_range, j_range=catalog.j_range)
+    else:
+        blocks = [_create_block(column) for column in _int64_columns(catalog.key_array, catalog.value_array)]
+        shared = SharedCatalog([block.name for block in blocks], len(catalog), owner=True, creator_pid=os.getpid())
+    for block in blocks:
+        block.close()
+    return shared
+
+
+class SharedReaderHandle:
+    """A lightweight, picklable handle from which a SegYReader can be re-created in another process.
+
+    The handle contains the path of the SEG Y file, its reel headers and its
+    catalogs. Large catalogs are held in shared memory, so pickling the
+    handle is cheap. Use share_reader() to create a SharedReaderHandle.
+    """
+
+    def __init__(self, filename, reader_class, reader_args, catalogs):
+        self._filename = filename
+        self._reader_class = reader_class
+        self._reader_args = reader_args
+        self._catalogs = catalogs
+
+    @property
+    def filename(self):
+        """The path of the SEG Y file."""
+        return self._filename
+
+    def open(self):
+        """Open the SEG Y file and create a reader which uses the shared catalogs.
+
+        Returns:
+            A SegYReader, SegYReader2D or SegYReader3D. The caller is responsible for
+            closing the reader's file.
+        """
+        fh = open(self._filename, 'rb')
+        args = dict(self._reader_args)
+        args.update(self._catalogs)
+        return self._reader_class(fh, **args)
+
+    def close(self):
+        """Detach from any shared catalogs and, if this handle created them, free them.
+
+        Readers opened from this handle cannot be used after it has been closed.
+        """
+        for catalog in self._catalogs.values():
+            if isinstance(catalog, SharedCatalog):
+                catalog.unlink()
+        for catalog in self._catalogs.get('key_catalogs', {}).values():
+            if isinstance(catalog, SharedCatalog):
+                catalog.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return '{}(filename={!r}, reader_class={})'.format(
+            self.__class__.__name__, self._filename, self._reader_class.__name__)
+
+
+def share_reader(reader):
+    """Create a handle from which a reader can be cheaply re-created in other processes.
+
+    Large catalogs are copied into shared memory. Other catalogs, which have
+    compact representations, are retained as they are.
+
+    Args:
+        reader: A SegYReader of a file with a known name.
+
+    Returns:
+        A SharedReaderHandle which owns the shared memory. Close the handle, or use
+        it as a context manager, to free the shared memory when it is no longer
+        required by any process.
+
+    Raises:
+        ValueError: If the reader's file name is unknown.
+        ImportError: If shared memory is not available.
+    """
+    _require_shared_memory()
+    if not os.path.isfile(reader.filename):
+        raise ValueError("Cannot share reader of {!r}, which is not a named file".format(reader.filename))
+
+    reader_args = dict(textual_reel_header=reader.textual_reel_header,
+                       binary_reel_header=reader.binary_reel_header,
+                       extended_textual_headers=reader.extended_textual_header,
+                       trace_header_format=reader.trace_header_format_class,
+                       encoding=reader.encoding,
+                       endian=reader.endian)
+
+    catalogs = dict(trace_offset_catalog=_maybe_share(reader._trace_offset_catalog),
+                    trace_length_catalog=_maybe_share(reader._trace_length_catalog),
+                    key_catalogs={name: _maybe_share(catalog) for name, catalog in reader._key_catalogs.items()})
+    if isinstance(reader, SegYReader3D):
+        catalogs['line_catalog'] = _maybe_share(reader._line_catalog)
+    elif isinstance(reader, SegYReader2D):
+        catalogs['cdp_catalog'] = _maybe_share(reader._cdp_catalog)
+
+    return SharedReaderHandle(os.path.abspath(reader.filename), type(reader), reader_args, catalogs)
+
+
+def _sorted_array_catalog(catalog):
+    """Copy a mapping into a SortedArrayCatalog or SortedArrayCatalog2D.
+
+    Raises:
+        ValueError: If the keys or values cannot be represented as 64-bit integers.
+    """
+    items = sorted(catalog.items())
+    try:
+        values = array('q', (value for _, value in items))
+        if all(isinstance(key, int) for key, _ in items):
+            return SortedArrayCatalog(array('q', (key for key, _ in items)), values)
+        if all(isinstance(key, Sequence) and len(key) == 2 for key, _ in items):
+            return SortedArrayCatalog2D(make_sorted_distinct_sequence(key[0] for key, _ in items),
+                                        make_sorted_distinct_sequence(key[1] for key, _ in items),
+                                        array('q', (key[0] for key, _ in items)),
+                                        array('q', (key[1] for key, _ in items)),
+                                        values)
+    except (OverflowError, TypeError):
+        pass
+    raise ValueError(_UNSHAREABLE_MESSAGE)
+
+
+def _maybe_share(catalog):
+    """Share a catalog if it is of a kind which may be large, otherwise return it unchanged."""
+    if not isinstance(catalog, SHAREABLE_CATALOG_TYPES):
+        return catalog
+    try:
+        return share_catalog(catalog)
+    except ValueError:
+        return catalog
+
+
+def _int64_columns(*columns):
+    """Convert the columns of a catalog to arrays of 64-bit integers, before any shared memory is created.
+
+    Raises:
+        ValueError: If a column cannot be represented as 64-bit integers.
+    """
+    try:
+        return [column if isinstance(column, array) and column.typecode == 'q' else array('q', column)
+                for column in columns]
+    except (OverflowError, TypeError):
+        raise ValueError(_UNSHAREABLE_MESSAGE)
+
+
+def _create_block(column):
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(column) * _ITEM_SIZE))
+    block.buf[:len(column) * _ITEM_SIZE] = memoryview(column).cast('B')
+    return block
+
+
+def _attach(name, untrack):
+    block = shared_memory.SharedMemory(name=name)
+    if untrack:
+        # Attaching registers the block with this process's resource tracker, which
+        # would otherwise unlink it when this process exits, although it is still
+        # in use by other processes.
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, 'shared_memory')
+        except (ImportError, AttributeError):
+            pass
+    return block
@@ -0,0 +1,306 @@
+"""Spatial indexes over trace positions.
+
+A SpatialIndex partitions the plane into a uniform grid of square cells
+and records which traces fall within each occupied cell, so that nearest
+trace, k-nearest trace and bounding-box or polygon queries only need to
+examine the few cells near the query.
+
+Trace header coordinates are stored as integers to which the xy_scalar
+trace header field must be applied. Use scale_coordinate() to obtain the
+actual coordinate value.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import heappush, heappushpop
+from math import floor, hypot, sqrt
+import reprlib
+
+# Mapping from coordinate names to the trace header fields containing the x and y coordinates.
+COORDINATE_FIELDS = {
+    'cdp': ('cdp_x', 'cdp_y'),
+    'source': ('source_x', 'source_y'),
+    'receiver': ('group_x', 'group_y'),
+}
+
+
+def scale_coordinate(value, xy_scalar):
+    """Apply a SEG Y xy_scalar to a coordinate.
+
+    Args:
+        value: The coordinate value as stored in the trace header.
+
+        xy_scalar: The xy_scalar trace header field value. Positive values
+            are multipliers, negative values are divisors, and zero is
+            treated as one.
+
+    Returns:
+        The scaled coordinate as a float.
+    """
+    if xy_scalar > 0:
+        return float(value * xy_scalar)
+    if xy_scalar < 0:
+        return value / -xy_scalar
+    return float(value)
+
+
+# The maximum number of cells, along each axis and in area, per indexed point when
+# the cell size is chosen automatically.
+MAX_CELLS_PER_POINT = 4
+
+
+class SpatialIndex:
+    """An immutable uniform-grid index of points, each identified by a trace index.
+    """
+
+    def __init__(self, xs, ys, cell_size=None):
+        """Initialize a SpatialIndex.
+
+        Args:
+            xs: A sequence of x coordinates, where the item at position n
+                is the x coordinate of trace index n.
+
+            ys: A sequence of y coordinates, where the item at position n
+                is the y coordinate of trace index n.
+
+            cell_size: The optional side length of the square grid cells.
+                If None, a cell size is chosen based on the typical spacing
+                between successive points, but large enough that the grid
+                has no more than a few cells per point.
+
+        Raises:
+            ValueError: If xs and ys are of different lengths, or if cell_size
+                is not positive.
+        """
+        if len(xs) != len(ys):
+            raise ValueError("{} x and y coordinate sequences have different lengths {} and {}"
+                             .format(self.__class__.__name__, len(xs), len(ys)))
+        self._xs = array('d', xs)
+        self._ys = array('d', ys)
+        num_points = len(self._xs)
+
+        if num_points == 0:
+            self._x_min = self._y_min = 0.0
+            self._num_columns = self._num_rows = 0
+        else:
+            self._x_min = min(self._xs)
+            self._y_min = min(self._ys)
+            x_extent = max(self._xs) - self._x_min
+            y_extent = max(self._ys) - self._y_min
+
+        if cell_size is None:
+            cell_size = self._choose_cell_size(x_extent, y_extent) if num_points > 0 else 1.0
+        if not cell_size > 0:
+            raise ValueError("{} cell size {!r} is not positive".format(self.__class__.__name__, cell_size))
+        self._cell_size = float(cell_size)
+
+        if num_points > 0:
+            # Size the grid with the same arithmetic as used to assign points to cells, since
+            # floor division and rounded true division can disagree at the maximum edge.
+            max_column, max_row = self._cell_of(max(self._xs), max(self._ys))
+            self._num_columns = max_column + 1
+            self._num_rows = max_row + 1
+
+        cell_ids = [self._cell_id(*self._cell_of(x, y)) for x, y in zip(self._xs, self._ys)]
+        order = sorted(range(num_points), key=cell_ids.__getitem__)
+
+        self._order = array('q', order)
+        self._cell_keys = array('q')
+        self._cell_starts = array('q')
+        previous_cell_id = None
+        for position, point_index in enumerate(order):
+            cell_id = cell_ids[point_index]
+            if cell_id != previous_cell_id:
+                self._cell_keys.append(cell_id)
+                self._cell_starts.append(position)
+                previous_cell_id = cell_id
+        self._cell_starts.append(num_points)
+
+    def _choose_cell_size(self, x_extent, y_extent):
+        # Traces are usually stored in acquisition or line order, so the
+        # median distance between successive traces is a good estimate of
+        # the trace spacing, for regular grids and irregular lines alike.
+        distances = sorted(d for d in (hypot(x1 - x0, y1 - y0)
+                                       for x0, y0, x1, y1 in zip(self._xs, self._ys, self._xs[1:], self._ys[1:]))
+                           if d > 0)
+        if len(distances) > 0:
+            cell_size = 2 * distances[len(distances) // 2]
+        else:
+            cell_size = 0.0
+
+        # Clustered or near-duplicate points give a tiny typical spacing, so bound
+        # the number of cells to O(n), otherwise queries could examine huge numbers
+        # of empty cells. With at most max_num_cells cells along each axis and in
+        # area, there are at most 3 * max_num_cells + 1 cells in the grid.
+        max_num_cells = MAX_CELLS_PER_POINT * len(self._xs)
+        min_cell_size = max(sqrt(x_extent * y_extent / max_num_cells),
+                            max(x_extent, y_extent) / max_num_cells)
+        cell_size = max(cell_size, min_cell_size)
+        return cell_size if cell_size > 0 else 1.0
+
+    @property
+    def cell_size(self):
+        """The side length of the square grid cells."""
+        return self._cell_size
+
+    def __len__(self):
+        return len(self._xs)
+
+    def position(self, trace_index):
+        """The (x, y) position of a trace."""
+        return self._xs[trace_index], self._ys[trace_index]
+
+    def nearest(self, x, y):
+        """Find the trace nearest to a point.
+
+        Args:
+            x: The x coordinate of the query point.
+            y: The y coordinate of the query point.
+
+        Returns:
+            The trace index of the nearest trace, or None if the index is empty.
+        """
+        nearest = self.k_nearest(x, y, 1)
+        return nearest[0] if nearest else None
+
+    def k_nearest(self, x, y, k):
+        """Find the k traces nearest to a point.
+
+        Args:
+            x: The x coordinate of the query point.
+            y: The y coordinate of the query point.
+            k: The maximum number of traces to find.
+
+        Returns:
+            A list of up to k trace indexes, nearest first.
+        """
+        if k < 1 or len(self._xs) == 0:
+            return []
+
+        query_column, query_row = self._cell_of(x, y)
+        # Holds (-distance, -trace_index) so the furthest candidate is at heap[0]. Distances are
+        # computed with hypot(), since squared distances can underflow for tiny coordinate differences.
+        heap = []
+
+        ring = max(self._ring_distance_to_grid(query_column, query_row), 0)
+        max_ring = max(abs(query_column), abs(query_column - self._num_columns + 1),
+                       abs(query_row), abs(query_row - self._num_rows + 1))
+        while ring <= max_ring:
+            for column, row in self._ring_cells(query_column, query_row, ring):
+                for point_index in self._points_in_cell(column, row):
+                    distance = hypot(self._xs[point_index] - x, self._ys[point_index] - y)
+                    item = (-distance, -point_index)
+                    if len(heap) < k:
+                        heappush(heap, item)
+                    elif item > heap[0]:
+                        heappushpop(heap, item)
+            # Any point in a cell beyond this ring is at least ring * cell_size from the query point
+            if len(heap) == k and -heap[0][0] <= ring * self._cell_size:
+                break
+            ring += 1
+
+        return [-neg_index for _, neg_index in sorted(heap, reverse=True)]
+
+    def within_box(self, x_min, y_min, x_max, y_max):
+        """Find the traces within an axis-aligned rectangle, including its boundary.
+
+        Returns:
+            An array of trace indexes in ascending order.
+        """
+        result = array('q', sorted(self._candidates_in_box(x_min, y_min, x_max, y_max)))
+        return array('q', (i for i in result
+                            if (x_min <= self._xs[i] <= x_max) and (y_min <= self._ys[i] <= y_max)))
+
+    def within_polygon(self, vertices):
+        """Find the traces within a simple polygon.
+
+        Args:
+            vertices: A sequence of (x, y) vertex coordinates. The polygon is
+                implicitly closed.
+
+        Returns:
+            An array of trace indexes in ascending order.
+        """
+        vertices = list(vertices)
+        if len(vertices) < 3:
+            raise ValueError("A polygon requires at least three vertices; {} were provided".format(len(vertices)))
+        xs = [vx for vx, vy in vertices]
+        ys = [vy for vx, vy in vertices]
+        candidates = sorted(self._candidates_in_box(min(xs), min(ys), max(xs), max(ys)))
+        return array('q', (i for i in candidates
+                            if _point_in_polygon(self._xs[i], self._ys[i], vertices)))
+
+    def _candidates_in_box(self, x_min, y_min, x_max, y_max):
+        if len(self._xs) == 0 or x_max < x_min or y_max < y_min:
+            return
+        column_begin, row_begin = self._cell_of(x_min, y_min)
+        column_end, row_end = self._cell_of(x_max, y_max)
+        column_begin = max(column_begin, 0)
+        row_begin = max(row_begin, 0)
+        column_end = min(column_end, self._num_columns - 1)
+        row_end = min(row_end, self._num_rows - 1)
+        if column_begin > column_end:
+            return
+        for row in range(row_begin, row_end + 1):
+            key_begin = bisect_left(self._cell_keys, self._cell_id(column_begin, row))
+            key_end = bisect_right(self._cell_keys, self._cell_id(column_end, row))
+            yield from self._order[self._cell_starts[key_begin]:self._cell_starts[key_end]]
+
+    def _cell_of(self, x, y):
+        return (int(floor((x - self._x_min) / self._cell_size)),
+                int(floor((y - self._y_min) / self._cell_size)))
+
+    def _cell_id(self, column, row):
+        return row * self._num_columns + column
+
+    def _points_in_cell(self, column, row):
+        cell_id = self._cell_id(column, row)
+        key_index = bisect_left(self._cell_keys, cell_id)
+        if key_index == len(self._cell_keys) or self._cell_keys[key_index] != cell_id:
+            return ()
+        return self._order[self._cell_starts[key_index]:self._cell_starts[key_index + 1]]
+
+    def _ring_distance_to_grid(self, column, row):
+        """The Chebyshev distance in cells from a cell to the nearest cell of the grid."""
+        column_distance = max(0 - column, column - (self._num_columns - 1), 0)
+        row_distance = max(0 - row, row - (self._num_rows - 1), 0)
+        return max(column_distance, row_distance)
+
+    def _ring_cells(self, column, row, ring):
+        """Generate the cells within the grid at Chebyshev distance ring from a cell."""
+        column_min = max(column - ring, 0)
+        column_max = min(column + ring, self._num_columns - 1)
+        row_min = max(row - ring, 0)
+        row_max = min(row + ring, self._num_rows - 1)
+        if ring == 0:
+            if (column_min <= column <= column_max) and (row_min <= row <= row_max):
+                yield column, row
+            return
+        for r in (row - ring, row + ring):
+            if 0 <= r < self._num_rows:
+                for c in range(column_min, column_max + 1):
+                    yield c, r
+        for c in (column - ring, column + ring):
+            if 0 <= c < self._num_columns:
+                for r in range(max(row - ring + 1, 0), min(row + ring - 1, self._num_rows - 1) + 1):
+                    yield c, r
+
+    def __repr__(self):
+        return '{}(xs={}, ys={}, cell_size={})'.format(
+            self.__class__.__name__,
+            reprlib.repr(self._xs),
+            reprlib.repr(self._ys),
+            self._cell_size)
+
+
+def _point_in_polygon(x, y, vertices):
+    """Even-odd rule point in polygon test."""
+    inside = False
+    x0, y0 = vertices[-1]
+    for x1, y1 in vertices:
+        if (y1 > y) != (y0 > y):
+            x_crossing = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+            if x < x_crossing:
+                inside = not inside
+        x0, y0 = x1, y1
+    return inside
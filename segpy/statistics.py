@@ -0,0 +1,812 @@
+"""Streaming amplitude statistics for quality control and display.
+
+The statistics of a SEG Y file are computed in a single pass over the
+traces. Every statistic is held as a partial state which can be merged with
+another, so that the traces can be divided between worker processes and the
+partial results combined:
+
+  * Moments accumulates the count, minimum, maximum, mean and variance
+    using the parallel form of Welford's algorithm.
+
+  * Histogram counts samples in fixed bins over a given range.
+
+  * TDigest is a merging t-digest sketch from which quantiles, such as the
+    percentiles used to clip seismic displays, can be estimated.
+
+Moments, a histogram and a quantile sketch are computed for each inline of
+3D surveys and, by merging those, for the whole volume. Keeping a histogram
+and sketch for every trace would cost far more than the traces' samples, so
+only the count, extrema, mean and RMS value are retained for each trace.
+
+NaN samples are counted by Moments and Histogram, but are otherwise
+excluded from every statistic.
+
+When the reader was created with caching enabled, the results are stored
+in a sidecar file next to the reader's cache file, and are subsequently
+retrieved without reading the traces again.
+
+Usage:
+
+    stats = amplitude_statistics(reader)
+    print(stats.volume.rms)
+    low, high = stats.clip_range(0.98)
+"""
+
+import math
+import os
+import pickle
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from functools import partial
+
+from segpy import __version__, log
+from segpy.parallel import map_traces
+from segpy.reader import SegYReader3D
+
+# The default number of centroids, approximately, retained by a TDigest.
+DEFAULT_COMPRESSION = 100
+
+DEFAULT_NUM_HISTOGRAM_BINS = 256
+
+STATISTICS_SIDECAR_SUFFIX = '.stats.p'
+
+# Increment when the pickled form of AmplitudeStatistics changes
+PICKLE_VERSION = 2
+
+TraceSummary = namedtuple('TraceSummary', ['count', 'minimum', 'maximum', 'mean', 'rms'])
+
+
+class Moments:
+    """The count, extrema, mean and variance of a series of values, accumulated in a single pass."""
+
+    def __init__(self):
+        self._count = 0
+        self._num_nans = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._minimum = math.inf
+        self._maximum = -math.inf
+
+    @classmethod
+    def of(cls, values):
+        """Create Moments from an iterable series of values."""
+        moments = cls()
+        moments.update(values)
+        return moments
+
+    def update(self, values):
+        """Accumulate a batch of values. NaN values are counted, but otherwise ignored."""
+        values = values if isinstance(values, (list, tuple, array)) else list(values)
+        values, num_nans = _without_nans(values)
+        self._num_nans += num_nans
+        count = len(values)
+        if count == 0:
+            return
+        mean = math.fsum(values) / count
+        batch = Moments()
+        batch._count = count
+        batch._mean = mean
+        batch._m2 = math.fsum((value - mean) ** 2 for value in values)
+        batch._minimum = min(values)
+        batch._maximum = max(values)
+        self.merge(batch)
+
+    def merge(self, other):
+        """Combine another Moments into this one.
+
+        Returns:
+            This Moments.
+        """
+        self._num_nans += other._num_nans
+        if other._count == 0:
+            return self
+        if self._count == 0:
+            self._count, self._mean, self._m2 = other._count, other._mean, other._m2
+            self._minimum, self._maximum = other._minimum, other._maximum
+            return self
+        count = self._count + other._count
+        delta = other._mean - self._mean
+        self._mean += delta * other._count / count
+        self._m2 += other._m2 + delta * delta * self._count * other._count / count
+        self._count = count
+        self._minimum = min(self._minimum, other._minimum)
+        self._maximum = max(self._maximum, other._maximum)
+        return self
+
+    @property
+    def count(self):
+        """The number of values, excluding NaNs."""
+        return self._count
+
+    @property
+    def num_nans(self):
+        """The number of NaN values, which are excluded from the other statistics."""
+        return self._num_nans
+
+    @property
+    def minimum(self):
+        """The smallest value, or None if there are no values."""
+        return self._minimum if self._count > 0 else None
+
+    @property
+    def maximum(self):
+        """The largest value, or None if there are no values."""
+        return self._maximum if self._count > 0 else None
+
+    @property
+    def mean(self):
+        """The arithmetic mean, or None if there are no values."""
+        return self._mean if self._count > 0 else None
+
+    @property
+    def variance(self):
+        """The population variance, or None if there are no values."""
+        return self._m2 / self._count if self._count > 0 else None
+
+    @property
+    def std(self):
+        """The population standard deviation, or None if there are no values."""
+        return math.sqrt(self.variance) if self._count > 0 else None
+
+    @property
+    def rms(self):
+        """The root-mean-square value, or None if there are no values."""
+        return math.sqrt(self.variance + self._mean * self._mean) if self._count > 0 else None
+
+    def summary(self):
+        """A TraceSummary of these moments."""
+        return TraceSummary(self.count, self.minimum, self.maximum, self.mean, self.rms)
+
+    def __repr__(self):
+        return '{}(count={}, minimum={}, maximum={}, mean={}, std={})'.format(
+            self.__class__.__name__, self.count, self.minimum, self.maximum, self.mean, self.std)
+
+
+class Histogram:
+    """Counts of values in equal-width bins spanning a fixed range.
+
+    Values below the range are counted as underflow, values above it as
+    overflow, and NaN values separately. The maximum of the range is
+    included in the last bin.
+    """
+
+    def __init__(self, minimum, maximum, num_bins=DEFAULT_NUM_HISTOGRAM_BINS):
+        """Initialize an empty Histogram.
+
+        Args:
+            minimum: The lower edge of the first bin.
+
+            maximum: The upper edge of the last bin.
+
+            num_bins: The number of bins.
+
+        Raises:
+            ValueError: If the range is empty or num_bins is not positive.
+        """
+        if not minimum < maximum:
+            raise ValueError("Histogram minimum {} is not less than maximum {}".format(minimum, maximum))
+        if num_bins < 1:
+            raise ValueError("Histogram num_bins {} is not positive".format(num_bins))
+        self._minimum = minimum
+        self._maximum = maximum
+        self._counts = array('q', [0]) * num_bins
+        self._underflow = 0
+        self._overflow = 0
+        self._num_nans = 0
+
+    def update(self, values):
+        """Count a batch of values."""
+        minimum, maximum = self._minimum, self._maximum
+        num_bins = len(self._counts)
+        scale = num_bins / (maximum - minimum)
+        counts = self._counts
+        for value in values:
+            if value < minimum:
+                self._underflow += 1
+            elif value > maximum:
+                self._overflow += 1
+            elif value != value:
+                self._num_nans += 1
+            else:
+                counts[min(int((value - minimum) * scale), num_bins - 1)] += 1
+
+    def merge(self, other):
+        """Combine another Histogram with identical bins into this one.
+
+        Returns:
+            This Histogram.
+
+        Raises:
+            ValueError: If the bins of the histograms differ.
+        """
+        if (self._minimum, self._maximum, len(self._counts)) != (other._minimum, other._maximum, len(other._counts)):
+            raise ValueError("Cannot merge histograms with different bins")
+        for index, count in enumerate(other._counts):
+            self._counts[index] += count
+        self._underflow += other._underflow
+        self._overflow += other._overflow
+        self._num_nans += other._num_nans
+        return self
+
+    def edges(self):
+        """A tuple of the num_bins + 1 bin edges."""
+        num_bins = len(self._counts)
+        width = (self._maximum - self._minimum) / num_bins
+        return tuple(self._minimum + index * width for index in range(num_bins)) + (self._maximum,)
+
+    @property
+    def counts(self):
+        """The number of values in each bin."""
+        return tuple(self._counts)
+
+    @property
+    def underflow(self):
+        """The number of values below the range of the histogram."""
+        return self._underflow
+
+    @property
+    def overflow(self):
+        """The number of values above the range of the histogram."""
+        return self._overflow
+
+    @property
+    def num_nans(self):
+        """The number of NaN values, which are not counted in any bin."""
+        return self._num_nans
+
+    def __repr__(self):
+        return '{}(minimum={}, maximum={}, num_bins={})'.format(
+            self.__class__.__name__, self._minimum, self._maximum, len(self._counts))
+
+
+class TDigest:
+    """A mergeable sketch of a distribution from which quantiles can be estimated.
+
+    Values are summarised by weighted centroids which are small near the
+    extremes of the distribution and larger near its middle, so that
+    quantiles in the tails are estimated accurately with a bounded number
+    of centroids. See Dunning & Ertl, "Computing extremely accurate
+    quantiles using t-digests".
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        """Initialize an empty TDigest.
+
+        Args:
+            compression: Larger values retain more centroids, giving more
+                accurate quantiles at the cost of memory.
+
+        Raises:
+            ValueError: If compression is not positive.
+        """
+        if compression <= 0:
+            raise ValueError("TDigest compression {} is not positive".format(compression))
+        self._compression = compression
+        self._means = []
+        self._weights = []
+        self._unmerged = []  # (mean, weight) pairs
+        self._count = 0
+        self._minimum = math.inf
+        self._maximum = -math.inf
+
+    @property
+    def compression(self):
+        return self._compression
+
+    @property
+    def count(self):
+        """The number of values summarised."""
+        return self._count
+
+    def update(self, values):
+        """Add a batch of values. NaN values are ignored."""
+        for value in values:
+            if value != value:
+                continue
+            self._unmerged.append((value, 1))
+            self._count += 1
+            if value < self._minimum:
+                self._minimum = value
+            if value > self._maximum:
+                self._maximum = value
+        self._compress_if_full()
+
+    def merge(self, other):
+        """Combine another TDigest into this one.
+
+        Returns:
+            This TDigest.
+        """
+        self._unmerged.extend(zip(other._means, other._weights))
+        self._unmerged.extend(other._unmerged)
+        self._count += other._count
+        self._minimum = min(self._minimum, other._minimum)
+        self._maximum = max(self._maximum, other._maximum)
+        self._compress_if_full()
+        return self
+
+    def _compress_if_full(self):
+        if len(self._unmerged) > 10 * self._compression:
+            self._compress()
+
+    def _compress(self):
+        if not self._unmerged:
+            return
+        points = sorted(list(zip(self._means, self._weights)) + self._unmerged)
+        self._unmerged = []
+        total = self._count
+        means = []
+        weights = []
+        cumulative = 0
+        current_mean, current_weight = points[0]
+        for mean, weight in points[1:]:
+            combined_weight = current_weight + weight
+            q = (cumulative + combined_weight / 2) / total
+            if combined_weight <= 4 * total * q * (1 - q) / self._compression:
+                current_mean += (mean - current_mean) * weight / combined_weight
+                current_weight = combined_weight
+            else:
+                means.append(current_mean)
+                weights.append(current_weight)
+                cumulative += current_weight
+                current_mean, current_weight = mean, weight
+        means.append(current_mean)
+        weights.append(current_weight)
+        self._means = means
+        self._weights = weights
+
+    def quantile(self, q):
+        """Estimate a quantile.
+
+        Args:
+            q: A number between zero and one.
+
+        Returns:
+            The estimated value below which the fraction q of values fall.
+
+        Raises:
+            ValueError: If q is out of range or the digest is empty.
+        """
+        if not (0 <= q <= 1):
+            raise ValueError("Quantile {} is not between zero and one".format(q))
+        if self._count == 0:
+            raise ValueError("Cannot estimate a quantile of an empty {}".format(self.__class__.__name__))
+        self._compress()
+
+        # Interpolate between the centres of the centroids, anchored at the extremes.
+        positions = [0.0]
+        values = [self._minimum]
+        cumulative = 0
+        for mean, weight in zip(self._means, self._weights):
+            positions.append(cumulative + weight / 2)
+            values.append(mean)
+            cumulative += weight
+        positions.append(float(cumulative))
+        values.append(self._maximum)
+
+        target = q * cumulative
+        index = bisect_left(positions, target)
+        if index == 0:
+            return values[0]
+        lower_position, upper_position = positions[index - 1], positions[index]
+        lower_value, upper_value = values[index - 1], values[index]
+        if upper_position == lower_position:
+            return upper_value
+        fraction = (target - lower_position) / (upper_position - lower_position)
+        return lower_value + fraction * (upper_value - lower_value)
+
+    def percentile(self, p):
+        """Estimate a percentile, where p is a number between zero and one hundred."""
+        return self.quantile(p / 100)
+
+    def __getstate__(self):
+        self._compress()
+        return self.__dict__
+
+    def __repr__(self):
+        return '{}(compression={}, count={})'.format(self.__class__.__name__, self._compression, self._count)
+
+
+class AmplitudeStatistics:
+    """The sample statistics of a SEG Y file, per trace, per inline and for the whole volume.
+
+    Only a TraceSummary of scalars is retained for each trace, held in
+    compact arrays. For 3D surveys a histogram and quantile sketch are kept
+    for each inline, and those of the volume are obtained by merging them.
+    """
+
+    def __init__(self, histogram_range=None, num_bins=DEFAULT_NUM_HISTOGRAM_BINS, compression=DEFAULT_COMPRESSION):
+        """Initialize empty statistics.
+
+        Usually AmplitudeStatistics are obtained from amplitude_statistics().
+
+        Args:
+            histogram_range: An optional (minimum, maximum) pair. If None, no
+                histogram is accumulated.
+
+            num_bins: The number of histogram bins.
+
+            compression: The compression of the quantile sketch.
+        """
+        self._parameters = (None if histogram_range is None else tuple(histogram_range), num_bins, compression)
+        self._volume = Moments()
+        # The histogram and digest of samples of traces without an inline number
+        self._histogram = self._make_histogram()
+        self._digest = TDigest(compression)
+        self._inlines = {}
+        self._inline_histograms = {}
+        self._inline_digests = {}
+        # The histogram and digest of the volume, merged on demand
+        self._volume_sketches = None
+        self._trace_indexes = array('q')
+        self._trace_counts = array('q')
+        # NaN where a trace has no samples
+        self._trace_minima = array('d')
+        self._trace_maxima = array('d')
+        self._trace_means = array('d')
+        self._trace_rms = array('d')
+        self._traces_sorted = True
+
+    def add_trace(self, trace_index, inline_number, samples):
+        """Accumulate the samples of a trace.
+
+        Args:
+            trace_index: The index of a trace not already included in these statistics.
+
+            inline_number: The inline number of the trace, or None for 2D surveys.
+
+            samples: A sequence of the trace samples.
+        """
+        moments = Moments.of(samples)
+        self._append_trace(trace_index, moments)
+        self._volume.merge(moments)
+        self._volume_sketches = None
+        if inline_number is None:
+            histogram, digest = self._histogram, self._digest
+        elif inline_number in self._inlines:
+            self._inlines[inline_number].merge(moments)
+            histogram = self._inline_histograms.get(inline_number)
+            digest = self._inline_digests[inline_number]
+        else:
+            self._inlines[inline_number] = moments
+            histogram = self._inline_histograms[inline_number] = self._make_histogram()
+            digest = self._inline_digests[inline_number] = TDigest(self._parameters[2])
+        if histogram is not None:
+            histogram.update(samples)
+        digest.update(samples)
+
+    def _make_histogram(self):
+        histogram_range, num_bins, _ = self._parameters
+        return Histogram(histogram_range[0], histogram_range[1], num_bins) if histogram_range else None
+
+    def _append_trace(self, trace_index, moments):
+        if self._traces_sorted and self._trace_indexes and trace_index < self._trace_indexes[-1]:
+            self._traces_sorted = False
+        self._trace_indexes.append(trace_index)
+        self._trace_counts.append(moments.count)
+        if moments.count > 0:
+            self._trace_minima.append(moments.minimum)
+            self._trace_maxima.append(moments.maximum)
+            self._trace_means.append(moments.mean)
+            self._trace_rms.append(moments.rms)
+        else:
+            for scalars in self._trace_scalars():
+                scalars.append(math.nan)
+
+    def _trace_scalars(self):
+        return self._trace_minima, self._trace_maxima, self._trace_means, self._trace_rms
+
+    def _sort_traces(self):
+        """Order the per-trace arrays by trace index."""
+        if self._traces_sorted:
+            return
+        order = sorted(range(len(self._trace_indexes)), key=self._trace_indexes.__getitem__)
+        self._trace_indexes = array('q', (self._trace_indexes[i] for i in order))
+        self._trace_counts = array('q', (self._trace_counts[i] for i in order))
+        self._trace_minima, self._trace_maxima, self._trace_means, self._trace_rms = (
+            array('d', (scalars[i] for i in order)) for scalars in self._trace_scalars())
+        self._traces_sorted = True
+
+    def merge(self, other):
+        """Combine the statistics of another, disjoint, set of traces into these.
+
+        Returns:
+            These AmplitudeStatistics.
+
+        Raises:
+            ValueError: If the statistics were accumulated with different parameters.
+        """
+        if self._parameters != other._parameters:
+            raise ValueError("Cannot merge statistics with different parameters {} and {}"
+                             .format(self._parameters, other._parameters))
+        self._volume.merge(other._volume)
+        self._volume_sketches = None
+        if self._histogram is not None:
+            self._histogram.merge(other._histogram)
+        self._digest.merge(other._digest)
+        for inline_number, moments in other._inlines.items():
+            if inline_number in self._inlines:
+                self._inlines[inline_number].merge(moments)
+                if self._histogram is not None:
+                    self._inline_histograms[inline_number].merge(other._inline_histograms[inline_number])
+                self._inline_digests[inline_number].merge(other._inline_digests[inline_number])
+            else:
+                self._inlines[inline_number] = moments
+                if self._histogram is not None:
+                    self._inline_histograms[inline_number] = other._inline_histograms[inline_number]
+                self._inline_digests[inline_number] = other._inline_digests[inline_number]
+        if self._trace_indexes and other._trace_indexes:
+            self._traces_sorted = (self._traces_sorted and other._traces_sorted
+                                   and self._trace_indexes[-1] < other._trace_indexes[0])
+        else:
+            self._traces_sorted = self._traces_sorted and other._traces_sorted
+        self._trace_indexes.extend(other._trace_indexes)
+        self._trace_counts.extend(other._trace_counts)
+        for scalars, other_scalars in zip(self._trace_scalars(), other._trace_scalars()):
+            scalars.extend(other_scalars)
+        return self
+
+    def _merged_sketches(self):
+        """The histogram and digest of all samples, merged from those of each inline."""
+        if self._volume_sketches is None:
+            histogram = self._make_histogram()
+            digest = TDigest(self._parameters[2])
+            for inline_histogram in [self._histogram] + list(self._inline_histograms.values()):
+                if histogram is not None:
+                    histogram.merge(inline_histogram)
+            for inline_digest in [self._digest] + list(self._inline_digests.values()):
+                digest.merge(inline_digest)
+            self._volume_sketches = (histogram, digest)
+        return self._volume_sketches
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_volume_sketches'] = None
+        state['__version__'] = __version__
+        state['__pickle_version__'] = PICKLE_VERSION
+        return state
+
+    def __setstate__(self, state):
+        version = state.pop('__version__', None)
+        if version != __version__:
+            raise TypeError("Cannot unpickle {} version {} into version {}"
+                            .format(self.__class__.__name__, version, __version__))
+        pickle_version = state.pop('__pickle_version__', None)
+        if pickle_version != PICKLE_VERSION:
+            raise TypeError("Cannot unpickle {} pickle version {} into pickle version {}"
+                            .format(self.__class__.__name__, pickle_version, PICKLE_VERSION))
+        self.__dict__.update(state)
+
+    @property
+    def parameters(self):
+        """The (histogram_range, num_bins, compression) with which the statistics were accumulated."""
+        return self._parameters
+
+    @property
+    def volume(self):
+        """The Moments of all samples."""
+        return self._volume
+
+    @property
+    def histogram(self):
+        """The Histogram of all samples, or None if no histogram range was given."""
+        return self._merged_sketches()[0]
+
+    @property
+    def digest(self):
+        """The TDigest of all samples."""
+        return self._merged_sketches()[1]
+
+    def percentile(self, p):
+        """Estimate a percentile of all samples, where p is a number between zero and one hundred."""
+        return self.digest.percentile(p)
+
+    def clip_range(self, fraction=0.98):
+        """A symmetric range of quantiles containing a given fraction of samples, suitable for display clipping.
+
+        Args:
+            fraction: The fraction of samples to be included within the range.
+
+        Returns:
+            A (low, high) pair.
+        """
+        tail = (1 - fraction) / 2
+        digest = self.digest
+        return digest.quantile(tail), digest.quantile(1 - tail)
+
+    def trace_indexes(self):
+        """A sorted list of the trace indexes for which there are statistics."""
+        self._sort_traces()
+        return list(self._trace_indexes)
+
+    def trace(self, trace_index):
+        """The TraceSummary for a trace.
+
+        Raises:
+            KeyError: If there are no statistics for the trace.
+        """
+        self._sort_traces()
+        position = bisect_left(self._trace_indexes, trace_index)
+        if position == len(self._trace_indexes) or self._trace_indexes[position] != trace_index:
+            raise KeyError(trace_index)
+        count = self._trace_counts[position]
+        if count == 0:
+            return TraceSummary(0, None, None, None, None)
+        return TraceSummary(count, *(scalars[position] for scalars in self._trace_scalars()))
+
+    def inline_numbers(self):
+        """A sorted list of the inline numbers for which there are statistics (3D surveys only)."""
+        return sorted(self._inlines)
+
+    def inline(self, inline_number):
+        """The Moments of all samples in an inline.
+
+        Raises:
+            KeyError: If there are no statistics for the inline.
+        """
+        return self._inlines[inline_number]
+
+    def inline_histogram(self, inline_number):
+        """The Histogram of all samples in an inline, or None if no histogram range was given.
+
+        Raises:
+            KeyError: If there are no statistics for the inline.
+        """
+        if inline_number not in self._inlines:
+            raise KeyError(inline_number)
+        return self._inline_histograms.get(inline_number)
+
+    def inline_digest(self, inline_number):
+        """The TDigest of all samples in an inline.
+
+        Raises:
+            KeyError: If there are no statistics for the inline.
+        """
+        return self._inline_digests[inline_number]
+
+    def inline_percentile(self, inline_number, p):
+        """Estimate a percentile of all samples in an inline, where p is a number between zero and one hundred.
+
+        Raises:
+            KeyError: If there are no statistics for the inline.
+        """
+        return self._inline_digests[inline_number].percentile(p)
+
+    def __repr__(self):
+        return '{}(num_traces={}, volume={!r})'.format(self.__class__.__name__, len(self._trace_indexes), self._volume)
+
+
+def amplitude_statistics(reader, histogram_range=None, num_bins=DEFAULT_NUM_HISTOGRAM_BINS,
+                         compression=DEFAULT_COMPRESSION, workers=None, use_sidecar=True, progress=None):
+    """Compute, or retrieve, the amplitude statistics of all traces.
+
+    Args:
+        reader: A SegYReader.
+
+        histogram_range: An optional (minimum, maximum) pair. If None, no histogram is
+            accumulated, since the range of a fixed-bin histogram must be known before
+            the samples are read.
+
+        num_bins: The number of histogram bins.
+
+        compression: The compression of the quantile sketch.
+
+        workers: The number of worker processes, as for segpy.parallel.map_traces().
+            Readers of files without a name always use zero.
+
+        use_sidecar: If True, and the reader was created with caching enabled,
+            statistics previously computed with the same parameters are loaded
+            from a sidecar file next to the cache file, and newly computed
+            statistics are stored there.
+
+        progress: A unary callable which will be passed a number between zero
+            and one indicating the progress made. If provided, this callback
+            will be invoked at least once with an argument equal to one.
+
+    Returns:
+        An AmplitudeStatistics instance.
+
+    Raises:
+        TypeError: If progress is not callable.
+    """
+    progress_callback = progress if progress is not None else lambda p: None
+
+    if not callable(progress_callback):
+        raise TypeError("amplitude_statistics(): progress callback must be callable")
+
+    parameters = (None if histogram_range is None else tuple(histogram_range), num_bins, compression)
+    if use_sidecar:
+        statistics = load_statistics(reader)
+        if statistics is not None and statistics.parameters == parameters:
+            progress_callback(1)
+            return statistics
+
+    if workers is None and not os.path.isfile(reader.filename):
+        workers = 0
+
+    is_3d = isinstance(reader, SegYReader3D)
+    statistics = map_traces(reader,
+                            partial(_trace_samples, is_3d),
+                            reduce=_accumulate_statistics,
+                            initial=partial(AmplitudeStatistics, histogram_range, num_bins, compression),
+                            workers=workers,
+                            header_fields=['inline_number'] if is_3d else None,
+                            progress=progress_callback)
+    if statistics is None:
+        statistics = AmplitudeStatistics(histogram_range, num_bins, compression)
+
+    if use_sidecar:
+        save_statistics(reader, statistics)
+    return statistics
+
+
+def statistics_sidecar_path(reader):
+    """The path of the statistics sidecar file for a reader.
+
+    Returns:
+        A Path, or None if the reader was created without caching.
+    """
+    cache_file_path = getattr(reader, '_cache_file_path', None)
+    if cache_file_path is None:
+        return None
+    return cache_file_path.with_name(cache_file_path.stem + STATISTICS_SIDECAR_SUFFIX)
+
+
+def load_statistics(reader):
+    """Load previously computed statistics for a reader from its sidecar file.
+
+    Returns:
+        An AmplitudeStatistics instance, or None if there is no usable sidecar file.
+    """
+    sidecar_path = statistics_sidecar_path(reader)
+    if sidecar_path is None or not sidecar_path.is_file():
+        return None
+    with sidecar_path.open('rb') as sidecar_file:
+        try:
+            statistics = pickle.load(sidecar_file)
+        except Exception as unpickling_error:
+            log.info("Could not unpickle statistics for {} because {}".format(reader.filename, unpickling_error))
+            return None
+    if not isinstance(statistics, AmplitudeStatistics):
+        log.info("Sidecar {} does not contain {}".format(sidecar_path, AmplitudeStatistics.__name__))
+        return None
+    return statistics
+
+
+def save_statistics(reader, statistics):
+    """Store statistics in the sidecar file for a reader, if the reader was created with caching."""
+    sidecar_path = statistics_sidecar_path(reader)
+    if sidecar_path is None:
+        return
+    try:
+        os.makedirs(str(sidecar_path.parent), exist_ok=True)
+        with sidecar_path.open('wb') as sidecar_file:
+            pickle.dump(statistics, sidecar_file)
+    except OSError as os_error:
+        log.warn("Could not store statistics for {} because {}".format(reader.filename, os_error))
+
+
+def _without_nans(values):
+    """Separate NaNs from a sequence of values.
+
+    Returns:
+        A (values, num_nans) pair, where values is the original sequence if it contains no NaNs.
+    """
+    num_nans = sum(1 for value in values if value != value)
+    if num_nans == 0:
+        return values, 0
+    return [value for value in values if value == value], num_nans
+
+
+def _trace_samples(is_3d, trace_index, trace_header, samples):
+    inline_number = trace_header.inline_number if is_3d else None
+    return trace_index, inline_number, samples
+
+
+def _accumulate_statistics(statistics, other):
+    """Accumulate the (trace_index, inline_number, samples) of a trace, or merge other AmplitudeStatistics."""
+    if isinstance(other, AmplitudeStatistics):
+        return statistics.merge(other)
+    statistics.add_trace(*other)
+    return statistics
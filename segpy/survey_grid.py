@@ -0,0 +1,290 @@
+"""The affine relationship between line numbers and world coordinates.
+
+For a regular 3D survey the cdp coordinates of each trace are an affine
+function of its inline and crossline numbers. A SurveyGrid is fitted to
+the trace headers by least squares, after which conversions between line
+numbers and world coordinates take constant time.
+
+The fit is computed with NumPy if it is available.
+"""
+
+from math import atan2, degrees, hypot, sqrt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Set to True to fit survey grids in pure Python even when NumPy is available.
+force_python_survey_grid = False
+
+
+class SurveyGrid:
+    """An immutable affine mapping between (inline, crossline) numbers and (x, y) world coordinates.
+
+        x = x_origin + (inline - inline_origin) * dx_dinline + (xline - xline_origin) * dx_dxline
+        y = y_origin + (inline - inline_origin) * dy_dinline + (xline - xline_origin) * dy_dxline
+    """
+
+    def __init__(self, inline_origin, xline_origin, x_origin, y_origin,
+                 dx_dinline, dy_dinline, dx_dxline, dy_dxline,
+                 num_points=0, rms_residual=0.0, max_residual=0.0):
+        """Initialize a SurveyGrid.
+
+        Note:
+            Usually a SurveyGrid is most easily constructed using fit_survey_grid().
+
+        Args:
+            inline_origin: The inline number of the origin.
+            xline_origin: The crossline number of the origin.
+            x_origin: The x coordinate of the origin.
+            y_origin: The y coordinate of the origin.
+            dx_dinline: The change in x for an increase of one in inline number.
+            dy_dinline: The change in y for an increase of one in inline number.
+            dx_dxline: The change in x for an increase of one in crossline number.
+            dy_dxline: The change in y for an increase of one in crossline number.
+            num_points: The number of points to which the grid was fitted.
+            rms_residual: The root-mean-square distance between the fitted and actual points.
+            max_residual: The maximum distance between the fitted and actual points.
+
+        Raises:
+            ValueError: If the inline and crossline directions are parallel, so
+                that the mapping cannot be inverted.
+        """
+        self._inline_origin = inline_origin
+        self._xline_origin = xline_origin
+        self._x_origin = x_origin
+        self._y_origin = y_origin
+        self._dx_dinline = dx_dinline
+        self._dy_dinline = dy_dinline
+        self._dx_dxline = dx_dxline
+        self._dy_dxline = dy_dxline
+        self._num_points = num_points
+        self._rms_residual = rms_residual
+        self._max_residual = max_residual
+
+        self._determinant = dx_dinline * dy_dxline - dx_dxline * dy_dinline
+        if self._determinant == 0:
+            raise ValueError("{} inline and crossline directions are parallel".format(self.__class__.__name__))
+
+    @property
+    def origin(self):
+        """A 4-tuple (inline_number, xline_number, x, y) for the origin of the grid."""
+        return self._inline_origin, self._xline_origin, self._x_origin, self._y_origin
+
+    @property
+    def inline_bin_size(self):
+        """The distance between adjacent inlines."""
+        return hypot(self._dx_dinline, self._dy_dinline)
+
+    @property
+    def xline_bin_size(self):
+        """The distance between adjacent crosslines."""
+        return hypot(self._dx_dxline, self._dy_dxline)
+
+    @property
+    def azimuth(self):
+        """The direction along an inline, in which crossline numbers increase.
+
+        Measured in degrees clockwise from the positive y axis (grid north),
+        in the range 0 <= azimuth < 360.
+        """
+        return degrees(atan2(self._dx_dxline, self._dy_dxline)) % 360.0
+
+    @property
+    def xline_azimuth(self):
+        """The direction along a crossline, in which inline numbers increase.
+
+        Measured in degrees clockwise from the positive y axis (grid north),
+        in the range 0 <= azimuth < 360.
+        """
+        return degrees(atan2(self._dx_dinline, self._dy_dinline)) % 360.0
+
+    @property
+    def num_points(self):
+        """The number of points to which the grid was fitted."""
+        return self._num_points
+
+    @property
+    def rms_residual(self):
+        """The root-mean-square distance between the fitted and actual trace positions."""
+        return self._rms_residual
+
+    @property
+    def max_residual(self):
+        """The maximum distance between the fitted and actual trace positions."""
+        return self._max_residual
+
+    def line_to_world(self, inline_number, xline_number):
+        """Convert line numbers to world coordinates.
+
+        Args:
+            inline_number: An inline number, which need not be integral.
+            xline_number: A crossline number, which need not be integral.
+
+        Returns:
+            An (x, y) 2-tuple.
+        """
+        di = inline_number - self._inline_origin
+        dj = xline_number - self._xline_origin
+        return (self._x_origin + di * self._dx_dinline + dj * self._dx_dxline,
+                self._y_origin + di * self._dy_dinline + dj * self._dy_dxline)
+
+    def world_to_line(self, x, y):
+        """Convert world coordinates to line numbers.
+
+        The returned line numbers are not rounded, so a trace position maps
+        to integral values only to within the residual of the fit. Use
+        round() to obtain the line numbers of the nearest grid position.
+
+        Args:
+            x: An x coordinate.
+            y: A y coordinate.
+
+        Returns:
+            An (inline_number, xline_number) 2-tuple of floats.
+        """
+        dx = x - self._x_origin
+        dy = y - self._y_origin
+        return (self._inline_origin + (dx * self._dy_dxline - dy * self._dx_dxline) / self._determinant,
+                self._xline_origin + (dy * self._dx_dinline - dx * self._dy_dinline) / self._determinant)
+
+    def __repr__(self):
+        return ('{}(inline_origin={!r}, xline_origin={!r}, x_origin={!r}, y_origin={!r}, '
+                'dx_dinline={!r}, dy_dinline={!r}, dx_dxline={!r}, dy_dxline={!r}, '
+                'num_points={!r}, rms_residual={!r}, max_residual={!r})').format(
+            self.__class__.__name__,
+            self._inline_origin, self._xline_origin, self._x_origin, self._y_origin,
+            self._dx_dinline, self._dy_dinline, self._dx_dxline, self._dy_dxline,
+            self._num_points, self._rms_residual, self._max_residual)
+
+
+def fit_survey_grid(inline_numbers, xline_numbers, xs, ys):
+    """Fit a SurveyGrid to trace positions by least squares.
+
+    Args:
+        inline_numbers: A sequence of inline numbers, one per trace.
+        xline_numbers: A sequence of crossline numbers, one per trace.
+        xs: A sequence of x coordinates, one per trace.
+        ys: A sequence of y coordinates, one per trace.
+
+    Returns:
+        A SurveyGrid with its origin at the minimum inline and crossline
+        numbers, together with the residuals of the fit.
+
+    Raises:
+        ValueError: If the sequences are of different lengths, or if the
+            line numbers do not span a two-dimensional grid.
+    """
+    n = len(inline_numbers)
+    if not (len(xline_numbers) == len(xs) == len(ys) == n):
+        raise ValueError("Cannot fit survey grid to sequences of different lengths {}, {}, {} and {}"
+                         .format(n, len(xline_numbers), len(xs), len(ys)))
+    if n == 0:
+        raise ValueError("Cannot fit survey grid to no points")
+
+    if numpy is not None and not force_python_survey_grid:
+        columns = [numpy.asarray(column, dtype=numpy.float64)
+                   for column in (inline_numbers, xline_numbers, xs, ys)]
+        centred_moments, residuals = _centred_moments_numpy, _residuals_numpy
+    else:
+        columns = (inline_numbers, xline_numbers, xs, ys)
+        centred_moments, residuals = _centred_moments_python, _residuals_python
+
+    # Work relative to the means to keep the normal equations well conditioned
+    means, (s_ii, s_ij, s_jj, s_ix, s_jx, s_iy, s_jy) = centred_moments(*columns)
+    mean_i, mean_j, mean_x, mean_y = means
+
+    determinant = s_ii * s_jj - s_ij * s_ij
+    if determinant <= 1e-12 * s_ii * s_jj:
+        raise ValueError("Cannot fit survey grid because the inline and crossline numbers "
+                         "do not span a two-dimensional grid")
+
+    dx_dinline = (s_jj * s_ix - s_ij * s_jx) / determinant
+    dx_dxline = (s_ii * s_jx - s_ij * s_ix) / determinant
+    dy_dinline = (s_jj * s_iy - s_ij * s_jy) / determinant
+    dy_dxline = (s_ii * s_jy - s_ij * s_iy) / determinant
+
+    sum_squared_residuals, max_squared_residual = residuals(
+        means, (dx_dinline, dx_dxline, dy_dinline, dy_dxline), *columns)
+
+    inline_origin = min(inline_numbers)
+    xline_origin = min(xline_numbers)
+    di = inline_origin - mean_i
+    dj = xline_origin - mean_j
+    return SurveyGrid(inline_origin=inline_origin,
+                      xline_origin=xline_origin,
+                      x_origin=mean_x + di * dx_dinline + dj * dx_dxline,
+                      y_origin=mean_y + di * dy_dinline + dj * dy_dxline,
+                      dx_dinline=dx_dinline,
+                      dy_dinline=dy_dinline,
+                      dx_dxline=dx_dxline,
+                      dy_dxline=dy_dxline,
+                      num_points=n,
+                      rms_residual=sqrt(sum_squared_residuals / n),
+                      max_residual=sqrt(max_squared_residual))
+
+
+def _centred_moments_python(inline_numbers, xline_numbers, xs, ys):
+    """The means of the columns, and the sums of products of their deviations from the means.
+
+    Returns:
+        A 2-tuple of (mean_i, mean_j, mean_x, mean_y) and (s_ii, s_ij, s_jj, s_ix, s_jx, s_iy, s_jy).
+    """
+    n = len(inline_numbers)
+    mean_i = sum(inline_numbers) / n
+    mean_j = sum(xline_numbers) / n
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+
+    s_ii = s_ij = s_jj = s_ix = s_jx = s_iy = s_jy = 0.0
+    for i, j, x, y in zip(inline_numbers, xline_numbers, xs, ys):
+        di = i - mean_i
+        dj = j - mean_j
+        dx = x - mean_x
+        dy = y - mean_y
+        s_ii += di * di
+        s_ij += di * dj
+        s_jj += dj * dj
+        s_ix += di * dx
+        s_jx += dj * dx
+        s_iy += di * dy
+        s_jy += dj * dy
+    return (mean_i, mean_j, mean_x, mean_y), (s_ii, s_ij, s_jj, s_ix, s_jx, s_iy, s_jy)
+
+
+def _centred_moments_numpy(inline_numbers, xline_numbers, xs, ys):
+    """As _centred_moments_python(), for float64 arrays."""
+    means = tuple(float(column.mean()) for column in (inline_numbers, xline_numbers, xs, ys))
+    di, dj, dx, dy = (column - mean for column, mean in zip((inline_numbers, xline_numbers, xs, ys), means))
+    return means, tuple(float(numpy.dot(a, b)) for a, b in ((di, di), (di, dj), (dj, dj),
+                                                            (di, dx), (dj, dx), (di, dy), (dj, dy)))
+
+
+def _residuals_python(means, coefficients, inline_numbers, xline_numbers, xs, ys):
+    """The sum and maximum of the squared distances between the fitted and actual points."""
+    mean_i, mean_j, mean_x, mean_y = means
+    dx_dinline, dx_dxline, dy_dinline, dy_dxline = coefficients
+    sum_squared_residuals = 0.0
+    max_squared_residual = 0.0
+    for i, j, x, y in zip(inline_numbers, xline_numbers, xs, ys):
+        di = i - mean_i
+        dj = j - mean_j
+        rx = (x - mean_x) - (di * dx_dinline + dj * dx_dxline)
+        ry = (y - mean_y) - (di * dy_dinline + dj * dy_dxline)
+        squared_residual = rx * rx + ry * ry
+        sum_squared_residuals += squared_residual
+        max_squared_residual = max(max_squared_residual, squared_residual)
+    return sum_squared_residuals, max_squared_residual
+
+
+def _residuals_numpy(means, coefficients, inline_numbers, xline_numbers, xs, ys):
+    """As _residuals_python(), for float64 arrays."""
+    mean_i, mean_j, mean_x, mean_y = means
+    dx_dinline, dx_dxline, dy_dinline, dy_dxline = coefficients
+    di = inline_numbers - mean_i
+    dj = xline_numbers - mean_j
+    rx = (xs - mean_x) - (di * dx_dinline + dj * dx_dxline)
+    ry = (ys - mean_y) - (di * dy_dinline + dj * dy_dxline)
+    squared_residuals = rx * rx + ry * ry
+    return float(squared_residuals.sum()), float(squared_residuals.max())
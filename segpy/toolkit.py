@@ -11,7 +11,7 @@ import logging
 
 from segpy import textual_reel_header
 from segpy.binary_reel_header import BinaryReelHeader
-from segpy.catalog import CatalogBuilder
+from segpy.catalog import CatalogBuilder, MultiValuedCatalog
 from segpy.datatypes import SEG_Y_TYPE_TO_CTYPE, size_in_bytes, DATA_SAMPLE_FORMAT_TO_SEG_Y_TYPE, CTYPE_TO_SIZE, ENDIAN
 from segpy.encoding import guess_encoding, is_supported_encoding, UnsupportedEncodingError
 from segpy.header import SubFormatMeta
@@ -355,14 +355,15 @@ _READ_PROPORTION = 0.75  # The proportion of time spent in catalog_traces
                          # reading the file. Determined empirically.
 
 
-def catalog_traces(fh, bps, trace_header_format=TraceHeaderRev1, endian='>', progress=None):
+def catalog_traces(fh, bps, trace_header_format=TraceHeaderRev1, endian='>', progress=None, key_fields=None):
     """Build catalogs to facilitate random access to trace_samples data.
 
     Note:
         This function can take significant time to run, proportional
         to the number of traces in the SEG Y file.
 
-    Four catalogs will be build:
+    Four catalogs will be build, together with any additional key catalogs
+    requested through key_fields:
 
      1. A catalog mapping trace_samples index (0-based) to the position of that
         trace_samples header in the file.
@@ -375,6 +376,9 @@ def catalog_traces(fh, bps, trace_header_format=TraceHeaderRev1, endian='>', pro
      4. A catalog mapping an (inline, crossline) number 2-tuple to
         trace_samples index.
 
+     5. For each named key in key_fields, a catalog mapping the values
+        of the specified trace header fields to trace_samples index.
+
     Args:
         fh: A file-like-object open in binary mode, positioned at the
             start of the first trace_samples header.
@@ -393,31 +397,54 @@ def catalog_traces(fh, bps, trace_header_format=TraceHeaderRev1, endian='>', pro
             provided, this callback will be invoked at least once with
             an argument equal to 1
 
+        key_fields: An optional mapping from key names to sequences of
+            trace header field names. A catalog will be built for each
+            named key, mapping the values of those fields to trace_samples
+            index. Keys specified by a single field are scalars; keys
+            specified by several fields are tuples of field values in the
+            order given.
+
     Returns:
-        A 4-tuple of the form::
+        A 5-tuple of the form::
 
             (trace_samples-offset-catalog,
              trace_samples-length-catalog,
              cdp-catalog,
-             line-catalog)
+             line-catalog,
+             key-catalogs)
 
         where each catalog is an instance of ``collections.Mapping`` or None
-        if no catalog could be built.
+        if no catalog could be built, and key-catalogs is an OrderedDict
+        mapping each key name in key_fields to such a catalog. Where CDP
+        numbers or inline and crossline numbers are shared by several traces,
+        as in prestack data, the cdp-catalog or line-catalog is a
+        MultiValuedCatalog mapping each to all of its trace indexes, provided
+        there is more than one distinct CDP or line location.
+
+    Raises:
+        ValueError: If key_fields refers to fields not present in
+            trace_header_format.
     """
     progress_callback = progress if progress is not None else lambda p: None
 
     if not callable(progress_callback):
         raise TypeError("catalog_traces(): progress callback must be callable")
 
+    key_fields = normalize_key_fields(key_fields, trace_header_format)
+
+    catalog_field_names = [
+        'file_sequence_num',
+        'ensemble_num',
+        'num_samples',
+        'inline_number',
+        'crossline_number',
+    ]
+    for field_names in key_fields.values():
+        catalog_field_names.extend(name for name in field_names if name not in catalog_field_names)
+
     class CatalogSubFormat(metaclass=SubFormatMeta,
                            parent_format=trace_header_format,
-                           parent_field_names=(
-                               'file_sequence_num',
-                               'ensemble_num',
-                               'num_samples',
-                               'inline_number',
-                               'crossline_number',
-                           )):
+                           parent_field_names=catalog_field_names):
         pass
 
     trace_header_packer = make_header_packer(CatalogSubFormat, endian)
@@ -431,6 +458,7 @@ def catalog_traces(fh, bps, trace_header_format=TraceHeaderRev1, endian='>', pro
     line_catalog_builder = CatalogBuilder()
     alt_line_catalog_builder = CatalogBuilder()
     cdp_catalog_builder = CatalogBuilder()
+    key_catalog_builders = OrderedDict((key_name, CatalogBuilder()) for key_name in key_fields)
 
     for trace_number in count():
         progress_callback(_READ_PROPORTION * pos_begin / length)
@@ -452,6 +480,8 @@ def catalog_traces(fh, bps, trace_header_format=TraceHeaderRev1, endian='>', pro
                                      trace_header.ensemble_num),
                                      trace_number)
         cdp_catalog_builder.add(trace_header.ensemble_num, trace_number)
+        for key_name, field_names in key_fields.items():
+            key_catalog_builders[key_name].add(_key_from_header(trace_header, field_names), trace_number)
         pos_end = pos_begin + TRACE_HEADER_NUM_BYTES + samples_bytes
         pos_begin = pos_end
 
@@ -463,21 +493,80 @@ def catalog_traces(fh, bps, trace_header_format=TraceHeaderRev1, endian='>', pro
     trace_length_catalog = trace_length_catalog_builder.create()
     progress_callback(_READ_PROPORTION + (_READ_PROPORTION / 2))
 
-    cdp_catalog = cdp_catalog_builder.create()
+    cdp_catalog = _discard_degenerate(cdp_catalog_builder.create(allow_duplicates=True))
     progress_callback(_READ_PROPORTION + (_READ_PROPORTION * 3 / 4))
 
-    line_catalog = line_catalog_builder.create()
+    line_catalog = line_catalog_builder.create(allow_duplicates=True)
 
-    if line_catalog is None:
+    if line_catalog is None or isinstance(line_catalog, MultiValuedCatalog):
         # Some 3D files put Inline and Crossline numbers in (TraceSequenceFile, cdp) pair
-        line_catalog = alt_line_catalog_builder.create()
+        alt_line_catalog = alt_line_catalog_builder.create()
+        if alt_line_catalog is not None:
+            line_catalog = alt_line_catalog
+        else:
+            line_catalog = _discard_degenerate(line_catalog)
+
+    key_catalogs = OrderedDict((key_name, builder.create())
+                               for key_name, builder in key_catalog_builders.items())
 
     progress_callback(1)
 
     return (trace_offset_catalog,
             trace_length_catalog,
             cdp_catalog,
-            line_catalog)
+            line_catalog,
+            key_catalogs)
+
+
+def _discard_degenerate(catalog):
+    """Discard a multi-valued catalog in which all traces share a single key, as it is no index at all."""
+    if isinstance(catalog, MultiValuedCatalog) and len(catalog) < 2:
+        return None
+    return catalog
+
+
+def normalize_key_fields(key_fields, trace_header_format=TraceHeaderRev1):
+    """Validate and normalize a specification of named trace header keys.
+
+    Args:
+        key_fields: A mapping from key names to sequences of trace header
+            field names, or None. A single field name string is accepted
+            in place of a one-item sequence.
+
+        trace_header_format: The class defining the trace header format.
+            Defaults to TraceHeaderRev1.
+
+    Returns:
+        An OrderedDict, sorted by key name, mapping each key name to a tuple
+        of field names.
+
+    Raises:
+        ValueError: If any key has no fields, or if any field is not
+            present in trace_header_format.
+    """
+    normalized = OrderedDict()
+    if key_fields is None:
+        return normalized
+
+    for key_name in sorted(key_fields):
+        field_names = key_fields[key_name]
+        if isinstance(field_names, str):
+            field_names = (field_names,)
+        field_names = tuple(field_names)
+        if len(field_names) == 0:
+            raise ValueError("Key {!r} specifies no trace header fields".format(key_name))
+        for field_name in field_names:
+            if field_name not in trace_header_format.ordered_field_names():
+                raise ValueError("Key {!r} field {!r} is not a field of {}"
+                                 .format(key_name, field_name, trace_header_format.__name__))
+        normalized[key_name] = field_names
+    return normalized
+
+
+def _key_from_header(trace_header, field_names):
+    if len(field_names) == 1:
+        return getattr(trace_header, field_names[0])
+    return tuple(getattr(trace_header, field_name) for field_name in field_names)
 
 
 def read_trace_header(fh, trace_header_packer, pos=None):
@@ -206,6 +206,39 @@ def measure_stride(iterable):
     return stride
 
 
+def measure_runs(items):
+    """Divide a sequence of (key, value) items, sorted by key, into regularly spaced runs.
+
+    Runs are formed greedily: each run is extended for as long as the
+    differences between successive keys and between successive values are
+    unchanged.
+
+    Args:
+        items: A sequence of (key, value) pairs of integers sorted by key.
+
+    Returns:
+        A list of (key_start, key_stride, value_start, value_stride, count) tuples.
+    """
+    runs = []
+    num_items = len(items)
+    begin = 0
+    while begin < num_items:
+        key_start, value_start = items[begin]
+        if begin + 1 == num_items:
+            runs.append((key_start, 0, value_start, 0, 1))
+            break
+        key_stride = items[begin + 1][0] - key_start
+        value_stride = items[begin + 1][1] - value_start
+        end = begin + 2
+        while (end < num_items
+               and items[end][0] - items[end - 1][0] == key_stride
+               and items[end][1] - items[end - 1][1] == value_stride):
+            end += 1
+        runs.append((key_start, key_stride, value_start, value_stride, end - begin))
+        begin = end
+    return runs
+
+
 def minmax(iterable):
     """Return the minimum and maximum of an iterable series.
 
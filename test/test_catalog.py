@@ -1,7 +1,16 @@
+import pickle
+from random import Random
+from unittest.mock import patch
+
 from hypothesis import given, assume
-from hypothesis.strategies import (dictionaries, just,
-                                   integers, streaming, tuples)
-from segpy.catalog import CatalogBuilder
+from hypothesis.strategies import (booleans, dictionaries, just,
+                                   integers, lists, permutations, sampled_from, streaming, tuples)
+import pytest
+import segpy.catalog
+from segpy.catalog import (CatalogBuilder, LinearRegularCatalog2D, MaskedRowMajorCatalog2D, MultiValuedCatalog,
+                           MultiValuedCatalog2D, PiecewiseLinearCatalog, RegularCatalog, SortedArrayCatalog,
+                           SortedArrayCatalog2D)
+from test.util import force_python_catalog_builder
 
 
 class TestCatalogBuilder:
@@ -90,3 +99,386 @@ class TestCatalogBuilder:
         catalog = builder.create()
         shared_items = set(mapping.items()) & set(catalog.items())
         assert len(shared_items) == len(mapping)
+
+    @given(i_start=integers(-10, 10),
+           i_num=integers(1, 8),
+           i_step=integers(1, 5),
+           j_start=integers(-10, 10),
+           j_num=integers(1, 8),
+           j_step=integers(1, 5),
+           column_major=booleans(),
+           i_descending=booleans(),
+           j_descending=booleans(),
+           c=integers(-100, 100))
+    def test_any_grid_ordering_2d(self, i_start, i_num, i_step, j_start, j_num, j_step,
+                                  column_major, i_descending, j_descending, c):
+        i_values = range(i_start, i_start + i_num * i_step, i_step)
+        j_values = range(j_start, j_start + j_num * j_step, j_step)
+        i_order = list(reversed(i_values)) if i_descending else list(i_values)
+        j_order = list(reversed(j_values)) if j_descending else list(j_values)
+        keys = ([(i, j) for j in j_order for i in i_order] if column_major
+                else [(i, j) for i in i_order for j in j_order])
+        mapping = {key: c + position for position, key in enumerate(keys)}
+
+        catalog = CatalogBuilder(mapping).create()
+        assert dict(catalog.items()) == mapping
+        assert (i_start - 1, j_start) not in catalog
+
+    def test_column_major_descending_grid_is_linear_regular(self):
+        keys = [(i, j) for j in range(100, 120, 2) for i in range(50, 40, -1)]
+        mapping = {key: 1 + position for position, key in enumerate(keys)}
+        catalog = CatalogBuilder(mapping).create()
+        assert isinstance(catalog, LinearRegularCatalog2D)
+        assert (catalog.i_coefficient, catalog.j_coefficient) == (-1, 10)
+        assert dict(catalog.items()) == mapping
+        assert (45, 101) not in catalog
+
+    def test_row_major_mapping_with_missing_key_2d(self):
+        mapping = {(1, 1): 0, (1, 2): 1, (2, 1): 2}
+        builder = CatalogBuilder(mapping)
+        catalog = builder.create()
+        assert dict(catalog.items()) == mapping
+        assert (2, 2) not in catalog
+
+    def test_irregular_mapping_is_sorted_array(self):
+        mapping = {1: 7, 4: 2, 5: 30, 11: -6}
+        catalog = CatalogBuilder(mapping).create()
+        assert isinstance(catalog, SortedArrayCatalog)
+        assert dict(catalog.items()) == mapping
+        assert 3 not in catalog
+        assert (1, 2) not in catalog
+
+    def test_irregular_mapping_2d_is_sorted_array(self):
+        mapping = {(1, 1): 5, (1, 3): 2, (2, 2): 9, (4, 1): 0, (7, 2): 3}
+        catalog = CatalogBuilder(mapping).create()
+        assert isinstance(catalog, SortedArrayCatalog2D)
+        assert dict(catalog.items()) == mapping
+        assert (1, 2) not in catalog
+        assert (3, 1) not in catalog
+        assert list(catalog.i_range) == [1, 2, 4, 7]
+
+    def test_sorted_array_catalog_pickles(self):
+        catalog = CatalogBuilder({(1, 1): 5, (1, 3): 2, (2, 2): 9}).create()
+        assert dict(pickle.loads(pickle.dumps(catalog)).items()) == dict(catalog.items())
+
+    def test_mostly_linear_mapping_is_piecewise_linear(self):
+        # Trace offsets where the trace length changes part way through
+        mapping = {index: 3600 + index * 240 for index in range(1000)}
+        mapping.update({index: 3600 + 1000 * 240 + (index - 1000) * 480 for index in range(1000, 1500)})
+        catalog = CatalogBuilder(mapping).create()
+        assert isinstance(catalog, PiecewiseLinearCatalog)
+        assert catalog.num_runs == 2
+        assert dict(catalog.items()) == mapping
+        assert len(catalog) == 1500
+        assert 1500 not in catalog
+        assert -1 not in catalog
+
+    def test_mostly_constant_values_with_regular_keys_is_piecewise_linear(self):
+        mapping = {index: 250 for index in range(0, 2000, 2)}
+        mapping[1000] = 125
+        catalog = CatalogBuilder(mapping).create()
+        assert isinstance(catalog, PiecewiseLinearCatalog)
+        assert dict(catalog.items()) == mapping
+        assert 1001 not in catalog
+
+    def test_irregular_runs_are_not_piecewise_linear(self):
+        mapping = {index: index * index for index in range(100)}
+        catalog = CatalogBuilder(mapping).create()
+        assert not isinstance(catalog, PiecewiseLinearCatalog)
+        assert dict(catalog.items()) == mapping
+
+    @given(dictionaries(integers(-1000, 1000), integers(0, 3)))
+    def test_piecewise_candidates_preserve_items(self, mapping):
+        catalog = CatalogBuilder(mapping).create()
+        assert dict(catalog.items()) == mapping
+        assert all(key in catalog for key in mapping)
+
+    def test_regular_grid_with_holes_is_masked(self):
+        keys = [(i, j) for i in range(10, 30, 2) for j in range(100, 200)
+                if not (i > 20 and j > 150) and (i, j) != (12, 107)]
+        mapping = {key: 7 + 3 * rank for rank, key in enumerate(keys)}
+        catalog = CatalogBuilder(mapping).create()
+        assert isinstance(catalog, MaskedRowMajorCatalog2D)
+        assert len(catalog) == len(mapping)
+        assert list(catalog) == keys
+        assert all(catalog[key] == value for key, value in mapping.items())
+        assert (12, 107) not in catalog
+        assert (22, 151) not in catalog
+        assert (11, 100) not in catalog
+        assert (10, 200) not in catalog
+        assert dict(pickle.loads(pickle.dumps(catalog)).items()) == mapping
+
+    def test_sparse_grid_is_not_masked(self):
+        mapping = {(i, i): i for i in range(100)}
+        catalog = CatalogBuilder(mapping).create()
+        assert not isinstance(catalog, MaskedRowMajorCatalog2D)
+        assert dict(catalog.items()) == mapping
+
+
+class TestStreamingCatalogBuilder:
+
+    def test_regular_items_in_descending_order(self):
+        builder = CatalogBuilder()
+        for index in range(100, 0, -3):
+            builder.add(index, 1000 - index * 2)
+        catalog = builder.create()
+        assert dict(catalog.items()) == {index: 1000 - index * 2 for index in range(100, 0, -3)}
+
+    def test_duplicate_after_regular_run(self):
+        builder = CatalogBuilder()
+        for index in range(10):
+            builder.add(index, index * 4)
+        builder.add(5, 99)
+        assert builder.create() is None
+
+    def test_regularity_broken_then_oversized_value(self):
+        mapping = {index: index * 8 for index in range(10)}
+        mapping[10] = 3
+        mapping[11] = 2 ** 70
+        builder = CatalogBuilder()
+        for key, value in mapping.items():
+            builder.add(key, value)
+        assert dict(builder.create().items()) == mapping
+
+    def test_non_integer_value_after_regular_run(self):
+        builder = CatalogBuilder()
+        builder.add(1, 2)
+        builder.add(2, 3)
+        builder.add(4, 4.5)
+        assert dict(builder.create().items()) == {1: 2, 2: 3, 4: 4.5}
+
+    @given(permutations([(i, j) for i in range(1, 5) for j in range(1, 4)]))
+    def test_pairs_in_any_order(self, keys):
+        builder = CatalogBuilder()
+        for key in keys:
+            builder.add(key, key[0] * 10 + key[1])
+        catalog = builder.create()
+        assert dict(catalog.items()) == {key: key[0] * 10 + key[1] for key in keys}
+
+    @given(lists(tuples(integers(-50, 50), integers(-2 ** 70, 2 ** 70)), unique_by=lambda item: item[0]))
+    def test_any_insertion_order(self, items):
+        builder = CatalogBuilder()
+        for key, value in items:
+            builder.add(key, value)
+        catalog = builder.create()
+        assert dict(catalog.items()) == dict(items)
+
+
+def build_with_and_without_numpy(items):
+    with force_python_catalog_builder(True):
+        python_builder = CatalogBuilder()
+        for key, value in items:
+            python_builder.add(key, value)
+        python_catalog = python_builder.create()
+    with force_python_catalog_builder(False):
+        numpy_builder = CatalogBuilder()
+        for key, value in items:
+            numpy_builder.add(key, value)
+        numpy_catalog = numpy_builder.create()
+    return python_catalog, numpy_catalog
+
+
+def assert_identical_catalogs(python_catalog, numpy_catalog):
+    assert type(python_catalog) is type(numpy_catalog)
+    if python_catalog is not None:
+        assert vars(python_catalog) == vars(numpy_catalog)
+        assert all(type(value) is int for value in numpy_catalog.values())
+
+
+class TestVectorizedCatalogBuilder:
+
+    @pytest.fixture(autouse=True)
+    def require_numpy(self):
+        pytest.importorskip('numpy')
+
+    @given(lists(tuples(integers(-1000, 1000), integers(-1000, 1000))))
+    def test_arbitrary_items(self, items):
+        python_catalog, numpy_catalog = build_with_and_without_numpy(items)
+        assert_identical_catalogs(python_catalog, numpy_catalog)
+
+    @given(lists(tuples(integers(-2000, 2000), integers(0, 3)), unique_by=lambda item: item[0]))
+    def test_piecewise_candidates(self, items):
+        python_catalog, numpy_catalog = build_with_and_without_numpy(items)
+        assert_identical_catalogs(python_catalog, numpy_catalog)
+
+    @given(lists(tuples(tuples(integers(-3, 3), integers(-3, 3)), integers(-50, 50))))
+    def test_arbitrary_items_2d(self, items):
+        python_catalog, numpy_catalog = build_with_and_without_numpy(items)
+        assert_identical_catalogs(python_catalog, numpy_catalog)
+
+    @given(i_step=integers(1, 3),
+           j_step=integers(1, 3),
+           value_stride=sampled_from([1, 3, -2]),
+           order=permutations(range(24)),
+           num_missing=integers(0, 12))
+    def test_grids_with_holes(self, i_step, j_step, value_stride, order, num_missing):
+        keys = [(i, j) for i in range(10, 10 + 4 * i_step, i_step) for j in range(5, 5 + 6 * j_step, j_step)]
+        present = sorted(order[num_missing:])
+        items = [(keys[cell], 100 + value_stride * rank) for rank, cell in enumerate(present)]
+        python_catalog, numpy_catalog = build_with_and_without_numpy(items[::-1])
+        assert_identical_catalogs(python_catalog, numpy_catalog)
+
+    def test_large_values(self):
+        items = [(index, index * 2 ** 40) for index in range(0, 100, 3)] + [(200, 7)]
+        python_catalog, numpy_catalog = build_with_and_without_numpy(items)
+        assert_identical_catalogs(python_catalog, numpy_catalog)
+
+    @pytest.mark.parametrize('layout', ['regular', 'irregular', 'grid'])
+    def test_offsets_beyond_four_gibibytes_are_vectorized(self, layout):
+        rng = Random(layout)
+        if layout == 'regular':
+            items = [(index, 2 ** 32 + index * 4240) for index in range(1000)]
+        elif layout == 'irregular':
+            items = [(index, 2 ** 32 + rng.randrange(2 ** 40)) for index in range(1000)]
+        else:
+            items = [((i, j), 2 ** 33 + (i * 30 + j) * 4240) for i in range(20) for j in range(30) if (i + j) % 7]
+        rng.shuffle(items)
+        with patch.object(CatalogBuilder, '_create_vectorized', autospec=True,
+                          side_effect=CatalogBuilder._create_vectorized) as create_vectorized:
+            python_catalog, numpy_catalog = build_with_and_without_numpy(items)
+        assert create_vectorized.call_count == 1
+        assert_identical_catalogs(python_catalog, numpy_catalog)
+        assert dict(numpy_catalog.items()) == dict(items)
+
+    @given(lists(tuples(tuples(integers(0, 3), integers(0, 3)),
+                        sampled_from([-2 ** 63, -2 ** 62, 0, 2 ** 62, 2 ** 63 - 1])),
+                 unique_by=lambda item: item[0]))
+    def test_extreme_values_2d(self, items):
+        python_catalog, numpy_catalog = build_with_and_without_numpy(items)
+        assert_identical_catalogs(python_catalog, numpy_catalog)
+
+
+def assert_bulk_lookups_agree(catalog, mapping, queries):
+    expected_values = [mapping.get(key, -1) for key in queries]
+    expected_presence = [key in mapping for key in queries]
+    assert list(catalog.get_many(queries)) == expected_values
+    assert catalog.contains_many(queries) == expected_presence
+    numpy = pytest.importorskip('numpy')
+    numpy_queries = numpy.array(queries, dtype=numpy.int64).reshape((len(queries),) + numpy.shape(queries)[1:])
+    assert catalog.get_many(numpy_queries).tolist() == expected_values
+    assert catalog.contains_many(numpy_queries).tolist() == expected_presence
+
+
+class TestBulkLookup:
+
+    @given(dictionaries(integers(-200, 200), integers(-1000, 1000)), lists(integers(-250, 250)))
+    def test_arbitrary_mapping(self, mapping, others):
+        catalog = CatalogBuilder(mapping).create()
+        assert_bulk_lookups_agree(catalog, mapping, list(mapping) + others)
+
+    @given(start=integers(-100, 100),
+           num=integers(2, 50),
+           step=integers(-7, 7),
+           value_start=integers(-100, 100),
+           value_step=integers(-3, 3),
+           others=lists(integers(-500, 500)))
+    def test_regular_mapping(self, start, num, step, value_start, value_step, others):
+        assume(step != 0)
+        mapping = {start + n * step: value_start + n * value_step for n in range(num)}
+        catalog = CatalogBuilder(mapping).create()
+        assert_bulk_lookups_agree(catalog, mapping, list(mapping) + others)
+
+    @given(dictionaries(integers(-1000, 1000), integers(0, 3)), lists(integers(-1100, 1100)))
+    def test_piecewise_candidates(self, mapping, others):
+        catalog = CatalogBuilder(mapping).create()
+        assert_bulk_lookups_agree(catalog, mapping, list(mapping) + others)
+
+    @given(i_step=integers(1, 3),
+           j_step=integers(1, 3),
+           column_major=booleans(),
+           order=permutations(range(24)),
+           num_missing=integers(0, 12),
+           others=lists(tuples(integers(0, 25), integers(0, 25))))
+    def test_grids(self, i_step, j_step, column_major, order, num_missing, others):
+        keys = [(i, j) for i in range(10, 10 + 4 * i_step, i_step) for j in range(5, 5 + 6 * j_step, j_step)]
+        present = sorted(order[num_missing:])
+        mapping = {keys[cell]: 100 + (cell if column_major else 2 * rank) for rank, cell in enumerate(present)}
+        catalog = CatalogBuilder(mapping).create()
+        assert_bulk_lookups_agree(catalog, mapping, list(mapping) + others)
+
+    @given(dictionaries(tuples(integers(-5, 5), integers(-5, 5)), integers(-50, 50), min_size=1),
+           lists(tuples(integers(-6, 6), integers(-6, 6))))
+    def test_arbitrary_mapping_2d(self, mapping, others):
+        catalog = CatalogBuilder(mapping).create()
+        assert_bulk_lookups_agree(catalog, mapping, list(mapping) + others)
+
+    def test_missing_value(self):
+        catalog = CatalogBuilder({index: index * 3 for index in range(10)}).create()
+        assert list(catalog.get_many([4, 11], missing=999)) == [12, 999]
+
+    def test_non_integer_values_raise_type_error(self):
+        catalog = CatalogBuilder({1: 0.5, 2: 7.25, 4: 1.0}).create()
+        with pytest.raises(TypeError):
+            catalog.get_many([1, 2])
+
+    @pytest.mark.parametrize('catalog, num_arrays', [(RegularCatalog(1, 9, 2, [5, 3, 8, 1, 2]), 1),
+                                                     (SortedArrayCatalog([1, 3, 5, 7, 9], [5, 3, 8, 1, 2]), 2)])
+    def test_arrays_are_converted_once(self, catalog, num_arrays):
+        numpy = pytest.importorskip('numpy')
+        with patch('segpy.catalog._int64_numpy_array', wraps=segpy.catalog._int64_numpy_array) as convert_int64, \
+                patch('segpy.catalog._numpy_array', wraps=segpy.catalog._numpy_array) as convert:
+            for _ in range(3):
+                assert catalog.get_many(numpy.array([3, 4, 9])).tolist() == [3, -1, 2]
+        assert convert_int64.call_count + convert.call_count == num_arrays
+        restored = pickle.loads(pickle.dumps(catalog))
+        assert '_numpy_arrays' not in vars(restored)
+        assert restored.get_many(numpy.array([7])).tolist() == [1]
+
+
+class TestMultiValuedCatalog:
+
+    @pytest.fixture(params=[True, False])
+    def force_python(self, request):
+        with force_python_catalog_builder(request.param) as force:
+            yield force
+
+    def test_duplicates_are_rejected_by_default(self, force_python):
+        builder = CatalogBuilder()
+        for trace_index, cdp_number in enumerate([5, 3, 5]):
+            builder.add(cdp_number, trace_index)
+        assert builder.create() is None
+
+    def test_scalar_keys(self, force_python):
+        builder = CatalogBuilder()
+        for trace_index, cdp_number in enumerate([5, 3, 5, 7, 3, 5]):
+            builder.add(cdp_number, trace_index)
+        catalog = builder.create(allow_duplicates=True)
+        assert isinstance(catalog, MultiValuedCatalog)
+        assert list(catalog) == [3, 5, 7]
+        assert catalog.num_values == 6
+        assert list(catalog.values_at(5)) == [0, 2, 5]
+        assert catalog[3] == 1
+        assert 4 not in catalog
+        with pytest.raises(KeyError):
+            catalog.values_at(4)
+        assert list(catalog.get_many([3, 4, 7])) == [1, -1, 3]
+        assert list(pickle.loads(pickle.dumps(catalog)).values_at(3)) == [1, 4]
+
+    def test_pair_keys(self, force_python):
+        keys = [(i, j) for i in range(1, 4) for j in (2, 4) for _ in range(3)]
+        builder = CatalogBuilder()
+        for trace_index, key in enumerate(keys):
+            builder.add(key, trace_index)
+        catalog = builder.create(allow_duplicates=True)
+        assert isinstance(catalog, MultiValuedCatalog2D)
+        assert list(catalog.i_range) == [1, 2, 3]
+        assert list(catalog.j_range) == [2, 4]
+        assert list(catalog.values_at((2, 4))) == [9, 10, 11]
+        assert (2, 3) not in catalog
+        assert len(catalog) == 6
+
+    def test_unique_keys_give_ordinary_catalog(self):
+        catalog = CatalogBuilder({index: index * 2 for index in range(10)}).create(allow_duplicates=True)
+        assert not isinstance(catalog, MultiValuedCatalog)
+        assert catalog.values_at(4) == (8,)
+
+    @given(lists(tuples(integers(-20, 20), integers(-1000, 1000)), min_size=2))
+    def test_any_items(self, items):
+        builder = CatalogBuilder()
+        for key, value in items:
+            builder.add(key, value)
+        catalog = builder.create(allow_duplicates=True)
+        expected = {}
+        for key, value in items:
+            expected.setdefault(key, []).append(value)
+        assert {key: list(catalog.values_at(key)) for key in catalog} == expected
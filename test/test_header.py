@@ -0,0 +1,162 @@
+import copy
+import pickle
+
+import pytest
+
+from segpy.header import are_equal, field, FormatMeta, SubFormatMeta, LazyHeader
+from segpy.field_types import Int16, Int32
+from segpy.packer import make_header_packer, make_lazy_header_packer
+from segpy.trace_header import TraceHeaderRev1
+from test.util import SyntheticDataset, grid_header_fields, make_reader
+
+
+class ShuffledHeader(metaclass=FormatMeta):
+
+    START_OFFSET_IN_BYTES = 1
+    LENGTH_IN_BYTES = 8
+
+    second = field(Int16, offset=5, default=2, documentation="The second field.")
+    first = field(Int32, offset=1, default=1, documentation="The first field.")
+    alias = field(Int16, offset=5, default=2, documentation="Coincides with the second field.")
+
+
+class TestHeader:
+
+    def test_instances_have_no_dictionary(self):
+        header = TraceHeaderRev1()
+        assert not hasattr(header, '__dict__')
+        with pytest.raises(AttributeError):
+            header.not_a_field = 42
+
+    def test_fields_have_defaults(self):
+        header = ShuffledHeader()
+        assert (header.second, header.first, header.alias) == (2, 1, 2)
+
+    def test_instances_are_independent(self):
+        a = TraceHeaderRev1(inline_number=1)
+        b = TraceHeaderRev1(inline_number=2)
+        assert (a.inline_number, b.inline_number) == (1, 2)
+
+    def test_assigned_values_are_range_checked(self):
+        header = ShuffledHeader()
+        with pytest.raises(ValueError):
+            header.second = 40000
+        assert header.second == 2
+
+    def test_unrecognised_keyword_raises_type_error(self):
+        with pytest.raises(TypeError):
+            ShuffledHeader(third=3)
+
+    def test_class_attributes_describe_fields(self):
+        assert TraceHeaderRev1.inline_number.offset == 189
+        assert TraceHeaderRev1.line_sequence_num.default == 0
+
+    def test_copy_with_updates(self):
+        header = TraceHeaderRev1(line_sequence_num=7, inline_number=3)
+        copy = header.copy(inline_number=4)
+        assert copy.line_sequence_num == 7
+        assert copy.inline_number == 4
+        assert header.inline_number == 3
+
+    def test_copy_with_unrecognised_field_raises_type_error(self):
+        with pytest.raises(TypeError):
+            ShuffledHeader().copy(third=3)
+
+    def test_pickle_preserves_inherited_fields(self):
+        header = TraceHeaderRev1(line_sequence_num=7, inline_number=3)
+        assert are_equal(pickle.loads(pickle.dumps(header)), header)
+
+    def test_sub_format_has_only_selected_fields(self):
+        class SubFormat(metaclass=SubFormatMeta,
+                        parent_format=TraceHeaderRev1,
+                        parent_field_names=['inline_number', 'crossline_number']):
+            pass
+
+        header = SubFormat(inline_number=5)
+        assert SubFormat.ordered_field_names() == ('inline_number', 'crossline_number')
+        assert (header.inline_number, header.crossline_number) == (5, 0)
+
+
+class TestHeaderPacking:
+
+    def test_bijective_round_trip(self):
+        packer = make_header_packer(TraceHeaderRev1)
+        header = TraceHeaderRev1(line_sequence_num=7, inline_number=3, cdp_x=-12)
+        assert are_equal(packer.unpack(packer.pack(header)), header)
+
+    def test_surjective_round_trip(self):
+        packer = make_header_packer(ShuffledHeader)
+        header = packer.unpack(packer.pack(ShuffledHeader(first=-5, second=9, alias=9)))
+        assert (header.first, header.second, header.alias) == (-5, 9, 9)
+
+    def test_surjective_packer_pickles(self):
+        packer = pickle.loads(pickle.dumps(make_header_packer(ShuffledHeader)))
+        header = packer.unpack(packer.pack(ShuffledHeader(first=3)))
+        assert (header.first, header.second, header.alias) == (3, 2, 2)
+
+
+class TestLazyHeader:
+
+    def lazy_header(self, header, endian='>'):
+        buffer = make_header_packer(type(header), endian).pack(header)
+        return make_lazy_header_packer(type(header), endian).unpack(memoryview(buffer))
+
+    @pytest.mark.parametrize('endian', ['>', '<'])
+    def test_fields_are_decoded_on_access(self, endian):
+        lazy = self.lazy_header(TraceHeaderRev1(inline_number=-3, cdp_x=123456), endian)
+        assert vars(lazy) == {}
+        assert lazy.cdp_x == 123456
+        assert vars(lazy) == {'cdp_x': 123456}
+        assert (lazy.inline_number, lazy.line_sequence_num) == (-3, 0)
+
+    def test_coincident_fields(self):
+        lazy = self.lazy_header(ShuffledHeader(first=-1, second=5, alias=5))
+        assert (lazy.first, lazy.second, lazy.alias) == (-1, 5, 5)
+
+    def test_to_header_includes_assigned_values(self):
+        header = TraceHeaderRev1(inline_number=4, crossline_number=6)
+        lazy = self.lazy_header(header)
+        lazy.crossline_number = 7
+        full = lazy.to_header()
+        assert type(full) is TraceHeaderRev1
+        assert are_equal(full, header.copy(crossline_number=7))
+        assert are_equal(lazy, full)
+
+    def test_assigned_values_are_range_checked(self):
+        lazy = self.lazy_header(ShuffledHeader())
+        with pytest.raises(ValueError):
+            lazy.second = 40000
+        assert lazy.second == 2
+
+    def test_unknown_attributes_raise_attribute_error(self):
+        lazy = self.lazy_header(ShuffledHeader())
+        with pytest.raises(AttributeError):
+            lazy.third
+        with pytest.raises(AttributeError):
+            lazy.third = 3
+
+    def test_copy_is_a_full_header(self):
+        lazy = self.lazy_header(TraceHeaderRev1(inline_number=4))
+        assert type(copy.copy(lazy)) is TraceHeaderRev1
+        assert lazy.copy(inline_number=5).inline_number == 5
+
+    def test_pickle(self):
+        lazy = self.lazy_header(TraceHeaderRev1(inline_number=4))
+        lazy.cdp_y = 8
+        unpickled = pickle.loads(pickle.dumps(lazy))
+        assert type(unpickled) is LazyHeader
+        assert (unpickled.inline_number, unpickled.cdp_y) == (4, 8)
+
+    def test_lazy_packer_packs_lazy_headers(self):
+        header = TraceHeaderRev1(inline_number=4, cdp_x=-2)
+        packer = make_lazy_header_packer(TraceHeaderRev1)
+        buffer = packer.pack(header)
+        assert packer.pack(packer.unpack(buffer)) == buffer
+
+    def test_reader_header_packer_override(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields([1, 2], [5, 6, 7]), num_samples=4))
+        packer = make_lazy_header_packer(reader.trace_header_format_class, reader.endian)
+        lazy = reader.trace_header(4, header_packer_override=packer)
+        assert isinstance(lazy, LazyHeader)
+        assert (lazy.inline_number, lazy.crossline_number) == (2, 6)
+        assert are_equal(lazy.to_header(), reader.trace_header(4))
@@ -0,0 +1,143 @@
+import operator
+
+import pytest
+
+import segpy.parallel
+import segpy.reader
+from segpy.parallel import map_traces, _partition, _TraceChunkProcessor
+from segpy.reader import create_reader
+from segpy.writer import write_segy
+from test.util import SyntheticDataset, grid_header_fields, make_reader
+
+
+def first_sample(trace_index, trace_header, samples):
+    return samples[0]
+
+
+def sample_sum(trace_index, trace_header, samples):
+    return sum(samples)
+
+
+def append_or_extend(accumulated, result):
+    if isinstance(result, list):
+        accumulated.extend(result)
+    else:
+        accumulated.append(result)
+    return accumulated
+
+
+def inline_and_num_samples(trace_index, trace_header, samples):
+    return trace_header.inline_number, len(samples)
+
+
+@pytest.fixture
+def dataset():
+    return SyntheticDataset(grid_header_fields(range(1, 5), range(1, 6)), 7)
+
+
+@pytest.fixture
+def segy_path(tmpdir, dataset):
+    path = str(tmpdir / 'synthetic.segy')
+    with open(path, 'wb') as fh:
+        write_segy(fh, dataset)
+    return path
+
+
+class TestMapTraces:
+
+    @pytest.mark.parametrize("workers", [0, 2])
+    def test_results_in_file_order(self, segy_path, workers):
+        with open(segy_path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None)
+            results = list(map_traces(reader, first_sample, workers=workers, chunk=3))
+        assert results == [(trace_index, trace_index * 1000) for trace_index in range(20)]
+
+    @pytest.mark.parametrize("workers", [0, 3])
+    def test_reduce(self, segy_path, dataset, workers):
+        with open(segy_path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None)
+            total = map_traces(reader, sample_sum, reduce=operator.add, workers=workers, chunk=4)
+        assert total == sum(sum(dataset.trace_samples(trace_index)) for trace_index in range(20))
+
+    @pytest.mark.parametrize("workers", [0, 2])
+    def test_initial(self, segy_path, workers):
+        with open(segy_path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None)
+            result = map_traces(reader, first_sample, reduce=append_or_extend, initial=list,
+                                workers=workers, chunk=3)
+        assert result == [trace_index * 1000 for trace_index in range(20)]
+
+    def test_initial_without_reduce_raises_value_error(self, dataset):
+        with pytest.raises(ValueError):
+            map_traces(make_reader(dataset), sample_sum, workers=0, initial=list)
+
+    def test_header_fields_and_trace_indexes(self, dataset):
+        reader = make_reader(dataset)
+        results = dict(map_traces(reader, inline_and_num_samples, workers=0,
+                                  header_fields=['inline_number'], trace_indexes=[12, 3]))
+        assert results == {3: (1, 7), 12: (3, 7)}
+
+    def test_progress(self, dataset):
+        progress = []
+        map_traces(make_reader(dataset), sample_sum, reduce=operator.add, workers=0, chunk=6,
+                   progress=progress.append)
+        assert progress == [6 / 20, 12 / 20, 18 / 20, 1, 1]
+
+    def test_no_traces_reduces_to_none(self, dataset):
+        assert map_traces(make_reader(dataset), sample_sum, reduce=operator.add, workers=0, trace_indexes=[]) is None
+
+    def test_workers_for_unnamed_file_raises_value_error(self, dataset):
+        with pytest.raises(ValueError):
+            map_traces(make_reader(dataset), sample_sum, workers=2)
+
+    def test_unknown_header_field_raises_value_error(self, dataset):
+        with pytest.raises(ValueError):
+            map_traces(make_reader(dataset), sample_sum, workers=0, header_fields=['no_such_field'])
+
+    def test_sparse_chunk_is_not_read_as_one_block(self, segy_path, monkeypatch):
+        opened = []
+
+        def recording_open(*args, **kwargs):
+            opened.append(RecordingFile(open(*args, **kwargs)))
+            return opened[-1]
+
+        monkeypatch.setattr(segpy.parallel, 'open', recording_open, raising=False)
+        monkeypatch.setattr(segpy.reader, 'MAX_COALESCED_GAP_NUM_BYTES', 0)
+
+        with open(segy_path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None)
+            chunk, = _partition(reader, [0, 1, 19], 3)
+            processor = _TraceChunkProcessor(segy_path, reader.endian, reader.data_sample_format,
+                                             reader.trace_header_format_class, (), first_sample, None)
+            results = processor(chunk)
+            trace_num_bytes = reader.trace_offset(1) - reader.trace_offset(0)
+
+        assert results == [(0, 0), (1, 1000), (19, 19000)]
+        assert [f.read_sizes for f in opened] == [[2 * trace_num_bytes, trace_num_bytes]]
+        assert all(f.closed for f in opened)
+
+
+class RecordingFile:
+    """A file wrapper which records the sizes of reads."""
+
+    def __init__(self, fh):
+        self._fh = fh
+        self.read_sizes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._fh.close()
+
+    @property
+    def closed(self):
+        return self._fh.closed
+
+    def seek(self, *args):
+        return self._fh.seek(*args)
+
+    def read(self, size=-1):
+        data = self._fh.read(size)
+        self.read_sizes.append(len(data))
+        return data
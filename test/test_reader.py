@@ -0,0 +1,315 @@
+import sys
+from unittest.mock import patch
+
+import pytest
+
+import segpy.reader
+from segpy.reader import SegYReader3D, SegYReader, coalesce_reads, create_reader
+from segpy.writer import write_segy
+from test.util import SyntheticDataset, grid_header_fields, make_reader
+
+
+class TestKeyCatalogs:
+
+    def test_single_field_key(self):
+        fields = grid_header_fields(range(1, 4), range(1, 5))
+        for n, f in enumerate(fields):
+            f['energy_source_point_num'] = 100 + 3 * n
+        reader = make_reader(SyntheticDataset(fields, 8), key_fields={'shot': 'energy_source_point_num'})
+        assert reader.key_names() == ['shot']
+        assert all(reader.trace_index_by('shot', 100 + 3 * n) == n for n in range(len(fields)))
+
+    def test_composite_key(self):
+        fields = [dict(energy_source_point_num=s, ensemble_trace_num=t) for s in range(5, 8) for t in range(1, 7)]
+        reader = make_reader(SyntheticDataset(fields, 4),
+                             key_fields={'shot_trace': ('energy_source_point_num', 'ensemble_trace_num')})
+        for n, f in enumerate(fields):
+            key = (f['energy_source_point_num'], f['ensemble_trace_num'])
+            assert reader.has_trace_index_by('shot_trace', key)
+            assert reader.trace_index_by('shot_trace', key) == n
+        assert not reader.has_trace_index_by('shot_trace', (4, 1))
+
+    def test_three_field_key(self):
+        fields = [dict(energy_source_point_num=n % 3, ensemble_trace_num=n % 5, source_receiver_offset=n * 10)
+                  for n in range(15)]
+        reader = make_reader(SyntheticDataset(fields, 4),
+                             key_fields={'k': ('energy_source_point_num', 'ensemble_trace_num',
+                                               'source_receiver_offset')})
+        assert reader.trace_index_by('k', (7 % 3, 7 % 5, 70)) == 7
+
+    def test_key_catalogs_do_not_disturb_line_catalog(self):
+        fields = grid_header_fields(range(1, 4), range(1, 5))
+        reader = make_reader(SyntheticDataset(fields, 8), key_fields={'cdp': ('ensemble_num',)})
+        assert isinstance(reader, SegYReader3D)
+        assert reader.trace_index((2, 3)) == reader.trace_index_by('cdp', 6)
+
+    def test_unknown_key_name_raises_value_error(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(2), range(2)), 4))
+        with pytest.raises(ValueError):
+            reader.trace_index_by('missing', 0)
+
+    def test_non_unique_keys_raise_value_error(self):
+        fields = grid_header_fields(range(2), range(2))
+        reader = make_reader(SyntheticDataset(fields, 4), key_fields={'constant': ('trace_identification_code',)})
+        with pytest.raises(ValueError):
+            reader.trace_index_by('constant', 0)
+
+    def test_unknown_field_raises_value_error(self):
+        with pytest.raises(ValueError):
+            make_reader(SyntheticDataset(grid_header_fields(range(2), range(2)), 4),
+                        key_fields={'bad': ('no_such_field',)})
+
+
+class TestFieldIndexes:
+
+    def make_reader(self):
+        fields = grid_header_fields(range(1, 5), range(1, 6))
+        for n, f in enumerate(fields):
+            f['source_x'] = (n * 37) % 11
+            f['trace_identification_code'] = 2 if n % 4 == 0 else 1
+        return fields, make_reader(SyntheticDataset(fields, 4))
+
+    def test_select_range(self):
+        fields, reader = self.make_reader()
+        selected = reader.select('source_x', 3, 6)
+        assert list(selected) == [n for n, f in enumerate(fields) if 3 <= f['source_x'] <= 6]
+
+    def test_select_open_bounds(self):
+        fields, reader = self.make_reader()
+        assert list(reader.select('source_x', maximum=2)) == [n for n, f in enumerate(fields) if f['source_x'] <= 2]
+        assert list(reader.select('source_x', minimum=9)) == [n for n, f in enumerate(fields) if f['source_x'] >= 9]
+
+    def test_select_all(self):
+        fields, reader = self.make_reader()
+        selected = reader.select_all([('trace_identification_code', 1, 1), ('source_x', 0, 5)])
+        assert list(selected) == [n for n, f in enumerate(fields)
+                                  if f['trace_identification_code'] == 1 and f['source_x'] <= 5]
+
+    def test_select_unknown_field_raises_value_error(self):
+        _, reader = self.make_reader()
+        with pytest.raises(ValueError):
+            reader.select('no_such_field', 0, 1)
+
+    def test_field_index_is_cached(self, tmpdir):
+        fields, _ = self.make_reader()
+        segy_path = str(tmpdir.join('survey.sgy'))
+        with open(segy_path, 'wb') as segy_file:
+            write_segy(segy_file, SyntheticDataset(fields, 4))
+
+        with open(segy_path, 'rb') as segy_file:
+            reader = create_reader(segy_file)
+            expected = reader.select('source_x', 3, 6)
+
+        with open(segy_path, 'rb') as segy_file:
+            reader = create_reader(segy_file)
+            with patch.object(SegYReader, '_read_trace_header_fields', side_effect=AssertionError):
+                assert reader.select('source_x', 3, 6) == expected
+
+    def test_cache_of_another_pickle_version_is_discarded(self, tmpdir, monkeypatch):
+        fields, _ = self.make_reader()
+        segy_path = str(tmpdir.join('survey.sgy'))
+        with open(segy_path, 'wb') as segy_file:
+            write_segy(segy_file, SyntheticDataset(fields, 4))
+
+        with open(segy_path, 'rb') as segy_file:
+            reader = create_reader(segy_file)
+            cache_file_path = reader._cache_file_path
+        assert cache_file_path.is_file()
+
+        monkeypatch.setattr(segpy.reader, 'PICKLE_VERSION', segpy.reader.PICKLE_VERSION + 1)
+        assert segpy.reader._load_reader_from_cache(cache_file_path, segy_path) is None
+        assert not cache_file_path.exists()
+
+
+class TestReadSubvolume:
+
+    @pytest.mark.parametrize("data_sample_format", [1, 2, 3, 5])
+    def test_subvolume_matches_trace_samples(self, data_sample_format):
+        fields = grid_header_fields(range(1, 5), range(1, 6))
+        reader = make_reader(SyntheticDataset(fields, 20, data_sample_format))
+        cube = reader.read_subvolume(range(2, 4), range(1, 6, 2), range(3, 15, 4))
+        assert cube.shape == (2, 3, 3)
+        for i, inline in enumerate(range(2, 4)):
+            for j, xline in enumerate(range(1, 6, 2)):
+                expected = reader.trace_samples(reader.trace_index((inline, xline)))[3:15:4]
+                assert cube.tolist()[i][j] == list(map(float, expected))
+
+    def test_missing_traces_are_null(self):
+        fields = [f for f in grid_header_fields(range(1, 3), range(1, 3))
+                  if (f['inline_number'], f['crossline_number']) != (2, 2)]
+        reader = make_reader(SyntheticDataset(fields, 4))
+        cube = reader.read_subvolume(range(1, 4), range(1, 3), null=-1)
+        assert cube.tolist() == [[[0, 1, 2, 3], [1000, 1001, 1002, 1003]],
+                                 [[2000, 2001, 2002, 2003], [-1, -1, -1, -1]],
+                                 [[-1, -1, -1, -1], [-1, -1, -1, -1]]]
+
+    def test_sample_range_beyond_trace_is_null(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 2), range(1, 3)), 4))
+        cube = reader.read_subvolume(range(1, 2), range(1, 3), range(2, 6), null=-1)
+        assert cube.tolist() == [[[2, 3, -1, -1], [1002, 1003, -1, -1]]]
+
+    def test_variable_length_traces(self):
+        fields = grid_header_fields(range(1, 3), range(1, 4))
+        for n, f in enumerate(fields):
+            f['num_samples'] = 8 if n % 2 == 0 else 5
+        reader = make_reader(SyntheticDataset(fields, 8))
+        assert reader.max_num_trace_samples() == 8
+        cube = reader.read_subvolume(range(1, 3), range(1, 4), null=-1)
+        assert cube.shape == (2, 3, 8)
+        rows = cube.tolist()
+        for n in range(len(fields)):
+            expected = [n * 1000 + s for s in range(fields[n]['num_samples'])]
+            assert rows[n // 3][n % 3] == expected + [-1] * (8 - len(expected))
+        strided = reader.read_subvolume(range(1, 3), range(1, 4), range(4, 8, 2), null=-1)
+        assert strided.tolist() == [[[4, 6], [1004, -1], [2004, 2006]],
+                                    [[3004, -1], [4004, 4006], [5004, -1]]]
+
+    def test_negative_sample_range_start_raises_value_error(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 3), range(1, 3)), 4))
+        with pytest.raises(ValueError):
+            reader.read_subvolume(range(1, 3), range(1, 3), range(-1, 2))
+
+    def test_repeated_line_numbers(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 3), range(1, 3)), 2))
+        cube = reader.read_subvolume([1, 1, 2], [2, 1, 2])
+        assert cube.tolist() == [[[1000, 1001], [0, 1], [1000, 1001]],
+                                 [[1000, 1001], [0, 1], [1000, 1001]],
+                                 [[3000, 3001], [2000, 2001], [3000, 3001]]]
+
+    @pytest.mark.parametrize("inline_numbers, xline_numbers, sample_range",
+                             [([], [1], None),
+                              ([1], [], None),
+                              ([1], [1], range(3, 3))])
+    def test_empty_subvolume(self, inline_numbers, xline_numbers, sample_range):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 3), range(1, 3)), 4))
+        cube = reader.read_subvolume(inline_numbers, xline_numbers, sample_range)
+        assert cube.nbytes == 0
+        assert cube.tolist() == []
+
+
+class TestTraceIndexesMany:
+
+    def test_matches_trace_index(self):
+        fields = [f for f in grid_header_fields(range(1, 4), range(1, 4))
+                  if (f['inline_number'], f['crossline_number']) != (2, 2)]
+        reader = make_reader(SyntheticDataset(fields, 4))
+        inline_xlines = [(1, 1), (2, 2), (3, 3), (4, 1)]
+        expected = [reader.trace_index((1, 1)), -1, reader.trace_index((3, 3)), -1]
+        assert list(reader.trace_indexes_many(inline_xlines)) == expected
+        numpy = pytest.importorskip('numpy')
+        assert reader.trace_indexes_many(numpy.array(inline_xlines)).tolist() == expected
+
+
+class TestDuplicateKeys:
+
+    def test_cdp_gathers_give_2d_reader(self):
+        fields = [dict(ensemble_num=cdp_number) for cdp_number in (10, 11, 12) for _ in range(4)]
+        reader = make_reader(SyntheticDataset(fields, 4))
+        assert reader.dimensionality == 2
+        assert reader.num_cdps() == 3
+        assert list(reader.trace_indexes_at(11)) == [4, 5, 6, 7]
+        assert reader.trace_index(12) == 8
+
+    def test_duplicate_traces_give_3d_reader(self):
+        fields = [f for f in grid_header_fields(range(1, 3), range(1, 4)) for _ in range(2)]
+        reader = make_reader(SyntheticDataset(fields, 4))
+        assert reader.dimensionality == 3
+        assert list(reader.inline_numbers()) == [1, 2]
+        assert list(reader.trace_indexes_at((2, 1))) == [6, 7]
+        assert reader.trace_index((1, 3)) == 4
+        assert list(reader.trace_indexes_at((1, 3))) == [4, 5]
+
+    def test_unique_traces_have_one_trace_index_at_each_location(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 3), range(1, 3)), 4))
+        assert list(reader.trace_indexes_at((2, 2))) == [3]
+
+
+class TestLineRanges:
+
+    def test_inline_sorted_file_has_contiguous_inlines(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 4), range(1, 5)), 6))
+        line_range = reader.inline_range(2)
+        assert line_range.first_trace_index == 4
+        assert line_range.num_traces == 4
+        assert line_range.byte_start == reader.trace_offset(4)
+        assert line_range.byte_length == 4 * (240 + 6 * 4)
+        assert reader.xline_range(1) is None
+
+    def test_inline_samples_single_read(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 4), range(1, 5)), 6, data_sample_format=1))
+        reader.inline_range(3)
+        with patch.object(reader._fh, 'read', wraps=reader._fh.read) as read:
+            trace_indexes, samples = reader.inline_samples(3)
+        assert read.call_count == 1
+        assert list(trace_indexes) == [8, 9, 10, 11]
+        assert samples.shape == (4, 6)
+        assert samples.tolist()[1] == [9000.0 + s for s in range(6)]
+
+    def test_non_contiguous_inline_samples(self):
+        fields = grid_header_fields(range(1, 3), range(1, 4))
+        fields = fields[0::2] + fields[1::2]
+        reader = make_reader(SyntheticDataset(fields, 3))
+        assert reader.inline_range(1) is None
+        trace_indexes, samples = reader.inline_samples(1)
+        assert list(trace_indexes) == [0, 1, 3]
+        assert samples.tolist() == [[0, 1, 2], [1000, 1001, 1002], [3000, 3001, 3002]]
+
+    def test_unknown_inline_raises_value_error(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 3), range(1, 3)), 4))
+        with pytest.raises(ValueError):
+            reader.inline_range(7)
+
+
+class TestIterTraceSamples:
+
+    def test_yields_in_file_order(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 4), range(1, 4)), 5))
+        results = list(reader.iter_trace_samples([7, 2, 5, 0], 1, 3))
+        assert [trace_index for trace_index, _ in results] == [0, 2, 5, 7]
+        for trace_index, samples in results:
+            assert list(samples) == [trace_index * 1000 + 1, trace_index * 1000 + 2]
+
+    def test_reads_are_coalesced(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 4), range(1, 4)), 5))
+        with patch('segpy.reader.MAX_COALESCED_GAP_NUM_BYTES', 0):
+            assert len(list(reader.iter_trace_samples(range(9)))) == 9
+        with patch.object(reader._fh, 'read', wraps=reader._fh.read) as read:
+            results = dict(reader.iter_trace_samples(range(9)))
+        assert read.call_count == 1
+        assert list(results[8]) == [8000, 8001, 8002, 8003, 8004]
+
+
+class TestCoalesceReads:
+
+    def test_nearby_reads_are_grouped(self):
+        reads = [(0, 4, 'a'), (16, 4, 'b'), (200, 1, 'c')]
+        with patch('segpy.reader.MAX_COALESCED_GAP_NUM_BYTES', 100):
+            assert list(coalesce_reads(reads, 4)) == [[(0, 4, 'a'), (16, 4, 'b')], [(200, 1, 'c')]]
+
+    def test_groups_are_limited_in_size(self):
+        reads = [(0, 4), (4, 4), (8, 4)]
+        with patch('segpy.reader.MAX_COALESCED_READ_NUM_BYTES', 8):
+            assert list(coalesce_reads(reads, 1)) == [[(0, 4), (4, 4)], [(8, 4)]]
+
+    def test_no_reads(self):
+        assert list(coalesce_reads([], 4)) == []
+
+
+class TestRegularTraceLayout:
+
+    def test_fixed_length_traces_are_regular(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 3), range(1, 4)), 7))
+        layout = reader.regular_trace_layout()
+        assert layout.num_samples == 7
+        assert layout.trace_stride == 240 + 7 * 4
+        assert all(reader._trace_offset_catalog[trace_index] == layout.first_trace_offset + trace_index * layout.trace_stride
+                   for trace_index in reader.trace_indexes())
+
+
+class TestAsArray:
+
+    def test_without_segpy_numpy_raises_import_error(self):
+        reader = make_reader(SyntheticDataset(grid_header_fields(range(1, 3), range(1, 3)), 4))
+        with patch.dict(sys.modules, {'segpy_numpy': None, 'segpy_numpy.volume': None}):
+            with pytest.raises(ImportError):
+                reader.as_array()
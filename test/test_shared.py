@@ -0,0 +1,191 @@
+import multiprocessing
+import pickle
+from array import array
+
+import pytest
+
+from segpy.catalog import (CatalogBuilder, MultiValuedCatalog, MultiValuedCatalog2D, SortedArrayCatalog,
+                           SortedArrayCatalog2D)
+from segpy.reader import create_reader
+from segpy.writer import write_segy
+from test.util import SyntheticDataset, grid_header_fields
+
+shared = pytest.importorskip('segpy.shared')
+if shared.shared_memory is None:
+    pytest.skip("multiprocessing.shared_memory is not available", allow_module_level=True)
+
+
+def first_sample_of_trace(args):
+    handle, inline_xline = args
+    reader = handle.open()
+    try:
+        return reader.trace_samples(reader.trace_index(inline_xline))[0]
+    finally:
+        reader._fh.close()
+
+
+@pytest.fixture
+def segy_path(tmpdir):
+    # Irregular inline numbers, and a missing trace, prevent a compact line catalog
+    header_fields = [fields for fields in grid_header_fields([1, 2, 3, 5], range(1, 6))
+                     if (fields['inline_number'], fields['crossline_number']) != (2, 3)]
+    path = str(tmpdir / 'irregular.segy')
+    with open(path, 'wb') as fh:
+        write_segy(fh, SyntheticDataset(header_fields, 7))
+    return path
+
+
+class TestSharedCatalog:
+
+    def test_scalar_keys(self):
+        mapping = {5: 50, 1: 10, 3: 30}
+        catalog = shared.share_catalog(mapping)
+        try:
+            assert len(catalog) == 3
+            assert list(catalog) == [1, 3, 5]
+            assert catalog[3] == 30
+            assert 2 not in catalog
+            with pytest.raises(KeyError):
+                catalog[4]
+        finally:
+            catalog.unlink()
+
+    def test_pair_keys(self):
+        mapping = {(i, j): i * 10 + j for i in range(1, 4) for j in range(1, 4) if (i, j) != (2, 2)}
+        catalog = shared.share_catalog(mapping)
+        try:
+            assert dict(catalog.items()) == mapping
+            assert list(catalog.i_range) == [1, 2, 3]
+            assert (2, 2) not in catalog
+            assert (4, 1) not in catalog
+        finally:
+            catalog.unlink()
+
+    def test_pickle_attaches_to_same_memory(self):
+        catalog = shared.share_catalog({1: 10, 2: 20})
+        try:
+            attached = pickle.loads(pickle.dumps(catalog))
+            assert attached.names == catalog.names
+            assert dict(attached.items()) == {1: 10, 2: 20}
+            attached.unlink()  # Not the owner, so only detaches
+            assert catalog[2] == 20
+        finally:
+            catalog.unlink()
+
+    def test_bulk_lookup(self):
+        numpy = pytest.importorskip('numpy')
+        catalog = shared.share_catalog({(i, j): i * 10 + j for i in (1, 2, 4) for j in (1, 3)})
+        try:
+            keys = numpy.array([(1, 3), (2, 2), (4, 1), (5, 1)])
+            assert catalog.get_many(keys).tolist() == [13, -1, 41, -1]
+            assert catalog.contains_many(keys).tolist() == [True, False, True, False]
+        finally:
+            catalog.unlink()
+
+    def test_multi_valued_keys(self):
+        builder = CatalogBuilder()
+        for index, value in [(3, 30), (1, 10), (3, 31), (1, 11), (1, 12), (7, 70)]:
+            builder.add(index, value)
+        catalog = shared.share_catalog(builder.create(allow_duplicates=True))
+        try:
+            assert isinstance(catalog, shared.SharedMultiValuedCatalog)
+            attached = pickle.loads(pickle.dumps(catalog))
+            assert list(attached) == [1, 3, 7]
+            assert list(attached.values_at(1)) == [10, 11, 12]
+            assert attached[3] == 30
+            assert attached.num_values == 6
+            attached.unlink()
+        finally:
+            catalog.unlink()
+
+    def test_multi_valued_pair_keys(self):
+        builder = CatalogBuilder()
+        for index, value in [((2, 1), 5), ((1, 2), 3), ((1, 1), 0), ((1, 1), 1), ((2, 1), 6)]:
+            builder.add(index, value)
+        catalog = shared.share_catalog(builder.create(allow_duplicates=True))
+        try:
+            assert isinstance(catalog, shared.SharedMultiValuedCatalog2D)
+            attached = pickle.loads(pickle.dumps(catalog))
+            assert list(attached) == [(1, 1), (1, 2), (2, 1)]
+            assert list(attached.values_at((2, 1))) == [5, 6]
+            assert (2, 2) not in attached
+            attached.unlink()
+        finally:
+            catalog.unlink()
+
+    def test_unsupported_keys_raise_value_error(self):
+        with pytest.raises(ValueError):
+            shared.share_catalog({(1, 2, 3): 4})
+
+    @pytest.mark.parametrize('make_column', [list, lambda items: array('i', items)])
+    def test_columns_which_are_not_int64_arrays(self, make_column):
+        catalog = shared.share_catalog(SortedArrayCatalog(make_column([1, 2]), make_column([3, 4])))
+        try:
+            assert dict(catalog.items()) == {1: 3, 2: 4}
+        finally:
+            catalog.unlink()
+
+    def test_multi_valued_offsets_which_are_not_int64_arrays(self):
+        catalog = shared.share_catalog(MultiValuedCatalog(array('q', [1, 3]), array('i', [0, 2, 3]),
+                                                          array('l', [10, 11, 30])))
+        try:
+            assert list(catalog.values_at(1)) == [10, 11]
+            assert list(catalog.values_at(3)) == [30]
+        finally:
+            catalog.unlink()
+
+    def test_non_integer_values_raise_value_error(self):
+        with pytest.raises(ValueError):
+            shared.share_catalog(SortedArrayCatalog([1, 2], [3.5, 4.5]))
+
+
+class TestShareReader:
+
+    def test_opened_reader_matches_original(self, segy_path):
+        with open(segy_path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None)
+            assert isinstance(reader._line_catalog, SortedArrayCatalog2D)
+            with shared.share_reader(reader) as handle:
+                handle = pickle.loads(pickle.dumps(handle))
+                other = handle.open()
+                try:
+                    assert type(other) is type(reader)
+                    assert other.num_traces() == reader.num_traces()
+                    assert list(other.inline_numbers()) == list(reader.inline_numbers())
+                    for key in [(1, 1), (2, 4), (5, 5)]:
+                        assert other.trace_index(key) == reader.trace_index(key)
+                        assert (list(other.trace_samples(other.trace_index(key)))
+                                == list(reader.trace_samples(reader.trace_index(key))))
+                    assert not other.has_trace_index((2, 3))
+                finally:
+                    other._fh.close()
+                    handle.close()
+
+    def test_prestack_line_catalog_is_shared(self, tmpdir):
+        header_fields = [fields for fields in grid_header_fields([1, 2, 4], range(1, 4)) for _ in range(2)]
+        path = str(tmpdir / 'prestack.segy')
+        with open(path, 'wb') as fh:
+            write_segy(fh, SyntheticDataset(header_fields, 5))
+        with open(path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None)
+            assert isinstance(reader._line_catalog, MultiValuedCatalog2D)
+            with shared.share_reader(reader) as handle:
+                handle = pickle.loads(pickle.dumps(handle))
+                other = handle.open()
+                try:
+                    assert isinstance(other._line_catalog, shared.SharedMultiValuedCatalog2D)
+                    for key in [(1, 1), (2, 3), (4, 2)]:
+                        assert list(other.trace_indexes_at(key)) == list(reader.trace_indexes_at(key))
+                finally:
+                    other._fh.close()
+                    handle.close()
+
+    def test_workers_attach_to_shared_catalogs(self, segy_path):
+        with open(segy_path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None)
+            keys = [(1, 1), (2, 4), (3, 3), (5, 5)]
+            expected = [reader.trace_samples(reader.trace_index(key))[0] for key in keys]
+            with shared.share_reader(reader) as handle:
+                with multiprocessing.Pool(2) as pool:
+                    actual = pool.map(first_sample_of_trace, [(handle, key) for key in keys])
+        assert actual == expected
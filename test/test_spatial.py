@@ -0,0 +1,108 @@
+from math import hypot
+from random import Random
+
+from hypothesis import given
+from hypothesis.strategies import floats, integers, lists, tuples
+from pytest import mark
+
+from segpy.spatial import SpatialIndex, scale_coordinate
+from test.util import SyntheticDataset, grid_header_fields, make_reader
+
+coordinates = floats(-1000, 1000)
+points = lists(tuples(coordinates, coordinates), min_size=1, max_size=200)
+
+
+def brute_force_k_nearest(pts, x, y, k):
+    return sorted(range(len(pts)), key=lambda i: (hypot(pts[i][0] - x, pts[i][1] - y), i))[:k]
+
+
+class TestSpatialIndex:
+
+    @given(points, coordinates, coordinates, integers(1, 10))
+    def test_k_nearest_matches_brute_force(self, pts, x, y, k):
+        index = SpatialIndex([p[0] for p in pts], [p[1] for p in pts])
+        found = index.k_nearest(x, y, k)
+        expected = brute_force_k_nearest(pts, x, y, k)
+        assert [hypot(pts[i][0] - x, pts[i][1] - y) for i in found] == \
+               [hypot(pts[i][0] - x, pts[i][1] - y) for i in expected]
+
+    @given(points, coordinates, coordinates)
+    def test_nearest_query_far_outside(self, pts, x, y):
+        index = SpatialIndex([p[0] for p in pts], [p[1] for p in pts])
+        nearest = index.nearest(x * 1000, y * 1000)
+        expected = brute_force_k_nearest(pts, x * 1000, y * 1000, 1)[0]
+        assert hypot(pts[nearest][0] - x * 1000, pts[nearest][1] - y * 1000) == \
+               hypot(pts[expected][0] - x * 1000, pts[expected][1] - y * 1000)
+
+    @given(points, coordinates, coordinates, coordinates, coordinates)
+    def test_within_box(self, pts, x0, y0, x1, y1):
+        x_min, x_max = sorted((x0, x1))
+        y_min, y_max = sorted((y0, y1))
+        index = SpatialIndex([p[0] for p in pts], [p[1] for p in pts])
+        assert list(index.within_box(x_min, y_min, x_max, y_max)) == \
+               [i for i, (x, y) in enumerate(pts) if x_min <= x <= x_max and y_min <= y <= y_max]
+
+    def test_near_duplicate_points_bound_the_grid(self):
+        pts = [(0, 0), (31, 0), (31, -1e-5), (31, 0)]
+        index = SpatialIndex([p[0] for p in pts], [p[1] for p in pts])
+        assert (31 / index.cell_size + 1) * (1e-5 / index.cell_size + 1) <= 3 * 4 * len(pts) + 1
+        assert index.k_nearest(30, 0, 2) == [1, 3]
+
+    def test_subnormal_distances_do_not_underflow(self):
+        pts = [(0.0, 0.0), (5e-324, 0.0)]
+        index = SpatialIndex([p[0] for p in pts], [p[1] for p in pts])
+        assert index.nearest(1e-323, 0.0) == 1
+
+    def test_point_at_maximum_edge_with_explicit_cell_size(self):
+        # 1.0 // 0.1 == 9.0, but floor(1.0 / 0.1) == 10
+        index = SpatialIndex([0.0, 1.0], [0.0, 0.0], cell_size=0.1)
+        assert list(index.within_box(0.95, -1, 1.05, 1)) == [1]
+        assert index.nearest(1.0, 0) == 1
+        assert index.k_nearest(1.0, 0, 2) == [1, 0]
+
+    @mark.parametrize("xs", [[i * 0.3 for i in range(7)],
+                             [i * 0.1 for i in range(19)],
+                             [i * 0.2 for i in range(19)],
+                             [i * 0.05 for i in range(19)]])
+    def test_point_at_maximum_edge_with_chosen_cell_size(self, xs):
+        index = SpatialIndex(xs, [0.0] * len(xs))
+        last = len(xs) - 1
+        assert list(index.within_box(xs[-1] - 1e-9, -1, xs[-1] + 1e-9, 1)) == [last]
+        assert index.nearest(xs[-1], 0) == last
+        assert index.k_nearest(xs[-1], 0, 2) == [last, last - 1]
+
+    def test_within_polygon(self):
+        rng = Random(42)
+        pts = [(rng.uniform(0, 10), rng.uniform(0, 10)) for _ in range(500)]
+        index = SpatialIndex([p[0] for p in pts], [p[1] for p in pts])
+        triangle = [(0, 0), (10, 0), (0, 10)]
+        assert list(index.within_polygon(triangle)) == [i for i, (x, y) in enumerate(pts) if x + y < 10]
+
+    def test_empty_index(self):
+        index = SpatialIndex([], [])
+        assert index.nearest(0, 0) is None
+        assert list(index.within_box(-1, -1, 1, 1)) == []
+
+
+class TestScaleCoordinate:
+
+    def test_positive_scalar_multiplies(self):
+        assert scale_coordinate(12, 10) == 120.0
+
+    def test_negative_scalar_divides(self):
+        assert scale_coordinate(12, -100) == 0.12
+
+    def test_zero_scalar_is_identity(self):
+        assert scale_coordinate(12, 0) == 12.0
+
+
+class TestReaderSpatialIndex:
+
+    def test_nearest_cdp(self):
+        fields = grid_header_fields(range(1, 5), range(1, 7))
+        for f in fields:
+            f.update(cdp_x=f['inline_number'] * 2500, cdp_y=f['crossline_number'] * 1250, xy_scalar=-100)
+        reader = make_reader(SyntheticDataset(fields, 4))
+        index = reader.spatial_index('cdp')
+        trace_index = index.nearest(75.1, 49.0)
+        assert (fields[trace_index]['inline_number'], fields[trace_index]['crossline_number']) == (3, 4)
@@ -0,0 +1,250 @@
+import math
+import random
+import statistics as python_statistics
+
+import pytest
+
+import segpy.statistics
+from segpy.reader import create_reader
+from segpy.statistics import (Moments, Histogram, TDigest, AmplitudeStatistics, TraceSummary,
+                              amplitude_statistics, load_statistics)
+from segpy.writer import write_segy
+from test.util import SyntheticDataset, grid_header_fields, make_reader
+
+
+@pytest.fixture
+def dataset():
+    return SyntheticDataset(grid_header_fields(range(1, 4), range(1, 5)), 6)
+
+
+def all_samples(dataset):
+    return [sample for trace_index in range(dataset.num_traces()) for sample in dataset.trace_samples(trace_index)]
+
+
+class TestMoments:
+
+    def test_single_batch(self):
+        values = [1.0, 2.0, 4.0, 8.0]
+        moments = Moments.of(values)
+        assert moments.count == 4
+        assert moments.minimum == 1.0
+        assert moments.maximum == 8.0
+        assert moments.mean == pytest.approx(python_statistics.mean(values))
+        assert moments.variance == pytest.approx(python_statistics.pvariance(values))
+        assert moments.rms == pytest.approx(math.sqrt(sum(v * v for v in values) / 4))
+
+    def test_merge_equals_single_pass(self):
+        rng = random.Random(42)
+        values = [rng.gauss(10, 3) for _ in range(1000)]
+        merged = Moments.of(values[:123]).merge(Moments.of(values[123:700])).merge(Moments.of(values[700:]))
+        single = Moments.of(values)
+        assert merged.count == single.count
+        assert merged.mean == pytest.approx(single.mean)
+        assert merged.variance == pytest.approx(single.variance)
+        assert (merged.minimum, merged.maximum) == (single.minimum, single.maximum)
+
+    def test_empty(self):
+        moments = Moments().merge(Moments())
+        assert moments.count == 0
+        assert moments.mean is None
+        assert moments.rms is None
+
+    def test_nans_are_counted_and_excluded(self):
+        moments = Moments.of([1.0, math.nan, 3.0]).merge(Moments.of([math.nan]))
+        assert moments.count == 2
+        assert moments.num_nans == 2
+        assert (moments.minimum, moments.maximum, moments.mean) == (1.0, 3.0, 2.0)
+
+
+class TestHistogram:
+
+    def test_counts(self):
+        histogram = Histogram(0, 10, 5)
+        histogram.update([-1, 0, 1.9, 2, 9.99, 10, 11])
+        assert histogram.counts == (2, 1, 0, 0, 2)
+        assert histogram.underflow == 1
+        assert histogram.overflow == 1
+        assert histogram.edges() == (0, 2, 4, 6, 8, 10)
+
+    def test_merge(self):
+        a = Histogram(0, 4, 4)
+        a.update([0, 1])
+        b = Histogram(0, 4, 4)
+        b.update([1, 3, 5])
+        assert a.merge(b).counts == (1, 2, 0, 1)
+        assert a.overflow == 1
+
+    def test_merge_different_bins_raises_value_error(self):
+        with pytest.raises(ValueError):
+            Histogram(0, 4, 4).merge(Histogram(0, 4, 8))
+
+    def test_nans_are_counted_separately(self):
+        a = Histogram(0, 4, 4)
+        a.update([math.nan, 1, math.nan])
+        b = Histogram(0, 4, 4)
+        b.update([math.nan])
+        a.merge(b)
+        assert a.counts == (0, 1, 0, 0)
+        assert (a.underflow, a.overflow, a.num_nans) == (0, 0, 3)
+
+    def test_empty_range_raises_value_error(self):
+        with pytest.raises(ValueError):
+            Histogram(1, 1)
+
+
+class TestTDigest:
+
+    def test_quantiles_of_uniform(self):
+        rng = random.Random(7)
+        values = [rng.random() for _ in range(20000)]
+        digest = TDigest()
+        for begin in range(0, len(values), 500):
+            digest.update(values[begin:begin + 500])
+        for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+            assert digest.quantile(q) == pytest.approx(q, abs=0.01)
+        assert digest.quantile(0) == min(values)
+        assert digest.quantile(1) == max(values)
+
+    def test_merged_digests_estimate_quantiles(self):
+        rng = random.Random(3)
+        digests = []
+        for _ in range(8):
+            digest = TDigest()
+            digest.update(rng.gauss(0, 1) for _ in range(2000))
+            digests.append(digest)
+        merged = digests[0]
+        for digest in digests[1:]:
+            merged.merge(digest)
+        assert merged.count == 16000
+        assert merged.quantile(0.5) == pytest.approx(0, abs=0.05)
+        assert merged.quantile(0.975) == pytest.approx(1.96, abs=0.1)
+
+    def test_small_digest_is_exact(self):
+        digest = TDigest()
+        digest.update([3, 1, 2])
+        assert digest.quantile(0.5) == 2
+
+    def test_nans_are_ignored(self):
+        digest = TDigest()
+        digest.update([3, math.nan, 1, 2])
+        assert digest.count == 3
+        assert digest.quantile(1) == 3
+
+    def test_empty_digest_raises_value_error(self):
+        with pytest.raises(ValueError):
+            TDigest().quantile(0.5)
+
+
+class TestAmplitudeStatistics:
+
+    def test_volume_statistics(self, dataset):
+        stats = amplitude_statistics(make_reader(dataset), histogram_range=(0, 12000), num_bins=12, workers=0)
+        samples = all_samples(dataset)
+        assert stats.volume.count == len(samples)
+        assert stats.volume.minimum == min(samples)
+        assert stats.volume.maximum == max(samples)
+        assert stats.volume.mean == pytest.approx(python_statistics.mean(samples))
+        assert sum(stats.histogram.counts) == len(samples)
+        assert stats.percentile(50) == pytest.approx(python_statistics.median(samples), rel=0.05)
+
+    def test_trace_and_inline_statistics(self, dataset):
+        stats = amplitude_statistics(make_reader(dataset), workers=0)
+        assert stats.histogram is None
+        assert stats.trace_indexes() == list(range(12))
+        summary = stats.trace(5)
+        assert (summary.count, summary.minimum, summary.maximum) == (6, 5000, 5005)
+        assert stats.inline_numbers() == [1, 2, 3]
+        inline_2 = [sample for trace_index in range(4, 8) for sample in dataset.trace_samples(trace_index)]
+        assert stats.inline(2).mean == pytest.approx(python_statistics.mean(inline_2))
+
+    def test_inline_sketches(self, dataset):
+        stats = amplitude_statistics(make_reader(dataset), histogram_range=(0, 12000), num_bins=12, workers=0)
+        inline_2 = [sample for trace_index in range(4, 8) for sample in dataset.trace_samples(trace_index)]
+        assert sum(stats.inline_histogram(2).counts) == len(inline_2)
+        assert stats.inline_digest(2).count == len(inline_2)
+        assert stats.inline_percentile(2, 0) == min(inline_2)
+        assert stats.inline_percentile(2, 100) == max(inline_2)
+        assert sum(stats.histogram.counts) == len(all_samples(dataset))
+        with pytest.raises(KeyError):
+            stats.inline_histogram(4)
+
+    def test_nan_samples(self):
+        stats = AmplitudeStatistics(histogram_range=(0, 10), num_bins=5)
+        stats.add_trace(0, 1, [1.0, math.nan, 9.0])
+        stats.add_trace(1, 2, [math.nan])
+        assert stats.volume.count == 2
+        assert stats.volume.num_nans == 2
+        assert stats.histogram.num_nans == 2
+        assert stats.digest.count == 2
+        assert stats.trace(0) == TraceSummary(2, 1.0, 9.0, 5.0, math.sqrt(41))
+        assert stats.trace(1) == TraceSummary(0, None, None, None, None)
+
+    def test_one_digest_per_inline_per_chunk(self, dataset, monkeypatch):
+        digests = []
+
+        class RecordingTDigest(TDigest):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                digests.append(self)
+
+        monkeypatch.setattr(segpy.statistics, 'TDigest', RecordingTDigest)
+        stats = amplitude_statistics(make_reader(dataset), histogram_range=(0, 12000), workers=0)
+        assert len(digests) == 1 + len(stats.inline_numbers())
+        assert stats.digest.count == len(all_samples(dataset))
+
+    def test_merge_traces_out_of_order(self):
+        a = AmplitudeStatistics()
+        a.add_trace(5, None, [1.0, 3.0])
+        a.add_trace(2, None, [])
+        b = AmplitudeStatistics()
+        b.add_trace(3, None, [-4.0])
+        merged = b.merge(a)
+        assert merged.trace_indexes() == [2, 3, 5]
+        assert merged.trace(5) == TraceSummary(2, 1.0, 3.0, 2.0, math.sqrt(5))
+        assert merged.trace(2) == TraceSummary(0, None, None, None, None)
+        with pytest.raises(KeyError):
+            merged.trace(4)
+
+    def test_state_of_another_version_raises_type_error(self):
+        state = AmplitudeStatistics().__getstate__()
+        state['__version__'] = None
+        with pytest.raises(TypeError):
+            AmplitudeStatistics.__new__(AmplitudeStatistics).__setstate__(state)
+
+    def test_state_of_another_pickle_version_raises_type_error(self):
+        state = AmplitudeStatistics().__getstate__()
+        state['__pickle_version__'] = None
+        with pytest.raises(TypeError):
+            AmplitudeStatistics.__new__(AmplitudeStatistics).__setstate__(state)
+
+    def test_workers_match_single_process(self, tmpdir, dataset):
+        path = str(tmpdir / 'synthetic.segy')
+        with open(path, 'wb') as fh:
+            write_segy(fh, dataset)
+        with open(path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory=None)
+            parallel = amplitude_statistics(reader, workers=2)
+            serial = amplitude_statistics(reader, workers=0)
+        assert parallel.volume.mean == pytest.approx(serial.volume.mean)
+        assert parallel.volume.variance == pytest.approx(serial.volume.variance)
+        assert parallel.trace(11) == serial.trace(11)
+
+    def test_sidecar_round_trip(self, tmpdir, dataset):
+        path = str(tmpdir / 'synthetic.segy')
+        with open(path, 'wb') as fh:
+            write_segy(fh, dataset)
+        with open(path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory='.segpy')
+            assert load_statistics(reader) is None
+            computed = amplitude_statistics(reader, workers=0)
+        with open(path, 'rb') as fh:
+            reader = create_reader(fh, cache_directory='.segpy')
+            loaded = load_statistics(reader)
+        assert loaded is not None
+        assert loaded.volume.mean == computed.volume.mean
+        assert loaded.clip_range(0.98) == computed.clip_range(0.98)
+
+    def test_progress(self, dataset):
+        progress = []
+        amplitude_statistics(make_reader(dataset), workers=0, progress=progress.append)
+        assert progress[-1] == 1
@@ -0,0 +1,100 @@
+from math import cos, radians, sin
+from random import Random
+
+from hypothesis import given
+from hypothesis.strategies import floats, integers
+from pytest import approx, importorskip, mark, raises
+
+from segpy.survey_grid import SurveyGrid, fit_survey_grid
+from test.util import SyntheticDataset, force_python_survey_grid, grid_header_fields, make_reader
+
+
+def rotated_grid_positions(inline_numbers, xline_numbers, azimuth, inline_bin_size, xline_bin_size, x0, y0):
+    a = radians(azimuth)
+    positions = []
+    for i in inline_numbers:
+        for j in xline_numbers:
+            along = (j - xline_numbers[0]) * xline_bin_size
+            across = (i - inline_numbers[0]) * inline_bin_size
+            positions.append((i, j,
+                              x0 + along * sin(a) + across * cos(a),
+                              y0 + along * cos(a) - across * sin(a)))
+    return positions
+
+
+class TestFitSurveyGrid:
+
+    @given(floats(0, 359), floats(5, 50), floats(5, 50), integers(1, 1000), integers(1, 1000))
+    def test_recovers_grid(self, azimuth, inline_bin_size, xline_bin_size, first_inline, first_xline):
+        positions = rotated_grid_positions(range(first_inline, first_inline + 5),
+                                           range(first_xline, first_xline + 7),
+                                           azimuth, inline_bin_size, xline_bin_size, 500000.0, 6000000.0)
+        grid = fit_survey_grid(*zip(*positions))
+        assert grid.inline_bin_size == approx(inline_bin_size)
+        assert grid.xline_bin_size == approx(xline_bin_size)
+        assert grid.origin == approx((first_inline, first_xline, 500000.0, 6000000.0))
+        assert grid.rms_residual == approx(0, abs=1e-6)
+        assert grid.num_points == len(positions)
+        for i, j, x, y in positions:
+            assert grid.line_to_world(i, j) == approx((x, y))
+            assert grid.world_to_line(x, y) == approx((i, j))
+
+    def test_azimuth(self):
+        grid = fit_survey_grid(*zip(*rotated_grid_positions(range(3), range(4), 30.0, 25.0, 12.5, 0.0, 0.0)))
+        assert grid.azimuth == approx(30.0)
+        assert grid.xline_azimuth == approx(120.0)
+
+    def test_residuals(self):
+        positions = rotated_grid_positions(range(3), range(3), 0.0, 10.0, 10.0, 0.0, 0.0)
+        i, j, x, y = positions[4]
+        positions[4] = (i, j, x + 9.0, y)
+        grid = fit_survey_grid(*zip(*positions))
+        assert 0 < grid.rms_residual < grid.max_residual < 9.0
+
+    @mark.parametrize("force", [True, False])
+    def test_single_line_raises_value_error(self, force):
+        with force_python_survey_grid(force), raises(ValueError):
+            fit_survey_grid([1, 1, 1], [1, 2, 3], [0.0, 1.0, 2.0], [0.0, 0.0, 0.0])
+
+    def test_numpy_matches_python(self):
+        importorskip('numpy')
+        rng = Random(17)
+        positions = [(i, j, x + rng.uniform(-2, 2), y + rng.uniform(-2, 2))
+                     for i, j, x, y in rotated_grid_positions(range(100, 140), range(2000, 2050),
+                                                              37.0, 25.0, 12.5, 500000.0, 6000000.0)]
+        with force_python_survey_grid(True):
+            python_grid = fit_survey_grid(*zip(*positions))
+        with force_python_survey_grid(False):
+            numpy_grid = fit_survey_grid(*zip(*positions))
+        assert numpy_grid.origin == approx(python_grid.origin)
+        assert (numpy_grid.inline_bin_size, numpy_grid.xline_bin_size, numpy_grid.azimuth) == approx(
+            (python_grid.inline_bin_size, python_grid.xline_bin_size, python_grid.azimuth))
+        assert (numpy_grid.rms_residual, numpy_grid.max_residual) == approx(
+            (python_grid.rms_residual, python_grid.max_residual))
+
+    def test_mismatched_lengths_raise_value_error(self):
+        with raises(ValueError):
+            fit_survey_grid([1, 2], [1, 2, 3], [0.0, 1.0], [0.0, 0.0])
+
+    def test_parallel_directions_raise_value_error(self):
+        with raises(ValueError):
+            SurveyGrid(1, 1, 0.0, 0.0, 1.0, 0.0, 2.0, 0.0)
+
+
+class TestReaderSurveyGrid:
+
+    def test_world_to_line_round_trip(self):
+        fields = grid_header_fields(range(10, 14), range(20, 26))
+        for f in fields:
+            f.update(cdp_x=1000 + 25 * f['crossline_number'],
+                     cdp_y=2000 + 50 * f['inline_number'],
+                     xy_scalar=10)
+        reader = make_reader(SyntheticDataset(fields, 4))
+        grid = reader.survey_grid()
+        assert grid.xline_bin_size == approx(250.0)
+        assert grid.inline_bin_size == approx(500.0)
+        x, y = reader.line_to_world(12, 23)
+        assert (x, y) == approx((10000 + 250 * 23, 20000 + 500 * 12))
+        inline, xline = reader.world_to_line(x + 100.0, y - 200.0)
+        assert reader.trace_index((round(inline), round(xline))) == fields.index(
+            next(f for f in fields if (f['inline_number'], f['crossline_number']) == (12, 23)))
@@ -1,6 +1,6 @@
 from hypothesis import given, assume, example
 from hypothesis.strategies import integers, lists
-from segpy.util import batched, complementary_intervals, flatten, intervals_are_contiguous, roundrobin
+from segpy.util import batched, complementary_intervals, flatten, intervals_are_contiguous, measure_runs, roundrobin
 from test.strategies import spaced_ranges
 
 
@@ -73,3 +73,22 @@ class TestComplementaryIntervals:
         end_index = last_interval_end + end_offset
         complements = list(complementary_intervals(intervals, stop=end_index))
         assert complements[-1] == range(last_interval_end, end_index)
+
+
+class TestMeasureRuns:
+
+    def test_empty(self):
+        assert measure_runs([]) == []
+
+    def test_single_item(self):
+        assert measure_runs([(3, 7)]) == [(3, 0, 7, 0, 1)]
+
+    def test_runs_break_where_strides_change(self):
+        items = [(0, 0), (1, 240), (2, 480), (3, 720), (4, 1000), (5, 1280), (6, 1560)]
+        assert measure_runs(items) == [(0, 1, 0, 240, 4), (4, 1, 1000, 280, 3)]
+
+    @given(lists(integers(), min_size=1, unique=True))
+    def test_runs_cover_all_items(self, keys):
+        items = [(key, key * 3) for key in sorted(keys)]
+        runs = measure_runs(items)
+        assert sum(run[4] for run in runs) == len(items)
@@ -1,5 +1,15 @@
 from contextlib import contextmanager
+from io import BytesIO
+
+import segpy.catalog as catalog
+import segpy.survey_grid as survey_grid
 import segpy.toolkit as toolkit
+from segpy.binary_reel_header import BinaryReelHeader
+from segpy.dataset import Dataset
+from segpy.reader import create_reader
+from segpy.toolkit import CARDS_PER_HEADER
+from segpy.trace_header import TraceHeaderRev1
+from segpy.writer import write_segy
 
 
 @contextmanager
@@ -13,3 +23,93 @@ def force_python_ibm_float(force):
         yield force
     finally:
         toolkit.force_python_ibm_floats = orig
+
+
+@contextmanager
+def force_python_catalog_builder(force):
+    """Configure segpy to build catalogs with and without NumPy."""
+    orig = catalog.force_python_catalog_builder
+    catalog.force_python_catalog_builder = force
+    try:
+        yield force
+    finally:
+        catalog.force_python_catalog_builder = orig
+
+
+@contextmanager
+def force_python_survey_grid(force):
+    """Configure segpy to fit survey grids with and without NumPy."""
+    orig = survey_grid.force_python_survey_grid
+    survey_grid.force_python_survey_grid = force
+    try:
+        yield force
+    finally:
+        survey_grid.force_python_survey_grid = orig
+
+
+class SyntheticDataset(Dataset):
+    """A Dataset of traces with specified header fields and predictable samples.
+
+    The value of sample s in trace t is t * 1000 + s.
+    """
+
+    def __init__(self, trace_header_fields, num_samples, data_sample_format=5):
+        """
+        Args:
+            trace_header_fields: A sequence of dictionaries, one per trace, of
+                trace header field values.
+
+            num_samples: The number of samples in each trace.
+
+            data_sample_format: The SEG Y data sample format code. Defaults
+                to IEEE float32.
+        """
+        self._trace_header_fields = list(trace_header_fields)
+        self._num_samples = num_samples
+        self._binary_reel_header = BinaryReelHeader(num_samples=num_samples,
+                                                    data_sample_format=data_sample_format,
+                                                    sample_interval=4000,
+                                                    format_revision_num=256)
+
+    @property
+    def textual_reel_header(self):
+        return [''] * CARDS_PER_HEADER
+
+    @property
+    def binary_reel_header(self):
+        return self._binary_reel_header
+
+    @property
+    def extended_textual_header(self):
+        return []
+
+    def trace_indexes(self):
+        return iter(range(self.num_traces()))
+
+    def num_traces(self):
+        return len(self._trace_header_fields)
+
+    def trace_header(self, trace_index):
+        fields = dict(num_samples=self._num_samples)
+        fields.update(self._trace_header_fields[trace_index])
+        return TraceHeaderRev1(**fields)
+
+    def trace_samples(self, trace_index, start=None, stop=None):
+        num_samples = self._trace_header_fields[trace_index].get('num_samples', self._num_samples)
+        return [trace_index * 1000 + s for s in range(num_samples)][start:stop]
+
+
+def grid_header_fields(inline_numbers, xline_numbers):
+    """Trace header fields for a survey sorted by inline then crossline."""
+    return [dict(file_sequence_num=n + 1, ensemble_num=n,
+                 inline_number=inline_number, crossline_number=xline_number)
+            for n, (inline_number, xline_number)
+            in enumerate((i, x) for i in inline_numbers for x in xline_numbers)]
+
+
+def make_reader(dataset, **kwargs):
+    """Write a dataset to an in-memory SEG Y file and create an uncached reader for it."""
+    write_stream = BytesIO()
+    write_segy(write_stream, dataset)
+    kwargs.setdefault('cache_directory', None)
+    return create_reader(BytesIO(write_stream.getvalue()), **kwargs)